@@ -0,0 +1,330 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from get_resources import get_resources
+from get_prices import get_prices
+from create_variables import create_variables, get_variable_values
+from create_model import create_model
+from run_optimization_model import create_objective_function, select_solver, solve_optimization_model, \
+    get_solver_options
+from shards import create_shard_executors, solve_sharded, shutdown_shard_executors
+
+
+# Plant subproblems kept by each process between multiplier updates (see shards)
+PLANTS = {}
+
+# Ratio of the relative primal and dual residuals of ADMM above which the penalty is multiplied or divided by
+# RHO_FACTOR, to keep the residuals balanced
+BALANCING = 10
+RHO_FACTOR = 2
+
+# Deviations, relative to the scale of the net import, where the proximal term of ADMM is linearised
+PROXIMAL_BREAKPOINTS = [sign * breakpoint for sign in [-1, 1]
+                        for breakpoint in [0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1, 3]]
+
+
+def create_portfolio(case: int, number_plants: int, PV_range: tuple = (0.5, 1.5), seed: int = 0) -> list:
+    ''' Resources of a portfolio of plants of a case, each with a PV plant scaled by a random factor of PV_range '''
+    rng = random.default_rng(seed)
+    portfolio = []
+    for factor in rng.uniform(PV_range[0], PV_range[1], number_plants):
+        resources = get_resources(case)
+        resources['PV'] = dict(resources['PV'], max_power=resources['PV']['max_power'] * factor)
+        portfolio.append(resources)
+
+    return portfolio
+
+
+def get_plant_prices(prices: dict, multipliers: ndarray) -> dict:
+    ''' Prices of a plant, whose electricity is bought and sold at the multipliers of the shared balance '''
+    return dict(prices, energy=multipliers, energy_market=multipliers)
+
+
+def create_portfolio_model(portfolio: list, h: int, case: int, prices: dict, grid_capacity: float = None) -> ConcreteModel:
+    ''' Create one block per plant behind one grid connection, the reference of the decomposition
+
+    Each plant is built without grid, so P_E is its net import. The grid connection buys
+    their sum, which cannot be exported as in create_bidding_model, up to grid_capacity.
+    '''
+    m = ConcreteModel()
+    m.plants = Block(range(0, len(portfolio)))
+    for n, resources in enumerate(portfolio):
+        block = m.plants[n]
+        block.c1 = ConstraintList()
+        block = create_variables(block, h, 1, case, resources)
+        block = create_model(block, h, 1, resources, case, grid=False)
+        block = create_objective_function(block, h, 1, resources, get_plant_prices(prices, zeros(h)), case)
+        block.value.deactivate()
+
+    m.P_E_pos = Var(arange(h), domain=NonNegativeReals, bounds=(0, grid_capacity))
+    m.P_E_neg = Var(arange(h), domain=NonNegativeReals)
+    m.c1 = ConstraintList()
+    for t in range(0, h):
+        m.c1.add(m.P_E_pos[t] - m.P_E_neg[t] == quicksum(m.plants[n].P_E[t] for n in m.plants))
+        m.c1.add(m.P_E_pos[t] + m.P_E_neg[t] == quicksum(m.plants[n].P_E[t] for n in m.plants))
+
+    m.value = Objective(expr=quicksum(m.plants[n].value.expr for n in m.plants) +
+                        quicksum(prices['energy'][t] * m.P_E_pos[t] - prices['energy_market'][t] * m.P_E_neg[t]
+                                 for t in range(0, h)), sense=minimize)
+
+    return m
+
+
+def create_plant(h: int, case: int, resources: dict) -> ConcreteModel:
+    ''' Model of one plant without grid, with the proximal term of ADMM around a target net import
+
+    As in create_subproblem of stochastic, the quadratic proximal term is approximated from
+    below by its tangents at PROXIMAL_BREAKPOINTS times the scale of the net import, so the
+    plant stays a linear (mixed-integer) program.
+    '''
+    m = ConcreteModel()
+    m.c1 = ConstraintList()
+    m = create_variables(m, h, 1, case, resources)
+    m = create_model(m, h, 1, resources, case, grid=False)
+    m.admm_target = Param(arange(h), mutable=True, initialize=0)
+    m.admm_rho = Param(arange(h), mutable=True, initialize=0)
+    m.admm_scale = Param(arange(h), mutable=True, initialize=1)
+    m.admm_deviation = Var(arange(h), domain=Reals)
+    m.admm_proximal = Var(arange(h), domain=NonNegativeReals)
+    m.admm_c1 = ConstraintList()
+    for t in range(0, h):
+        m.admm_c1.add(m.admm_deviation[t] == m.P_E[t] - m.admm_target[t])
+        for breakpoint in PROXIMAL_BREAKPOINTS:
+            m.admm_c1.add(m.admm_proximal[t] >= m.admm_rho[t] / 2 * (2 * breakpoint * m.admm_scale[t] *
+                                                                     m.admm_deviation[t] -
+                                                                     (breakpoint * m.admm_scale[t]) ** 2))
+    m.plant_solver = None
+
+    return m
+
+
+def solve_plant(task: dict) -> dict:
+    ''' Solve the subproblem of one plant at the multipliers, with the proximal term around the target if any and
+    its net import within the bounds if any
+
+    The plant is built on the first call and kept in PLANTS, so the next calls only replace
+    its objective and start from its last solution.
+    '''
+    key = (task['key'], task['n'])
+    h = task['h']
+    if key not in PLANTS:
+        PLANTS[key] = create_plant(h, task['case'], task['resources'])
+    m = PLANTS[key]
+
+    for name in ['value', 'admm_value']:
+        if m.component(name) is not None:
+            m.del_component(name)
+    m = create_objective_function(m, h, 1, task['resources'], get_plant_prices(task['prices'], task['multipliers']),
+                                  task['case'])
+    m.value.deactivate()
+    m.admm_value = Objective(expr=m.value.expr + quicksum(m.admm_proximal[t] for t in range(0, h)), sense=minimize)
+    for t in range(0, h):
+        m.admm_target[t] = 0 if task['target'] is None else task['target'][t]
+        m.admm_rho[t] = 0 if task['rho'] is None else task['rho'][t]
+        m.admm_scale[t] = 1 if task['scale'] is None else task['scale'][t]
+        m.P_E[t].setlb(None if task['lower'] is None else task['lower'][t])
+        m.P_E[t].setub(None if task['upper'] is None else task['upper'][t])
+
+    warmstart = m.plant_solver is not None
+    if m.plant_solver is None:
+        m.plant_solver = select_solver(task['solver_options'])
+    solve_status = solve_optimization_model(m, task['solver_options'], m.plant_solver, warmstart)
+    if not solve_status['feasible']:
+        return {'n': task['n'], 'feasible': False, 'time': solve_status['time']}
+
+    P_E = array([m.P_E[t].value for t in range(0, h)], dtype=float64)
+    result = {'n': task['n'], 'feasible': True, 'time': solve_status['time'], 'P_E': P_E,
+              'objective': value(m.value.expr)}
+    if task['values']:
+        result['values'] = get_variable_values(m)
+
+    return result
+
+
+def solve_plants(tasks: list, executors: list) -> list:
+    ''' Solve the plants in the shard executors, each plant always in the same process '''
+    return solve_sharded(solve_plant, tasks, executors)
+
+
+def get_grid_purchase(P_E: ndarray, multipliers: ndarray, prices: dict, grid_capacity: float = None) -> ndarray:
+    ''' Purchase of the grid connection that minimises its cost at the multipliers (the sum of the plants where
+    the multiplier is the energy price) '''
+    upper = grid_capacity if grid_capacity is not None else inf
+    purchase = where(multipliers > prices['energy'], upper, 0.0)
+    balanced = isclose(multipliers, prices['energy'])
+    purchase[balanced] = P_E[balanced].clip(0, upper)
+
+    return purchase
+
+
+def get_bounds(P_E: ndarray, grid_capacity: float = None) -> tuple:
+    ''' Lower and upper bounds of the net import of each plant (plants x h) whose sums are zero and the grid capacity
+
+    The net imports are first scaled to fit: where the plants import more than the capacity, the
+    importers import less in proportion, and where they export, the exporters export less in
+    proportion, by curtailing their PV. The capacity left is shared in proportion to the imports, and
+    the importers must import enough for what the exporters export.
+    '''
+    total = P_E.sum(axis=0)
+    imports = P_E.clip(0)
+    exports = (-P_E).clip(0)
+    if grid_capacity is not None:
+        excess = (total - grid_capacity).clip(0)
+        imports = imports * (1 - excess / maximum(imports.sum(axis=0), 1e-10))
+    deficit = (-total).clip(0)
+    exports = exports * (1 - deficit / maximum(exports.sum(axis=0), 1e-10))
+
+    lower = imports * (exports.sum(axis=0) / maximum(imports.sum(axis=0), 1e-10)) - exports
+    upper = None
+    if grid_capacity is not None:
+        share = where(imports.sum(axis=0) > 0, imports / maximum(imports.sum(axis=0), 1e-10), 1 / len(P_E))
+        upper = imports - exports + share * (grid_capacity - (imports - exports).sum(axis=0))
+
+    return lower, upper
+
+
+def run_aggregator(portfolio: list, h: int, case: int, prices: dict, grid_capacity: float = None,
+                   solver_options: dict = None, workers: int = 1, rho_factor: float = 1.0, max_iterations: int = 100,
+                   tolerance: float = 1e-3) -> dict:
+    ''' Schedule a portfolio of plants behind one grid connection by ADMM on the shared balance
+
+    The multipliers are the price of electricity inside the portfolio. The plants are first
+    solved alone at the energy price. Each iteration of the sharing form of ADMM then solves
+    every plant at the multipliers with a proximal term (see create_plant) that keeps it near
+    its last net import shifted by its share of the imbalance, each plant always in the same
+    worker process (see shards). The grid connection buys the mean net import less the energy
+    price over the penalty, within its capacity, in closed form, and the multipliers move by the
+    penalty times the imbalance. The penalty of each timestep is rho_factor times the mean
+    energy price over the mean absolute net import of the plants alone, and is multiplied or
+    divided by RHO_FACTOR while one residual is BALANCING times the other.
+
+    The iterations stop when the primal residual (the imbalance between the plants and the grid
+    connection) and the dual residual (the change of the grid purchase weighted by the penalty)
+    are within tolerance of the net import and of the multipliers. A tolerance below the
+    resolution of the linearised proximal term (the smallest of PROXIMAL_BREAKPOINTS) is not
+    reached. The plants are then solved at the multipliers without proximal term, which with the
+    cheapest grid purchase gives a lower bound (the plants alone at the energy price give
+    another), and at the energy price with their net import within bounds around the last one
+    that fit the grid connection (see get_bounds), which gives the per-plant and aggregate
+    schedules and an upper bound.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    time_start = perf_counter()
+    energy = asarray(prices['energy'][0:h], dtype=float64)
+    number_plants = len(portfolio)
+    capacity = (grid_capacity if grid_capacity is not None else inf) / number_plants
+    key = f"{id(portfolio)}-{perf_counter()}"
+    executors = create_shard_executors(workers)
+
+    def get_tasks(multipliers, target=None, rho=None, scale=None, lower=None, upper=None, values=False):
+        return [{'key': key, 'n': n, 'h': h, 'case': case, 'resources': resources, 'prices': prices,
+                 'solver_options': solver_options, 'multipliers': multipliers,
+                 'target': None if target is None else target[n], 'rho': rho, 'scale': scale,
+                 'lower': None if lower is None else lower[n], 'upper': None if upper is None else upper[n],
+                 'values': values}
+                for n, resources in enumerate(portfolio)]
+
+    def get_net_imports(results):
+        if not all([result['feasible'] for result in results]):
+            raise RuntimeError("A plant of the portfolio is infeasible")
+        return array([result['P_E'] for result in results])
+
+    try:
+        results = solve_plants(get_tasks(energy), executors)
+        P_E = get_net_imports(results)
+        lower_bound = sum([result['objective'] for result in results])
+        scale = maximum(abs(P_E).mean(axis=0), 1)
+        rho = rho_factor * maximum(abs(energy).mean(), 1e-10) / scale
+        mean_import = P_E.mean(axis=0)
+        purchase = mean_import.clip(0, capacity)
+        multipliers = energy + rho * (mean_import - purchase)
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            target = P_E - (mean_import - purchase)
+            P_E = get_net_imports(solve_plants(get_tasks(multipliers, target, rho, scale), executors))
+            mean_import = P_E.mean(axis=0)
+            previous_purchase = purchase
+            purchase = (mean_import + (multipliers - energy) / rho).clip(0, capacity)
+            multipliers = multipliers + rho * (mean_import - purchase)
+
+            primal_residual = number_plants * linalg.norm(mean_import - purchase)
+            dual_residual = number_plants * linalg.norm(rho * (purchase - previous_purchase))
+            relative_primal = primal_residual / maximum(number_plants * linalg.norm(mean_import), 1e-10)
+            relative_dual = dual_residual / maximum(number_plants * linalg.norm(multipliers), 1e-10)
+            if relative_primal <= tolerance and relative_dual <= tolerance:
+                converged = True
+                break
+            if relative_primal > BALANCING * relative_dual:
+                rho = rho * RHO_FACTOR
+            elif relative_dual > BALANCING * relative_primal:
+                rho = rho / RHO_FACTOR
+
+        dual = solve_plants(get_tasks(multipliers), executors)
+        total = get_net_imports(dual).sum(axis=0)
+        lower_bound = max(lower_bound, sum([result['objective'] for result in dual]) +
+                          float((energy - multipliers) @ get_grid_purchase(total, multipliers, prices, grid_capacity)))
+
+        lower, upper = get_bounds(P_E, grid_capacity)
+        schedules = solve_plants(get_tasks(energy, lower=lower, upper=upper, values=True), executors)
+    finally:
+        shutdown_shard_executors(executors)
+        for n in range(0, number_plants):
+            PLANTS.pop((key, n), None)
+
+    feasible = all([result['feasible'] for result in schedules])
+    upper_bound = sum([result['objective'] for result in schedules]) if feasible else None
+    gap = None
+    aggregate = {}
+    if feasible:
+        gap = (upper_bound - lower_bound) / maximum(abs(upper_bound), 1e-10)
+        for result in schedules:
+            for name, array_values in result['values'].items():
+                aggregate[name] = aggregate.get(name, 0) + nan_to_num(array_values)
+        aggregate['P_E_pos'] = array([result['P_E'] for result in schedules]).sum(axis=0)
+
+    return {'feasible': feasible, 'converged': converged, 'iterations': iteration, 'primal residual': primal_residual,
+            'objective': upper_bound, 'lower_bound': lower_bound, 'gap': gap, 'multipliers': multipliers,
+            'plants': [result['values'] for result in schedules] if feasible else None, 'aggregate': aggregate,
+            'time': perf_counter() - time_start}
+
+
+def benchmark_aggregator(case: int, h: int, plant_numbers: list = (5, 10, 20), workers: list = (1, 2, 4),
+                         capacity_factor: float = 0.8, solver_options: dict = None) -> list:
+    ''' Wall time of the portfolio model and of the decomposition as the plants and processes grow
+
+    The grid capacity is capacity_factor times the peak import of the portfolio without it.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options(threads=1)
+    prices = get_prices(case, h)
+
+    results = []
+    for number_plants in plant_numbers:
+        portfolio = create_portfolio(case, number_plants)
+        m = create_portfolio_model(portfolio, h, case, prices)
+        solve_optimization_model(m, solver_options)
+        grid_capacity = capacity_factor * max([m.P_E_pos[t].value for t in range(0, h)])
+
+        time_start = perf_counter()
+        m = create_portfolio_model(portfolio, h, case, prices, grid_capacity)
+        solve_status = solve_optimization_model(m, solver_options)
+        monolithic_time = perf_counter() - time_start
+        for number_workers in workers:
+            decomposition = run_aggregator(portfolio, h, case, prices, grid_capacity, solver_options, number_workers)
+            results.append({'case': case, 'h': h, 'plants': number_plants, 'workers': number_workers,
+                            'monolithic time (s)': monolithic_time, 'monolithic objective': solve_status['objective'],
+                            'decomposition time (s)': decomposition['time'],
+                            'decomposition objective': decomposition['objective'],
+                            'decomposition gap': decomposition['gap'], 'iterations': decomposition['iterations'],
+                            'converged': decomposition['converged'],
+                            'primal residual': decomposition['primal residual']})
+            print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_aggregator(1, 24)
@@ -0,0 +1,154 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from create_variables import get_variable_values
+
+
+# Variables of the objective function and of the PV cap that a backtest needs from a schedule
+SCHEDULE_VARIABLES = ['P_E_pos', 'P_E_neg', 'P_H2', 'P_EL_E', 'P_PV', 'U_sto_E', 'D_sto_E']
+
+# Prices of the objective function that change with the timestep, sampled by sample_scenarios
+TIME_PRICES = ['energy', 'energy_market', 'band', 'upward', 'downward']
+
+# Largest PV above the cap accepted as feasible (kW)
+TOLERANCE = 1e-6
+
+
+def get_schedule(m: ConcreteModel, h: int) -> dict:
+    ''' Arrays of the solved variables the backtest needs, zero for the variables the case does not have '''
+    values = get_variable_values(m, SCHEDULE_VARIABLES)
+    schedule = {}
+    for name in SCHEDULE_VARIABLES:
+        array_values = values.get(name, zeros(h))
+        schedule[name] = nan_to_num(array_values[..., 0:h])
+
+    return schedule
+
+
+def get_scenario_prices(prices: dict, price_scenarios: dict = None) -> dict:
+    ''' Prices of every scenario, as (scenarios, h) arrays for the prices with timesteps and (scenarios,) arrays
+    for the others
+
+    Prices missing from price_scenarios keep their value in prices for every scenario.
+    '''
+    price_scenarios = price_scenarios or {}
+    number_scenarios = max([atleast_2d(scenarios).shape[0] for scenarios in price_scenarios.values()], default=1)
+    scenario_prices = {}
+    for name, price in prices.items():
+        timesteps = ndim(price) > 0
+        price = asarray(price_scenarios.get(name, price), dtype=float64)
+        if timesteps:
+            scenario_prices[name] = broadcast_to(atleast_2d(price), (number_scenarios, price.shape[-1]))
+        else:
+            scenario_prices[name] = broadcast_to(price, (number_scenarios,))
+
+    return scenario_prices
+
+
+def backtest_schedule(schedule: dict, resources: dict, prices: dict, case: int, price_scenarios: dict = None,
+                      PV_profile_scenarios: ndarray = None) -> dict:
+    ''' Terms of the objective of run_optimization_model for a fixed schedule under many price and PV scenarios
+
+    price_scenarios maps names of get_prices to (scenarios, h) arrays, or (scenarios,) arrays
+    for the prices without timesteps. PV_profile_scenarios is a (scenarios, h) array of PV
+    profiles; the PV the schedule takes above the cap of a scenario is bought from the grid at the
+    energy price and the scenario is marked infeasible. The terms are added as in
+    create_objective_function, so the objective of the prices the model was solved with is its
+    objective value. Returns a (scenarios,) array per term.
+    '''
+    h = schedule['P_E_pos'].shape[-1]
+    electrolyzer = resources['electrolyzer']
+    scenario_prices = get_scenario_prices(prices, price_scenarios)
+    number_scenarios = scenario_prices['energy'].shape[0]
+
+    shortfall = zeros((number_scenarios, h))
+    if PV_profile_scenarios is not None:
+        PV_cap = resources['PV']['max_power'] * atleast_2d(asarray(PV_profile_scenarios, dtype=float64))[:, 0:h]
+        shortfall = (schedule['P_PV'][newaxis, :, :] - PV_cap[:, newaxis, :]).clip(0).sum(axis=1)
+        shortfall = broadcast_to(shortfall, (max(number_scenarios, shortfall.shape[0]), h))
+        number_scenarios = shortfall.shape[0]
+    P_E_pos = schedule['P_E_pos'] + shortfall
+
+    terms = {'energy': (broadcast_to(scenario_prices['energy'], (number_scenarios, h)) * P_E_pos).sum(axis=1) -
+                       scenario_prices['energy_market'] @ schedule['P_E_neg'],
+             'reserves': zeros(number_scenarios)}
+    if case == 3:
+        U_sto_E = schedule['U_sto_E'][0]
+        D_sto_E = schedule['D_sto_E'][0]
+        # As in create_objective_function, the reserve prices also weight their energy in place of the ratios
+        terms['reserves'] = - scenario_prices['band'] @ (U_sto_E + D_sto_E) + \
+                            (scenario_prices['downward'] ** 2) @ D_sto_E - (scenario_prices['upward'] ** 2) @ U_sto_E
+    terms['hydrogen'] = - scenario_prices['hydrogen'] * schedule['P_H2'].sum()
+    # The water and oxygen of the objective are those of the electrolyzer in the last timestep
+    terms['water'] = scenario_prices['water'] * schedule['P_EL_E'][:, h - 1].sum() * electrolyzer['c_H2O']
+    terms['oxygen'] = - scenario_prices['oxygen'] * schedule['P_EL_E'][:, h - 1].sum() * electrolyzer['c_O2']
+    terms['ammonia'] = - scenario_prices['ammonia'] * resources['load_ammonia'][0] * h
+
+    terms = {name: broadcast_to(term, (number_scenarios,)) for name, term in terms.items()}
+    terms['objective'] = sum([term for term in terms.values()], axis=0)
+    terms['PV shortfall'] = shortfall.sum(axis=1)
+    terms['feasible'] = terms['PV shortfall'] <= TOLERANCE
+
+    return terms
+
+
+def get_cost_distribution(terms: dict, percentiles: list = [5, 50, 95]) -> dict:
+    ''' Mean, standard deviation, extremes and percentiles of the objective over the scenarios '''
+    objective = terms['objective']
+    distribution = {'scenarios': len(objective), 'feasible': int(terms['feasible'].sum()),
+                    'mean': objective.mean(), 'std': objective.std(), 'min': objective.min(), 'max': objective.max()}
+    for percentile_value, percentile_level in zip(percentile(objective, percentiles), percentiles):
+        distribution[f'p{percentile_level}'] = percentile_value
+
+    return distribution
+
+
+def sample_scenarios(prices: dict, PV_profile: list, h: int, number_scenarios: int, price_sigma: float = 0.2,
+                     PV_sigma: float = 0.2, seed: int = 0) -> tuple:
+    ''' Price and PV profile scenarios with lognormal hourly deviations from the given prices and profile '''
+    rng = random.default_rng(seed)
+    price_scenarios = {name: asarray(prices[name][0:h]) * rng.lognormal(0, price_sigma, (number_scenarios, h))
+                       for name in TIME_PRICES}
+    PV_profile_scenarios = (asarray(PV_profile[0:h]) * rng.lognormal(0, PV_sigma, (number_scenarios, h))).clip(0, 1)
+
+    return price_scenarios, PV_profile_scenarios
+
+
+def benchmark_backtest(case: int, h: int, number_scenarios: int = 1000, solver_options: dict = None) -> dict:
+    ''' Solve a case once and backtest its schedule under many scenarios, compared with the solve time '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    m = ConcreteModel()
+    m.c1 = ConstraintList()
+    m = create_variables(m, h, 1, case, resources)
+    m = create_model(m, h, 1, resources, case)
+    solve_status = run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+    schedule = get_schedule(m, h)
+
+    nominal = backtest_schedule(schedule, resources, prices, case,
+                                PV_profile_scenarios=resources['PV']['PV_profile'][0:h])
+    price_scenarios, PV_profile_scenarios = sample_scenarios(prices, resources['PV']['PV_profile'], h,
+                                                             number_scenarios)
+    time_start = perf_counter()
+    terms = backtest_schedule(schedule, resources, prices, case, price_scenarios, PV_profile_scenarios)
+    backtest_time = perf_counter() - time_start
+
+    results = dict({'case': case, 'h': h, 'solve time (s)': solve_status['time'],
+                    'backtest time (ms)': backtest_time * 1000, 'objective': solve_status['objective'],
+                    'nominal backtest objective': nominal['objective'][0]}, **get_cost_distribution(terms))
+    print(results)
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_backtest(3, 24)
+    benchmark_backtest(2, 24 * 7 * 4)
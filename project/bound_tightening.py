@@ -0,0 +1,192 @@
+from numpy import *
+from pyomo.environ import *
+
+
+# Capacity limits of create_model, as upper bounds of the flows: flow: (resource, parameter).
+# The limits of the electrical storage reserves follow from U_sto_E_dis <= max_discharging - P_sto_E_dis
+# and D_sto_E_ch <= max_charging - P_sto_E_ch, which also bound the charging and discharging power.
+CAPACITY_BOUNDS = {'P_EL_E': ('electrolyzer', 'max_power'),
+                   'P_C_H2': ('hydrogen_compressor', 'max_power'),
+                   'P_sto_H2_ch': ('hydrogen_storage', 'max_charging'),
+                   'P_sto_H2_dis': ('hydrogen_storage', 'max_discharging'),
+
+                   'P_C_air': ('air_compressor', 'max_power'),
+                   'P_AS_N2': ('air_separation', 'max_energy_N2'),
+                   'P_C_N2': ('nitrogen_compressor', 'max_power'),
+                   'P_sto_N2_ch': ('nitrogen_storage', 'max_charging'),
+                   'P_sto_N2_dis': ('nitrogen_storage', 'max_discharging'),
+
+                   'P_AP': ('ammonia_plant', 'max_power_NH3'),
+                   'P_AP_H2': ('ammonia_plant', 'max_power_H2'),
+                   'P_AP_N2': ('ammonia_plant', 'max_power_N2'),
+                   'P_sto_NH3_ch': ('ammonia_storage', 'max_charging'),
+                   'P_sto_NH3_dis': ('ammonia_storage', 'max_discharging'),
+
+                   'P_sto_E_ch': ('electrical_storage', 'max_charging'),
+                   'P_sto_E_dis': ('electrical_storage', 'max_discharging'),
+                   'U_sto_E_dis': ('electrical_storage', 'max_discharging'),
+                   'D_sto_E_ch': ('electrical_storage', 'max_charging')}
+
+# State-of-charge of each storage and the first timestep create_model limits to max_capacity
+STORAGE_SOC = {'hydrogen_storage': ('soc_sto_H2', 0),
+               'nitrogen_storage': ('soc_sto_N2', 0),
+               'ammonia_storage': ('soc_sto_NH3', 0),
+               'electrical_storage': ('soc_sto_E', 1)}
+
+# Big-M of the reserve space constraints of the electrical storage in the original formulation
+BIG_M = 10000000
+
+
+def get_flow_balances(resources: dict, number_resources: int, case: int) -> list:
+    ''' Flow balances of create_model as (flow, sense, [(coefficient, flow), ...])
+
+    Each balance states that the flow is equal ('==') to, or at most ('<='), the sum of the
+    other flows times their coefficients. Every flow is non-negative. 'load_ammonia' is the
+    constant ammonia load.
+    '''
+    electrolyzer = resources['electrolyzer']
+    air_separation = resources['air_separation']
+    ammonia_plant = resources['ammonia_plant']
+
+    balances = [('P_EL_H2', '==', [(electrolyzer['transformation_factor'] * electrolyzer['efficiency'], 'P_EL_E')]),
+                ('P_EL_C_H2', '==', [(1, 'P_EL_H2')]),
+                ('P_EL_cooling', '==', [(electrolyzer['cooling_power'] / electrolyzer['max_power'], 'P_EL_E')]),
+                ('P_C_H2', '==', [(1, 'P_EL_C_H2')]),
+                ('P_C_H2_E', '==', [(resources['hydrogen_compressor']['alpha'], 'P_C_H2')]),
+                ('P_C_H2', '==', [(1, 'P_C_H2_sto_H2'), (1, 'P_C_H2_AP'), (1, 'P_C_H2_market')]),
+                ('P_sto_H2_ch', '==', [(1, 'P_C_H2_sto_H2')]),
+                ('P_sto_H2_dis', '==', [(1, 'P_sto_H2_AP'), (1, 'P_sto_H2_market')]),
+                ('P_H2', '<=', [(number_resources, 'P_C_H2_market'), (number_resources, 'P_sto_H2_market')]),
+
+                ('P_C_air_AS', '==', [(1, 'P_C_air')]),
+                ('P_C_air_E', '==', [(resources['air_compressor']['alpha'], 'P_C_air')]),
+                ('P_AS_air', '==', [(1, 'P_C_air_AS')]),
+                ('P_AS_N2', '==', [(air_separation['transformation_factor'], 'P_AS_air')]),
+                ('P_AS_E', '==', [(air_separation['alpha_E'], 'P_AS_N2')]),
+                ('P_AS_C_N2', '==', [(1, 'P_AS_N2')]),
+                ('P_C_N2', '==', [(1, 'P_AS_C_N2')]),
+                ('P_C_N2', '==', [(1, 'P_C_N2_sto_N2'), (1, 'P_C_N2_AP')]),
+                ('P_C_N2_E', '==', [(resources['nitrogen_compressor']['alpha'], 'P_C_N2')]),
+                ('P_sto_N2_ch', '==', [(1, 'P_C_N2_sto_N2')]),
+                ('P_sto_N2_dis', '==', [(1, 'P_sto_N2_AP')]),
+
+                ('P_AP', '==', [(ammonia_plant['alpha_H2'], 'P_AP_H2')]),
+                ('P_AP', '==', [(ammonia_plant['alpha_N2'], 'P_AP_N2')]),
+                ('P_AP_E', '==', [(ammonia_plant['alpha_E'], 'P_AP')]),
+                ('P_AP_H2', '==', [(ammonia_plant['efficiency_H2'], 'P_C_H2_AP'),
+                                   (ammonia_plant['efficiency_H2'], 'P_sto_H2_AP')]),
+                ('P_AP_N2', '==', [(ammonia_plant['efficiency_N2'], 'P_sto_N2_AP'),
+                                   (ammonia_plant['efficiency_N2'], 'P_C_N2_AP')]),
+                ('P_AP', '==', [(1, 'P_AP_sto_NH3'), (1, 'P_AP_load')]),
+                ('P_sto_NH3_ch', '==', [(1, 'P_AP_sto_NH3')]),
+                ('P_sto_NH3_dis', '==', [(1, 'P_sto_NH3_load')]),
+                ('P_sto_NH3_E', '==', [(resources['ammonia_storage']['alpha_E'], 'P_sto_NH3_ch'),
+                                       (resources['ammonia_storage']['alpha_E'], 'P_sto_NH3_dis')]),
+                ('load_ammonia', '==', [(1, 'P_sto_NH3_load'), (1, 'P_AP_load')])]
+
+    if case == 3:
+        balances += [('U_sto_E_ch', '<=', [(1, 'P_sto_E_ch')]),
+                     ('D_sto_E_dis', '<=', [(1, 'P_sto_E_dis')]),
+                     ('U_sto_E', '==', [(1, 'U_sto_E_ch'), (1, 'U_sto_E_dis')]),
+                     ('D_sto_E', '==', [(1, 'D_sto_E_ch'), (1, 'D_sto_E_dis')]),
+                     ('U_sto_E', '==', [(2, 'D_sto_E')])]
+
+    return balances
+
+
+def propagate_bounds(resources: dict, number_resources: int, case: int, iterations: int = 100) -> dict:
+    ''' Upper bound of every flow, from the capacity limits propagated through the flow balances
+
+    A flow equal to a sum is at most the sum of the bounds of its terms and, as every flow is
+    non-negative, each term is at most the bound of the flow over its coefficient.
+    '''
+    bounds = {flow: resources[resource][parameter] for flow, (resource, parameter) in CAPACITY_BOUNDS.items()
+              if resource in resources}
+    bounds['load_ammonia'] = max(resources['load_ammonia'])
+    balances = get_flow_balances(resources, number_resources, case)
+
+    for iteration in range(0, iterations):
+        changed = False
+        for flow, sense, terms in balances:
+            candidates = [(flow, sum([coefficient * bounds.get(term, inf) for coefficient, term in terms]))]
+            if sense == '==':
+                candidates += [(term, bounds.get(flow, inf) / coefficient) for coefficient, term in terms]
+            for name, bound in candidates:
+                if bound < bounds.get(name, inf) * (1 - 1e-9):
+                    bounds[name] = bound
+                    changed = True
+        if not changed:
+            break
+
+    return bounds
+
+
+def get_big_M(resources: dict, bounds: dict = None) -> dict:
+    ''' Smallest big-M of the reserve space constraints of the electrical storage
+
+    The reserves are at most max_charging + max_discharging, as U_sto_E_ch + D_sto_E_ch <= max_charging
+    and U_sto_E_dis + D_sto_E_dis <= max_discharging. The spaces only have to cover the reserves of the
+    next timestep and the power left to the limits, so they never need more than the same value.
+    '''
+    storage = resources['electrical_storage']
+    big_M = storage['max_charging'] + storage['max_discharging']
+    if bounds is not None:
+        big_M = min(big_M, bounds.get('U_sto_E', inf) + bounds.get('D_sto_E', inf))
+
+    return {'reserves': big_M, 'space': big_M}
+
+
+def apply_bounds(m: ConcreteModel, h: int, number_resources: int, resources: dict, case: int) -> ConcreteModel:
+    ''' Set the propagated bounds as upper bounds of the variables of the model '''
+    bounds = propagate_bounds(resources, number_resources, case)
+
+    for name, bound in bounds.items():
+        var = m.component(name)
+        if var is None or var.ctype is not Var or not isfinite(bound):
+            continue
+        for data in var.values():
+            data.setub(bound)
+
+    for storage, (name, first) in STORAGE_SOC.items():
+        var = m.component(name)
+        if var is None or storage not in resources:
+            continue
+        for i in range(0, number_resources):
+            for t in range(first, h + first):
+                var[i, t].setub(resources[storage]['max_capacity'])
+
+    return m
+
+
+def benchmark_bound_tightening(case: int, h: int, solver_options: dict = None) -> list:
+    ''' Compare nodes explored and solve time of the original and the tightened formulation '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model, get_solver_options
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = []
+    for tighten in [False, True]:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources)
+        m = create_model(m, h, 1, resources, case, tighten)
+        solve_status = run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+        results.append({'case': case, 'h': h, 'tighten': tighten, 'nodes': solve_status['nodes'],
+                        'time (s)': solve_status['time'], 'objective': solve_status['objective']})
+        print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_bound_tightening(3, 24)
+    benchmark_bound_tightening(3, 48)
+    benchmark_bound_tightening(2, 24 * 7)
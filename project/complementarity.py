@@ -0,0 +1,161 @@
+from numpy import *
+from pyomo.environ import *
+
+
+# Complementarity binary of each storage, the flows equal to its charging, its discharging, and the
+# routes of the discharging as (flow from the storage, flow to the same consumer that skips the storage)
+STORAGE_BINARIES = {'hydrogen_storage': {'binary': 'b_sto_H2_ch',
+                                         'charge': ['P_sto_H2_ch', 'P_C_H2_sto_H2'],
+                                         'discharge': 'P_sto_H2_dis',
+                                         'routes': [('P_sto_H2_AP', 'P_C_H2_AP'),
+                                                    ('P_sto_H2_market', 'P_C_H2_market')]},
+                    'nitrogen_storage': {'binary': 'b_sto_N2_ch',
+                                         'charge': ['P_sto_N2_ch', 'P_C_N2_sto_N2'],
+                                         'discharge': 'P_sto_N2_dis',
+                                         'routes': [('P_sto_N2_AP', 'P_C_N2_AP')]},
+                    'ammonia_storage': {'binary': 'b_sto_NH3_ch',
+                                        'charge': ['P_sto_NH3_ch', 'P_AP_sto_NH3'],
+                                        'discharge': 'P_sto_NH3_dis',
+                                        'routes': [('P_sto_NH3_load', 'P_AP_load')]}}
+
+# Largest simultaneous charging and discharging accepted as zero
+TOLERANCE = 1e-6
+
+
+def get_redundant_binaries(resources: dict) -> dict:
+    ''' Storages whose complementarity binary is redundant, with their power limits and how the
+    solution without the binary is completed
+
+    Without losses, charging and discharging a storage in the same timestep leaves the
+    state-of-charge unchanged, and the same flow can skip the storage. For a storage without
+    handling energy ('exact') any solution is netted into one without simultaneous flows and
+    the same objective. With handling energy ('checked'), simultaneous flows can only pay off
+    when the energy is free or paid for, so the solution is checked and the binary restored
+    if they appear.
+    '''
+    redundant = {}
+    for storage in STORAGE_BINARIES:
+        if storage not in resources or resources[storage]['efficiency'] != 1:
+            continue
+        redundant[storage] = {'completion': 'exact' if resources[storage].get('alpha_E', 0) == 0 else 'checked',
+                              'max_charging': resources[storage]['max_charging'],
+                              'max_discharging': resources[storage]['max_discharging']}
+
+    return redundant
+
+
+def restore_binaries(m: ConcreteModel, storages: list) -> ConcreteModel:
+    ''' Add the complementarity constraints of the storages back to the model '''
+    for storage in storages:
+        limits = m.relaxed_binaries.pop(storage)
+        flows = STORAGE_BINARIES[storage]
+        binary = m.component(flows['binary'])
+        charge = m.component(flows['charge'][0])
+        discharge = m.component(flows['discharge'])
+        for index in binary:
+            m.c1.add(charge[index] <= binary[index] * limits['max_charging'])
+            m.c1.add(discharge[index] <= (1 - binary[index]) * limits['max_discharging'])
+
+    return m
+
+
+def set_flow_value(flow, index, flow_value: float) -> None:
+    ''' Set the value of a flow (the flows of the lean formulation follow their definition) '''
+    if flow.ctype is Var:
+        flow[index].set_value(max(flow_value, 0), skip_validation=True)
+
+
+def net_simultaneous_flows(m: ConcreteModel, storage: str) -> ConcreteModel:
+    ''' Send the flows that enter and leave the storage in the same timestep directly to their consumers '''
+    flows = STORAGE_BINARIES[storage]
+    charge = [m.component(name) for name in flows['charge']]
+    discharge = m.component(flows['discharge'])
+    routes = [(m.component(storage_flow), m.component(direct_flow)) for storage_flow, direct_flow in flows['routes']]
+
+    for index in discharge:
+        discharge_value = value(discharge[index])
+        net = min(value(charge[0][index]), discharge_value)
+        if net <= 0:
+            continue
+        for storage_flow, direct_flow in routes:
+            rerouted = net * value(storage_flow[index]) / discharge_value
+            set_flow_value(storage_flow, index, value(storage_flow[index]) - rerouted)
+            set_flow_value(direct_flow, index, value(direct_flow[index]) + rerouted)
+        for flow in charge:
+            set_flow_value(flow, index, value(flow[index]) - net)
+        set_flow_value(discharge, index, discharge_value - net)
+
+    return m
+
+
+def get_simultaneous_flows(m: ConcreteModel, storage: str) -> float:
+    ''' Largest flow that is charged and discharged in the same timestep '''
+    flows = STORAGE_BINARIES[storage]
+    charge = m.component(flows['charge'][0])
+    discharge = m.component(flows['discharge'])
+
+    return max([min(value(charge[index]), value(discharge[index])) for index in discharge], default=0)
+
+
+def complete_relaxed_solution(m: ConcreteModel) -> list:
+    ''' Complete the solution of every block with relaxed binaries
+
+    Nets the simultaneous flows of the 'exact' storages, checks the others and sets every
+    dropped binary to 1 when the storage charges and 0 otherwise. Returns the (block, storage)
+    pairs that still charge and discharge in the same timestep.
+    '''
+    simultaneous = []
+    for block in m.block_data_objects(active=True):
+        for storage, limits in getattr(block, 'relaxed_binaries', {}).items():
+            if limits['completion'] == 'exact':
+                block = net_simultaneous_flows(block, storage)
+            if get_simultaneous_flows(block, storage) > TOLERANCE:
+                simultaneous.append((block, storage))
+                continue
+            charge = block.component(STORAGE_BINARIES[storage]['charge'][0])
+            for index, data in block.component(STORAGE_BINARIES[storage]['binary']).items():
+                data.set_value(1 if value(charge[index]) > TOLERANCE else 0, skip_validation=True)
+
+    return simultaneous
+
+
+def has_relaxed_binaries(m: ConcreteModel) -> bool:
+    ''' Whether any block of the model was built without some complementarity binaries '''
+    return any([bool(getattr(block, 'relaxed_binaries', None)) for block in m.block_data_objects(active=True)])
+
+
+def benchmark_relaxed_binaries(case: int, h: int, solver_options: dict = None) -> list:
+    ''' Compare nodes explored and solve time with and without the redundant complementarity binaries '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables, count_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model, get_solver_options
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = []
+    for relax in [False, True]:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources)
+        m = create_model(m, h, 1, resources, case, relax=relax)
+        solve_status = run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+        binaries = count_variables(m)['binaries'] - int(sum([len(m.component(STORAGE_BINARIES[storage]['binary']))
+                                                             for storage in m.relaxed_binaries]))
+        results.append({'case': case, 'h': h, 'relax': relax, 'binaries': binaries, 'nodes': solve_status['nodes'],
+                        'time (s)': solve_status['time'], 'objective': solve_status['objective'],
+                        'simultaneous flows': max([get_simultaneous_flows(m, storage) for storage in STORAGE_BINARIES])})
+        print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_relaxed_binaries(1, 24 * 4)
+    benchmark_relaxed_binaries(2, 24 * 7 * 4)
+    benchmark_relaxed_binaries(3, 24)
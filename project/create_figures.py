@@ -1,19 +1,28 @@
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from results import get_total, get_series
+
 
 OUTPUT_DIR = Path(__file__).parent.parent / "data/figures"
 
-def create_pie_chart(input_data, color_list, labels, title, name_file, case_nr):
-    plt.figure(figsize=(7, 5))
-    plt.subplots_adjust(left=0, right=0.6, top=1, bottom=0)
-    _,_,texts  = plt.pie(input_data, labels=None, colors=color_list,
+def draw_pie_chart(fig, input_data, color_list, labels, title):
+    ''' Draw a pie chart into an empty figure (see render_figures) '''
+    fig.subplots_adjust(left=0, right=0.6, top=1, bottom=0)
+    ax = fig.add_subplot()
+    _,_,texts  = ax.pie(input_data, labels=None, colors=color_list,
             autopct='%1.0f%%', pctdistance=1.2)
 
     for text, color in zip(texts, color_list):
         text.set_color(color)
 
-    plt.legend(loc=(1, 0.5), labels=labels, frameon=False, title=title)
+    ax.legend(loc=(1, 0.5), labels=labels, frameon=False, title=title)
+
+    return fig
+
+def create_pie_chart(input_data, color_list, labels, title, name_file, case_nr):
+    fig = plt.figure(figsize=(7, 5))
+    draw_pie_chart(fig, input_data, color_list, labels, title)
 
     if case_nr == 1:
         OUTPUT_DIR = Path(__file__).parent.parent / "data/figures - case1"
@@ -29,15 +38,15 @@ def create_pie_chart(input_data, color_list, labels, title, name_file, case_nr):
 
 
 
-def crete_figures_total_electricity(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def crete_figures_total_electricity(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
 
     labels = 'Network', 'PV systems'
 
     if VALUES_FROM_MODEL:
-        total_electricity_from_PV = sum(m.P_PV[0, t]() for t in range(0, h))
-        total_electricity_from_net = sum(m.P_E[t]() for t in range(0, h))
-        total_electricity_from_net_week = [m.P_E[t]() for t in range(0, h)]
-        total_electricity_from_PV_week = [m.P_PV[0, t]() for t in range(0, h)]
+        total_electricity_from_PV = get_total(results, 'P_PV')
+        total_electricity_from_net = get_total(results, 'P_E')
+        total_electricity_from_net_week = get_series(results, 'P_E')
+        total_electricity_from_PV_week = get_series(results, 'P_PV')
         x = [i for i in range(0, h)]
     else:
         total_electricity_from_net = 0.4
@@ -61,20 +70,20 @@ def crete_figures_total_electricity(m, h, case_nr, VALUES_FROM_MODEL = 1, create
 
     return input_data, color_list, labels, title
 
-def crete_figures_electricity_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def crete_figures_electricity_use(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
     if VALUES_FROM_MODEL:
-        air_compressor = sum(m.P_C_air_E[0, t]() for t in range(0, h))
-        air_separator = sum(m.P_AS_E[0, t]() for t in range(0, h))
-        nitrogen_compressor = sum(m.P_C_N2_E[0, t]() for t in range(0, h))
-        electrolyzer = sum(m.P_EL_E[0, t]() + m.P_EL_cooling[0, t]() for t in range(0, h))
-        hydrogen_compressor = sum(m.P_C_H2_E[0, t]() for t in range(0, h))
-        recycling_air_unit = sum(m.P_AP_E[0, t]() for t in range(0, h))
-        ammonia_storage = sum(m.P_sto_NH3_E[0, t]() for t in range(0, h))
+        air_compressor = get_total(results, 'P_C_air_E')
+        air_separator = get_total(results, 'P_AS_E')
+        nitrogen_compressor = get_total(results, 'P_C_N2_E')
+        electrolyzer = get_total(results, 'P_EL_E') + get_total(results, 'P_EL_cooling')
+        hydrogen_compressor = get_total(results, 'P_C_H2_E')
+        recycling_air_unit = get_total(results, 'P_AP_E')
+        ammonia_storage = get_total(results, 'P_sto_NH3_E')
         if case_nr == 2:
-            electricity_market = sum(m.P_E_neg[t]() for t in range(0, h))
+            electricity_market = get_total(results, 'P_E_neg')
         if case_nr == 3:
-            electricity_market = sum(m.P_E_neg[t]() for t in range(0, h))
-            reserves = sum(m.P_sto_E_ch[0, t]() for t in range(0, h))
+            electricity_market = get_total(results, 'P_E_neg')
+            reserves = get_total(results, 'P_sto_E_ch')
     else:
         air_compressor = 1
         air_separator = 2
@@ -119,15 +128,15 @@ def crete_figures_electricity_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_f
 
     return input_data, color_list, labels, title
 
-def create_figures_hydrogen_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def create_figures_hydrogen_use(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
 
 
 
     if VALUES_FROM_MODEL:
-        hydrogen_to_storage = sum(m.P_C_H2_sto_H2[0, t]() for t in range(0, h))
-        hydrogen_to_ammonia_plant = sum(m.P_C_H2_AP[0, t]() for t in range(0, h))
+        hydrogen_to_storage = get_total(results, 'P_C_H2_sto_H2')
+        hydrogen_to_ammonia_plant = get_total(results, 'P_C_H2_AP')
         if case_nr in [2, 3]:
-            hydrogen_to_market = sum(m.P_H2[t]() for t in range(0, h))
+            hydrogen_to_market = get_total(results, 'P_H2')
 
     else:
         hydrogen_to_storage = 0.4
@@ -151,12 +160,12 @@ def create_figures_hydrogen_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_fig
 
     return input_data, color_list, labels, title
 
-def create_figures_nitrogen_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def create_figures_nitrogen_use(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
     labels = 'Nitrogen storage', 'Ammonia plant'
 
     if VALUES_FROM_MODEL:
-        nitrogen_to_storage = sum(m.P_C_N2_sto_N2[0, t]() for t in range(0, h))
-        nitrogen_to_ammonia_plant = sum(m.P_C_N2_AP[0, t]() for t in range(0, h))
+        nitrogen_to_storage = get_total(results, 'P_C_N2_sto_N2')
+        nitrogen_to_ammonia_plant = get_total(results, 'P_C_N2_AP')
     else:
         nitrogen_to_storage = 0.4
         nitrogen_to_ammonia_plant = 0.6
@@ -174,12 +183,12 @@ def create_figures_nitrogen_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_fig
 
     return input_data, color_list, labels, title
 
-def create_figures_ammonia_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def create_figures_ammonia_use(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
     labels = 'Ammonia storage', 'Ammonia load'
 
     if VALUES_FROM_MODEL:
-        ammonia_to_storage = sum(m.P_AP_sto_NH3[0, t]() for t in range(0, h))
-        ammonia_to_load = sum(m.P_AP_load[0, t]() for t in range(0, h))
+        ammonia_to_storage = get_total(results, 'P_AP_sto_NH3')
+        ammonia_to_load = get_total(results, 'P_AP_load')
     else:
         ammonia_to_storage = 0.4
         ammonia_to_load = 0.6
@@ -197,20 +206,20 @@ def create_figures_ammonia_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figu
 
     return input_data, color_list, labels, title
 
-def crete_figures_electrical_storage_use(m, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
+def crete_figures_electrical_storage_use(results, h, case_nr, VALUES_FROM_MODEL = 1, create_figure = 1):
     if VALUES_FROM_MODEL:
-        air_compressor = sum(m.P_C_air_E[0, t]() for t in range(0, h))
-        air_separator = sum(m.P_AS_E[0, t]() for t in range(0, h))
-        nitrogen_compressor = sum(m.P_C_N2_E[0, t]() for t in range(0, h))
-        electrolyzer = sum(m.P_EL_E[0, t]() + m.P_EL_cooling[0, t]() for t in range(0, h))
-        hydrogen_compressor = sum(m.P_C_H2_E[0, t]() for t in range(0, h))
-        recycling_air_unit = sum(m.P_AP_E[0, t]() for t in range(0, h))
-        ammonia_storage = sum(m.P_sto_NH3_E[0, t]() for t in range(0, h))
+        air_compressor = get_total(results, 'P_C_air_E')
+        air_separator = get_total(results, 'P_AS_E')
+        nitrogen_compressor = get_total(results, 'P_C_N2_E')
+        electrolyzer = get_total(results, 'P_EL_E') + get_total(results, 'P_EL_cooling')
+        hydrogen_compressor = get_total(results, 'P_C_H2_E')
+        recycling_air_unit = get_total(results, 'P_AP_E')
+        ammonia_storage = get_total(results, 'P_sto_NH3_E')
         if case_nr == 2:
-            electricity_market = sum(m.P_E_neg[t]() for t in range(0, h))
+            electricity_market = get_total(results, 'P_E_neg')
         if case_nr == 3:
-            electricity_market = sum(m.P_E_neg[t]() for t in range(0, h))
-            reserves = sum(m.P_sto_E_ch[0, t]() for t in range(0, h))
+            electricity_market = get_total(results, 'P_E_neg')
+            reserves = get_total(results, 'P_sto_E_ch')
     else:
         air_compressor = 1
         air_separator = 2
@@ -267,34 +276,33 @@ def create_pie_chart_all_figures(input_data, color_list, labels, title, ax, i, j
 
     ax[i, j].legend(loc=(1, 0.5), labels=labels, frameon=False, title=title)
 
-def create_all_figures(m, h, case_nr):
+def create_all_figures(results, h, case_nr):
 
     fig, axs = plt.subplots(3, 2, figsize=(20, 8))
     #fig.suptitle('Vertically stacked subplots')
 
     ###################################################################################################################
-    input_data, color_list, labels, title = crete_figures_total_electricity(m, h, 0)
+    input_data, color_list, labels, title = crete_figures_total_electricity(results, h, case_nr, 1, 0)
     create_pie_chart_all_figures(input_data, color_list, labels, title, axs, 0, 0)
 
     ###################################################################################################################
-    input_data, color_list, labels, title = crete_figures_electricity_use(m, h, 0)
+    input_data, color_list, labels, title = crete_figures_electricity_use(results, h, case_nr, 1, 0)
     create_pie_chart_all_figures(input_data, color_list, labels, title, axs, 0, 1)
 
     ###################################################################################################################
-    input_data, color_list, labels, title = create_figures_hydrogen_use(m, h, 0)
+    input_data, color_list, labels, title = create_figures_hydrogen_use(results, h, case_nr, 1, 0)
     create_pie_chart_all_figures(input_data, color_list, labels, title, axs, 1, 0)
 
     ###################################################################################################################
-    input_data, color_list, labels, title = create_figures_nitrogen_use(m, h, 0)
+    input_data, color_list, labels, title = create_figures_nitrogen_use(results, h, case_nr, 1, 0)
     create_pie_chart_all_figures(input_data, color_list, labels, title, axs, 1, 1)
 
     ###################################################################################################################
-    input_data, color_list, labels, title = create_figures_ammonia_use(m, h, 0)
+    input_data, color_list, labels, title = create_figures_ammonia_use(results, h, case_nr, 1, 0)
     create_pie_chart_all_figures(input_data, color_list, labels, title, axs, 2, 0)
 
     ###################################################################################################################
-    input_data, color_list, labels, title = create_figures_ammonia_use(m, h, 0)
-    create_pie_chart_all_figures([], [], [], [], axs, 2, 1)
+    axs[2, 1].axis('off')
 
     ###################################################################################################################
     plt.subplots_adjust(left=0, right=0.85, top=0.96, bottom=0)
@@ -310,14 +318,14 @@ def create_all_figures(m, h, case_nr):
 
 
 
-def create_figures(m, h, case_nr, save_figure_option, show_figure_option):
+def create_figures(results, h, case_nr, save_figure_option, show_figure_option):
     if 1:
-        crete_figures_total_electricity(m, h, case_nr)
-        crete_figures_electricity_use(m, h, case_nr)
+        crete_figures_total_electricity(results, h, case_nr)
+        crete_figures_electricity_use(results, h, case_nr)
 
-        create_figures_hydrogen_use(m, h, case_nr)
-        create_figures_nitrogen_use(m, h, case_nr)
-        create_figures_ammonia_use(m, h, case_nr)
+        create_figures_hydrogen_use(results, h, case_nr)
+        create_figures_nitrogen_use(results, h, case_nr)
+        create_figures_ammonia_use(results, h, case_nr)
 
     #create_all_figures(m, h)
 
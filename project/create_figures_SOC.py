@@ -3,39 +3,88 @@ from pathlib import Path
 from random import *
 import numpy as np
 
+from results import get_series
+
 
 OUTPUT_DIR = Path(__file__).parent.parent / "data/figures"
 VALUES_FROM_MODEL = 1
 
+# Largest number of points drawn per series of the SOC and PV charts (None draws every hour)
+MAX_POINTS = 2000
 
 
 
 
-def create_pie_chart_soc(input_data, x, color_list, labels, name_file, max_soc, case_nr):
-    plt.figure(figsize=(15, 5))
-    plt.subplots_adjust(left=0.1, right=0.8, top=0.9, bottom=0.1)
 
-    plt.plot(x, input_data[1], color="#C00000", label=labels[1], linewidth=2)
-    plt.scatter(x, input_data[0],  c = input_data[0], vmin=0, vmax=max_soc, cmap=color_list, zorder=2, s=3)
-    #plt.plot(x, input_data[0], color='#FFE36D', label=labels[0], linewidth=0.5, zorder=1)
-    plt.plot(x, input_data[0], color='#D8DBDB', label=labels[0], linewidth=0.5, zorder=1)
+def downsample(x, y, max_points=MAX_POINTS):
+    ''' Min/max binning of a series to at most max_points points
+
+    Keeps the first and last point and the smallest and largest point of every bin, in time
+    order, so the peaks and the limits of the series are drawn as with every point.
+    '''
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    if not max_points or len(y) <= max_points:
+        return x, y
+
+    number_bins = max(1, (max_points - 2) // 2)
+    bin_size = int(np.ceil(len(y) / number_bins))
+    bins = np.full(number_bins * bin_size, np.nan)
+    bins[0:len(y)] = y
+    bins = bins.reshape(number_bins, bin_size)
+    full_bins = ~np.isnan(bins).all(axis=1)
+    offsets = np.arange(0, number_bins)[full_bins] * bin_size
+    indices = np.unique(np.concatenate([[0, len(y) - 1],
+                                        offsets + np.nanargmin(bins[full_bins], axis=1),
+                                        offsets + np.nanargmax(bins[full_bins], axis=1)]))
+
+    return x[indices], y[indices]
+
+def draw_time_series(fig, input_data, x, cmap, labels, max_value, ylabel, max_points=MAX_POINTS, rasterized=True):
+    ''' Draw a series coloured by its value under its limit into an empty figure (see render_figures)
+
+    Both series are downsampled to max_points (see downsample) and their artists rasterized, so a
+    vector export embeds them as one image while the axes and text stay vectors.
+    '''
+    fig.subplots_adjust(left=0.1, right=0.8, top=0.9, bottom=0.1)
+    ax = fig.add_subplot()
+
+    x_limit, limit = downsample(x, input_data[1], max_points)
+    x_series, series = downsample(x, input_data[0], max_points)
+    ax.plot(x_limit, limit, color="#C00000", label=labels[1], linewidth=2, rasterized=rasterized)
+    points = ax.scatter(x_series, series,  c = series, vmin=0, vmax=max_value, cmap=cmap, zorder=2, s=3,
+                        rasterized=rasterized)
+    ax.plot(x_series, series, color='#D8DBDB', label=labels[0], linewidth=0.5, zorder=1, rasterized=rasterized)
+
+    fig.colorbar(points, ax=ax)
+    ax.set_xlabel('Time (h)')
+    ax.set_ylabel(ylabel)
+    ax.set_xlim(left=0, right=len(x))
+    ax.set_xticks(np.arange(min(x), max(x) + 2, 24 * 30))
+
+    ax.grid(False)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_visible(False)
 
-    plt.colorbar()
-    plt.xlabel('Time (h)')
-    plt.ylabel('State-of-charge (%)')
-    plt.xlim(right=len(x))  # adjust the right leaving left unchanged
-    plt.xlim(left=0)
-    plt.xticks(np.arange(min(x), max(x) + 2, 24 * 30))
-    plt.ylim(top=100)  # adjust the right leaving left unchanged
-    plt.ylim(bottom=0)
+    return ax
 
+def draw_soc_chart(fig, input_data, x, color_list, labels, max_soc, max_points=MAX_POINTS):
+    ''' Draw a state-of-charge chart (%) into an empty figure '''
+    ax = draw_time_series(fig, input_data, x, color_list, labels, max_soc, 'State-of-charge (%)', max_points)
+    ax.set_ylim(bottom=0, top=100)
 
-    #plt.legend(loc=(1, 0.5), labels=labels, frameon=False)
+    return fig
 
-    plt.grid(False)
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    plt.gca().spines['left'].set_visible(False)
+def draw_pv_chart(fig, input_data, x, color_list, labels, max_soc, max_points=MAX_POINTS):
+    ''' Draw the PV generation chart (MW) into an empty figure '''
+    draw_time_series(fig, input_data, x, 'YlOrRd', labels, max_soc, 'Power (MW)', max_points)
+
+    return fig
+
+def create_pie_chart_soc(input_data, x, color_list, labels, name_file, max_soc, case_nr):
+    fig = plt.figure(figsize=(15, 5))
+    draw_soc_chart(fig, input_data, x, color_list, labels, max_soc)
 
     if case_nr == 1:
         OUTPUT_DIR = Path(__file__).parent.parent / "data/figures - case1"
@@ -48,14 +97,14 @@ def create_pie_chart_soc(input_data, x, color_list, labels, name_file, max_soc,
 
     return plt
 
-def create_figures_hydrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
+def create_figures_hydrogen_soc(results, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
     labels = 'State-of-charge', 'Maximum state-of-charge'
 
 
     if VALUES_FROM_MODEL:
         max_soc = resources['hydrogen_storage']['max_capacity']
-        print(m.soc_sto_H2[0, 0](), max_soc)
-        hydrogen_to_storage = [m.soc_sto_H2[0, t]()/max_soc * 100 for t in range(0, h)]
+        print(get_series(results, 'soc_sto_H2')[0], max_soc)
+        hydrogen_to_storage = get_series(results, 'soc_sto_H2') / max_soc * 100
         print(hydrogen_to_storage)
         hydrogen_to_ammonia_plant = [100 for t in range(0, h)]
         x = [i for i in range(0, h)]
@@ -80,14 +129,14 @@ def create_figures_hydrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, cre
 
     return input_data, color_list, labels
 
-def create_figures_nitrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
+def create_figures_nitrogen_soc(results, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
     labels = 'State-of-charge', 'Maximum state-of-charge'
 
 
     if VALUES_FROM_MODEL:
         max_soc = resources['nitrogen_storage']['max_capacity']
-        print(m.soc_sto_H2[0, 0](), max_soc)
-        hydrogen_to_storage = [m.soc_sto_N2[0, t]()/max_soc * 100 for t in range(0, h)]
+        print(get_series(results, 'soc_sto_H2')[0], max_soc)
+        hydrogen_to_storage = get_series(results, 'soc_sto_N2') / max_soc * 100
         #hydrogen_to_storage = [hydrogen_to_storage[t] for t in range(48, h - 24 * 6)]
         print(hydrogen_to_storage)
         hydrogen_to_ammonia_plant = [100 for t in range(0, h)]
@@ -113,14 +162,14 @@ def create_figures_nitrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, cre
 
     return input_data, color_list, labels
 
-def create_figures_ammonia_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
+def create_figures_ammonia_soc(results, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
     labels = 'State-of-charge', 'Maximum state-of-charge'
 
 
     if VALUES_FROM_MODEL:
         max_soc = resources['ammonia_storage']['max_capacity']
-        print(m.soc_sto_H2[0, 0](), max_soc)
-        hydrogen_to_storage = [m.soc_sto_NH3[0, t]()/max_soc * 100 for t in range(0, h)]
+        print(get_series(results, 'soc_sto_H2')[0], max_soc)
+        hydrogen_to_storage = get_series(results, 'soc_sto_NH3') / max_soc * 100
         print(hydrogen_to_storage)
         hydrogen_to_ammonia_plant = [100 for t in range(0, h)]
         x = [i for i in range(0, h)]
@@ -143,14 +192,14 @@ def create_figures_ammonia_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, crea
 
     return input_data, color_list, labels
 
-def create_figures_electricity_soc(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
+def create_figures_electricity_soc(results, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
     labels = 'State-of-charge', 'Maximum state-of-charge'
 
 
     if VALUES_FROM_MODEL:
         max_soc = resources['electrical_storage']['max_capacity']
-        print(m.soc_sto_E[0, 0](), max_soc)
-        electricity_to_storage = [m.soc_sto_E[0, t]()/max_soc * 100 for t in range(0, h)]
+        print(get_series(results, 'soc_sto_E')[0], max_soc)
+        electricity_to_storage = get_series(results, 'soc_sto_E') / max_soc * 100
         print(electricity_to_storage)
         hydrogen_to_ammonia_plant = [100 for t in range(0, h)]
 
@@ -178,27 +227,8 @@ def create_figures_electricity_soc(m, h, resources, case_nr, VALUES_FROM_MODEL,
 
 
 def create_pie_chart_pv(input_data, x, color_list, labels, name_file, max_soc, case_nr):
-    plt.figure(figsize=(15, 5))
-    plt.subplots_adjust(left=0.1, right=0.8, top=0.9, bottom=0.1)
-
-    plt.plot(x, input_data[1], color="#C00000", label=labels[1], linewidth=2)
-    plt.scatter(x, input_data[0],  c = input_data[0], vmin=0, vmax=max_soc, cmap='YlOrRd', zorder=2, s=3)
-    #plt.plot(x, input_data[0], color='#FFE36D', label=labels[0], linewidth=0.5, zorder=1)
-    plt.plot(x, input_data[0], color='#D8DBDB', label=labels[0], linewidth=0.5, zorder=1)
-
-    plt.colorbar()
-    plt.xlabel('Time (h)')
-    plt.ylabel('Power (MW)')
-    plt.xlim(right=len(x))  # adjust the right leaving left unchanged
-    plt.xlim(left=0)
-    plt.xticks(np.arange(min(x), max(x) + 2, 24 * 30))
-
-    #plt.legend(loc=(1, 0.5), labels=labels, frameon=False)
-
-    plt.grid(False)
-    plt.gca().spines['top'].set_visible(False)
-    plt.gca().spines['right'].set_visible(False)
-    plt.gca().spines['left'].set_visible(False)
+    fig = plt.figure(figsize=(15, 5))
+    draw_pv_chart(fig, input_data, x, color_list, labels, max_soc)
 
     if case_nr == 1:
         OUTPUT_DIR = Path(__file__).parent.parent / "data/figures - case1"
@@ -212,14 +242,14 @@ def create_pie_chart_pv(input_data, x, color_list, labels, name_file, max_soc, c
 
     return plt
 
-def create_figures_pv(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
+def create_figures_pv(results, h, resources, case_nr, VALUES_FROM_MODEL, create_figure = 1):
     labels = 'State-of-charge', 'Maximum state-of-charge'
 
 
     if VALUES_FROM_MODEL:
         max_soc = resources['PV']['max_power']
-        print(m.P_PV[0, 0]()/1000, max_soc)
-        PV = [m.P_PV[0, t]()/1000 for t in range(0, h)]
+        print(get_series(results, 'P_PV')[0]/1000, max_soc)
+        PV = get_series(results, 'P_PV') / 1000
         PV_max = [max_soc/1000 for t in range(0, h)]
         x = [i for i in range(0, h)]
         print(PV)
@@ -247,13 +277,49 @@ def create_figures_pv(m, h, resources, case_nr, VALUES_FROM_MODEL, create_figure
 
 
 
-def create_figures_SOC(m, h, resources, case_nr, VALUES_FROM_MODEL = 1):
+def create_figures_SOC(results, h, resources, case_nr, VALUES_FROM_MODEL = 1):
     if 1:
-        create_figures_electricity_soc(m, h, resources, case_nr, VALUES_FROM_MODEL)
-        create_figures_ammonia_soc(m, h, resources, case_nr, VALUES_FROM_MODEL)
-        create_figures_nitrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL)
-        create_figures_hydrogen_soc(m, h, resources, case_nr, VALUES_FROM_MODEL)
-        create_figures_pv(m, h, resources, case_nr, VALUES_FROM_MODEL)
+        create_figures_electricity_soc(results, h, resources, case_nr, VALUES_FROM_MODEL)
+        create_figures_ammonia_soc(results, h, resources, case_nr, VALUES_FROM_MODEL)
+        create_figures_nitrogen_soc(results, h, resources, case_nr, VALUES_FROM_MODEL)
+        create_figures_hydrogen_soc(results, h, resources, case_nr, VALUES_FROM_MODEL)
+        create_figures_pv(results, h, resources, case_nr, VALUES_FROM_MODEL)
+
+
+
+def benchmark_downsampling(h=24 * 365, max_points=MAX_POINTS):
+    ''' Time and size of a yearly SOC chart in PNG and SVG with every point and downsampled '''
+    from io import BytesIO
+    from time import perf_counter
+    plt.switch_backend('Agg')
+
+    rng = np.random.default_rng(0)
+    soc = np.clip(50 + np.cumsum(rng.normal(0, 2, h)), 0, 100)
+    soc[h // 3] = 100    # a one-hour peak and trough that must stay visible
+    soc[2 * h // 3] = 0
+    input_data = [soc, [100 for t in range(0, h)]]
+    x = [i for i in range(0, h)]
+    labels = 'State-of-charge', 'Maximum state-of-charge'
+
+    benchmarks = []
+    for mode, points, rasterized in [('every point', None, False), ('downsampled', max_points, True)]:
+        benchmark = {'h': h, 'mode': mode, 'points': len(downsample(x, soc, points)[0])}
+        for file_format in ['png', 'svg']:
+            fig = plt.figure(figsize=(15, 5))
+            ax = draw_time_series(fig, input_data, x, 'Blues', labels, 100, 'State-of-charge (%)', points,
+                                  rasterized)
+            data = ax.collections[0].get_offsets()[:, 1]
+            file = BytesIO()
+            time_start = perf_counter()
+            fig.savefig(file, format=file_format, dpi=300)
+            benchmark[f'{file_format} time (s)'] = perf_counter() - time_start
+            benchmark[f'{file_format} size (kB)'] = len(file.getvalue()) / 1000
+            plt.close(fig)
+        benchmark['same extremes'] = bool(data.min() == soc.min() and data.max() == soc.max())
+        benchmarks.append(benchmark)
+        print(benchmark)
+
+    return benchmarks
 
 
 
@@ -1,29 +1,25 @@
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from results import get_total
 
 
 
-def create_figures_bar(m, h, case_nr, values_from_model = 1):
-
-    #fig, axs = plt.subplots(3, 2, figsize=(20, 8))
-    #fig.suptitle('Vertically stacked subplots')
-
-    fig, ax = plt.subplots()
-
 
+def get_bar_data(results, h, case_nr, values_from_model = 1):
+    ''' Products, amounts, labels and colours of the bought and sold products '''
     if values_from_model:
-        water = round(sum(m.P_EL_C_H2[0, t]() * 10  for t in range(0, h))/1000, 0)
-        electricity_bought = round(sum(m.P_E_pos[t]() for t in range(0, h))/1000, 0)
-        electricity_sold = round(sum(m.P_E_neg[t]() for t in range(0, h)) / 1000, 0)
+        water = round(get_total(results, 'P_EL_C_H2') * 10 / 1000, 0)
+        electricity_bought = round(get_total(results, 'P_E_pos')/1000, 0)
+        electricity_sold = round(get_total(results, 'P_E_neg') / 1000, 0)
         ammonia = 36792
-        oxygen = round(sum(m.P_EL_C_H2[0, t]() * 8.304 for t in range(0, h))/1000, 0)
+        oxygen = round(get_total(results, 'P_EL_C_H2') * 8.304 / 1000, 0)
 
         if case_nr == 2:
             print(case_nr)
             n_case = 13
             products = ['Water', 'Electricity \n bought', 'Electricity \n sold','Ammonia', 'Oxygen', 'Hydrogen']
-            hydrogen = round(sum(m.P_H2[t]() for t in range(0, h)) / 1000, 0)
+            hydrogen = round(get_total(results, 'P_H2') / 1000, 0)
             counts = [water * n_case, electricity_bought  * n_case, electricity_sold * n_case,
                       ammonia, oxygen * n_case, hydrogen * n_case]  # multiply by 12 months
 
@@ -33,8 +29,8 @@ def create_figures_bar(m, h, case_nr, values_from_model = 1):
         elif case_nr == 3:
             n_case = 13 * 7
             products = ['Water', 'Electricity \n bought', 'Electricity \n sold', 'Reserves \n sold','Ammonia', 'Oxygen', 'Hydrogen']
-            hydrogen = round(sum(m.P_H2[t]() for t in range(0, h)) / 1000, 0)
-            reserves = round(sum(m.U_sto_E[0, t]() + m.D_sto_E[0, t]() for t in range(0, h)) / 1000, 0)
+            hydrogen = round(get_total(results, 'P_H2') / 1000, 0)
+            reserves = round((get_total(results, 'U_sto_E') + get_total(results, 'D_sto_E')) / 1000, 0)
             counts = [water * n_case, electricity_bought * n_case, electricity_sold * n_case, reserves * n_case,
                       ammonia, oxygen * n_case, hydrogen * n_case]  # multiply by 12 months
 
@@ -56,25 +52,23 @@ def create_figures_bar(m, h, case_nr, values_from_model = 1):
             bar_labels = ['Water (kL)', 'Electricity (MWh)', 'Ammonia (ton)', 'Oxygen (ton)', 'Hydrogen (kg)']
             bar_colors = ['#BDD7EE', '#FFC000', '#C5E0B4', '#AFABAB', '#37CBFF']
 
+    return products, counts, bar_labels, bar_colors
 
 
-
-
+def draw_bar_chart(fig, products, counts, bar_labels, bar_colors):
+    ''' Draw the bought and sold products into an empty figure (see render_figures) '''
+    ax = fig.add_subplot()
     ax.bar(products, counts, label=bar_labels, color=bar_colors, edgecolor='w')
-    i = 0
     for i, bars in enumerate(ax.containers):
         bars_all = ax.bar_label(bars, label_type='center', color='w')
-        if case_nr == 2:
-            bars_all[5].set_color('#808080')
-            bars_all[5].set_position([1,5])
-        elif case_nr == 3:
-            bars_all[6].set_color('#808080')
-            bars_all[6].set_position([1,5])
+        if products[-1] == 'Hydrogen':
+            bars_all[-1].set_color('#808080')
+            bars_all[-1].set_position([1,5])
 
     #ax.xaxis.set_visible(False)
     ax.yaxis.set_visible(False)
     #ax.set_ylabel('fruit supply')
-    plt.ylabel(None)
+    ax.set_ylabel(None)
     ax.set_title('Bought and sold products')
     ax.legend(title='Products')
     #ax.axis(color='w')
@@ -84,6 +78,17 @@ def create_figures_bar(m, h, case_nr, values_from_model = 1):
     ax.spines['left'].set_visible(False)
     ax.spines['bottom'].set_color('#DDDDDD')
 
+    return fig
+
+
+def create_figures_bar(results, h, case_nr, values_from_model = 1):
+
+    #fig, axs = plt.subplots(3, 2, figsize=(20, 8))
+    #fig.suptitle('Vertically stacked subplots')
+
+    fig = plt.figure()
+    draw_bar_chart(fig, *get_bar_data(results, h, case_nr, values_from_model))
+
     if case_nr == 1:
         OUTPUT_DIR = Path(__file__).parent.parent / "data/figures - case1"
     elif case_nr == 2:
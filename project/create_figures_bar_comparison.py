@@ -2,10 +2,12 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 import numpy as np
 
+from results import get_total
 
 
 
-def create_figures_bar(m, h, case_nr, values_from_model = 1):
+
+def create_figures_bar(results, h, case_nr, values_from_model = 1):
 
     #fig, axs = plt.subplots(3, 2, figsize=(20, 8))
     #fig.suptitle('Vertically stacked subplots')
@@ -15,17 +17,17 @@ def create_figures_bar(m, h, case_nr, values_from_model = 1):
     plt.subplots_adjust(left=0.1, right=0.8, top=0.9, bottom=0.1)
 
     if values_from_model:
-        water = round(sum(m.P_EL_C_H2[0, t]() * 10  for t in range(0, h))/1000, 0)
-        electricity_bought = round(sum(m.P_E_pos[t]() for t in range(0, h))/1000, 0)
-        electricity_sold = round(sum(m.P_E_neg[t]() for t in range(0, h)) / 1000, 0)
+        water = round(get_total(results, 'P_EL_C_H2') * 10 / 1000, 0)
+        electricity_bought = round(get_total(results, 'P_E_pos')/1000, 0)
+        electricity_sold = round(get_total(results, 'P_E_neg') / 1000, 0)
         ammonia = 36792
-        oxygen = round(sum(m.P_EL_C_H2[0, t]() * 8.304 for t in range(0, h))/1000, 0)
+        oxygen = round(get_total(results, 'P_EL_C_H2') * 8.304 / 1000, 0)
 
         if case_nr == 2:
             print(case_nr)
             n_case = 13
             products = ['Water', 'Electricity \n bought', 'Electricity \n sold','Ammonia', 'Oxygen', 'Hydrogen']
-            hydrogen = round(sum(m.P_H2[t]() for t in range(0, h)) / 1000, 0)
+            hydrogen = round(get_total(results, 'P_H2') / 1000, 0)
             counts = [water * n_case, electricity_bought  * n_case, electricity_sold * n_case,
                       ammonia, oxygen * n_case, hydrogen * n_case]  # multiply by 12 months
 
@@ -35,8 +37,8 @@ def create_figures_bar(m, h, case_nr, values_from_model = 1):
         elif case_nr == 3:
             n_case = 13 * 7
             products = ['Water', 'Electricity \n bought', 'Electricity \n sold', 'Reserves \n sold','Ammonia', 'Oxygen', 'Hydrogen']
-            hydrogen = round(sum(m.P_H2[t]() for t in range(0, h)) / 1000, 0)
-            reserves = round(sum(m.U_sto_E[0, t]() + m.D_sto_E[0, t]() for t in range(0, h)) / 1000, 0)
+            hydrogen = round(get_total(results, 'P_H2') / 1000, 0)
+            reserves = round((get_total(results, 'U_sto_E') + get_total(results, 'D_sto_E')) / 1000, 0)
             counts = [water * n_case, electricity_bought * n_case, electricity_sold * n_case, reserves * n_case,
                       ammonia, oxygen * n_case, hydrogen * n_case]  # multiply by 12 months
 
@@ -1,37 +1,145 @@
 from numpy import *
 from pyomo.environ import *
 
-
-def create_model(m: ConcreteModel, h: int, number_resources: int, resources: dict, case: int) -> ConcreteModel:
-    ''' Create models of resources '''
-
-    m = create_bidding_model(m, h, number_resources, case)
+from bound_tightening import BIG_M, propagate_bounds, get_big_M, apply_bounds
+from complementarity import get_redundant_binaries
+from symmetry import create_symmetry_breaking_model
+
+
+def create_model(m: ConcreteModel, h: int, number_resources: int, resources: dict, case: int,
+                 tighten: bool = True, relax: bool = True, grid: bool = True,
+                 symmetry: bool = False) -> ConcreteModel:
+    ''' Create models of resources
+
+    With tighten, the big-M of the electrical storage is derived from the resources and the
+    variables get the upper bounds propagated from the capacity limits (see bound_tightening).
+    With relax, the lossless storages are built without their charging binaries (see complementarity).
+    Without grid, P_E is the net import of a plant that shares its grid connection (see aggregator).
+    With symmetry, the identical units are ordered (see symmetry).
+    '''
+    m.relaxed_binaries = get_redundant_binaries(resources) if relax else {}
+    m.block_size = {}
+    m.n_constraints = get_number_constraints(m)
+
+    m = create_bidding_model(m, h, number_resources, case, grid)
+    m = record_block_size(m, 'bidding')
     m = create_PV_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'PV')
 
     m = create_electrolyzer_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'electrolyzer')
     m = create_compressor_hydrogen_model(m, h, number_resources, resources, case)
+    m = record_block_size(m, 'hydrogen_compressor')
     m = create_storage_hydrogen_model(m, h, number_resources, resources, case)
+    m = record_block_size(m, 'hydrogen_storage')
 
     m = create_compressor_air_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'air_compressor')
     m = create_air_separation_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'air_separation')
     m = create_compressor_nitrogen_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'nitrogen_compressor')
     m = create_storage_nitrogen_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'nitrogen_storage')
 
     m = create_ammonia_plant_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'ammonia_plant')
     m = create_storage_ammonia_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'ammonia_storage')
     m = create_ammonia_load_model(m, h, number_resources, resources)
+    m = record_block_size(m, 'load_ammonia')
 
     if case == 3:
-        1
-        m = create_storage_electrical_model(m, h, number_resources, resources)
+        big_M = get_big_M(resources, propagate_bounds(resources, number_resources, case)) if tighten \
+            else {'reserves': BIG_M, 'space': BIG_M}
+        m = create_storage_electrical_model(m, h, number_resources, resources, big_M)
+        m = record_block_size(m, 'electrical_storage')
         m = create_market_constraints(m, h, number_resources)
+        m = record_block_size(m, 'market')
+
+    if symmetry:
+        m = create_symmetry_breaking_model(m, h, number_resources, resources, case)
+        m = record_block_size(m, 'symmetry')
+
+    if tighten:
+        m = apply_bounds(m, h, number_resources, resources, case)
+
+    return m
+
 
+def record_block_size(m: ConcreteModel, block: str) -> ConcreteModel:
+    ''' Store the number of constraints added by the last block '''
+    m.block_size[block] = get_number_constraints(m) - m.n_constraints
+    m.n_constraints = get_number_constraints(m)
 
     return m
 
 
-def create_bidding_model(m: ConcreteModel(), h: int, number_resources: int, case: int) -> ConcreteModel:
-    ''' Create bidding model '''
+def get_number_constraints(m: Block) -> int:
+    ''' Number of active constraints of a model, or of a block of a larger model '''
+    return len(list(m.component_data_objects(Constraint, active=True, descend_into=True)))
+
+
+def check_model_size(h: int, number_resources: int, resources: dict, case: int) -> dict:
+    ''' Check that every block grows linearly with the horizon
+
+    Builds the model for h // 2 and h timesteps and raises a ValueError if any
+    block more than doubles its number of constraints when the horizon doubles.
+    Returns the number of constraints per block for the horizon h.
+    '''
+    from create_variables import create_variables
+
+    block_size = []
+    for horizon in [h // 2, h]:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, horizon, number_resources, case, resources)
+        m = create_model(m, horizon, number_resources, resources, case)
+        block_size.append(m.block_size)
+
+    for block in block_size[1]:
+        if block_size[1][block] > 2 * block_size[0][block] + 2:
+            raise ValueError(f"Block {block} grows faster than the horizon: "
+                             f"{block_size[0][block]} constraints for h = {h // 2}, "
+                             f"{block_size[1][block]} constraints for h = {h}")
+
+    return block_size[1]
+
+
+def benchmark_lean_model(case: int, h: int, solver_options: dict = None) -> list:
+    ''' Compare the size, build time and solve of the full and the lean formulation '''
+    from time import perf_counter
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables, count_variables
+    from run_optimization_model import run_optimization_model, get_solver_options
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = []
+    for lean in [False, True]:
+        time_start = perf_counter()
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources, lean)
+        m = create_model(m, h, 1, resources, case)
+        build_time = perf_counter() - time_start
+        solve_status = run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+        results.append(dict({'case': case, 'h': h, 'lean': lean, 'constraints': get_number_constraints(m),
+                             'build time (s)': build_time, 'total time (s)': perf_counter() - time_start,
+                             'objective': solve_status['objective']}, **count_variables(m)))
+        print(results[-1])
+
+    return results
+
+
+def create_bidding_model(m: ConcreteModel(), h: int, number_resources: int, case: int,
+                         grid: bool = True) -> ConcreteModel:
+    ''' Create bidding model (without grid, P_E can be negative and P_E_neg is not forced to zero) '''
     for t in range(0, h):
         resources_power = 0
 
@@ -64,13 +172,10 @@ def create_bidding_model(m: ConcreteModel(), h: int, number_resources: int, case
 
         m.c1.add(m.P_E[t] == resources_power)
         m.c1.add(m.P_E_pos[t] - m.P_E_neg[t] == m.P_E[t])
-        m.c1.add(m.P_E_pos[t] + m.P_E_neg[t] == m.P_E[t])
-        if 1:
-            for t in range(0, h):
-                m.c1.add(m.P_H2[t] == sum(m.P_C_H2_market[i, t] + m.P_sto_H2_market[i, t]
-                                          for i in range(0, number_resources)))
-
-
+        if grid:
+            m.c1.add(m.P_E_pos[t] + m.P_E_neg[t] == m.P_E[t])
+        m.c1.add(m.P_H2[t] == sum(m.P_C_H2_market[i, t] + m.P_sto_H2_market[i, t]
+                                  for i in range(0, number_resources)))
 
     return m
 
@@ -94,7 +199,8 @@ def create_PV_model(m: ConcreteModel(), h: int, number_resources: int, resources
 
     return m
 
-def create_storage_electrical_model(m: ConcreteModel(), h: int, number_resources: int, resources: dict) -> ConcreteModel:
+def create_storage_electrical_model(m: ConcreteModel(), h: int, number_resources: int, resources: dict,
+                                    big_M: dict) -> ConcreteModel:
     ''' Create electrical storage model '''
     rend_sto_E = resources['electrical_storage']['efficiency']
     soc_sto_E_max = resources['electrical_storage']['max_capacity']
@@ -102,11 +208,13 @@ def create_storage_electrical_model(m: ConcreteModel(), h: int, number_resources
     P_sto_E_dis_max = resources['electrical_storage']['max_discharging']
     P_sto_E_ch_max = resources['electrical_storage']['max_charging']
     soc_sto_E_init = resources['electrical_storage']['initial_soc']
+    soc_sto_E_final = resources['electrical_storage'].get('final_soc', soc_sto_E_init)
 
 
     for i in range(0, number_resources):
-        m.c1.add(m.soc_sto_E[i, 0] == soc_sto_E_init)
-        m.c1.add(m.soc_sto_E[i, h] >= soc_sto_E_init)
+        if not resources['electrical_storage'].get('linked', False):
+            m.c1.add(m.soc_sto_E[i, 0] == soc_sto_E_init)
+            m.c1.add(m.soc_sto_E[i, h] >= soc_sto_E_final)
 
         for t in range(0, h):
             m.c1.add(m.soc_sto_E[i, t + 1] == m.soc_sto_E[i, t] + (m.P_sto_E_ch[i, t] * rend_sto_E - m.P_sto_E_dis[i, t] / rend_sto_E))
@@ -138,9 +246,9 @@ def create_storage_electrical_model(m: ConcreteModel(), h: int, number_resources
                 m.P_sto_E_ch_space[i, t + 1] + m.P_sto_E_dis_space[i, t + 1])
 
             m.c1.add(m.U_sto_E_ch[i, t] + m.U_sto_E_dis[i, t] + m.D_sto_E_ch[i, t] + m.D_sto_E_dis[i, t] <=
-                m.b_sto_E_space[i, t] * 10000000)
+                m.b_sto_E_space[i, t] * big_M['reserves'])
 
-            m.c1.add(m.P_sto_E_ch_space[i, t] + m.P_sto_E_dis_space[i, t] <= (1 - m.b_sto_E_space[i, t]) * 10000000)
+            m.c1.add(m.P_sto_E_ch_space[i, t] + m.P_sto_E_dis_space[i, t] <= (1 - m.b_sto_E_space[i, t]) * big_M['space'])
 
 
     return m
@@ -156,9 +264,12 @@ def create_electrolyzer_model(m: ConcreteModel(), h: int, number_resources: int,
 
     for j in range(0, number_resources):
         for t in range(0, h):
-            m.c1.add(m.P_EL_H2[j, t] == transformation_factor * efficiency * m.P_EL_E[j, t])
-            m.c1.add(m.P_EL_H2[j, t] == m.P_EL_C_H2[j, t])
-            m.c1.add(m.P_EL_cooling[j, t] == m.P_EL_E[j, t] / maximum_power * cooling_power)
+            if 'P_EL_H2' not in m.aliases:
+                m.c1.add(m.P_EL_H2[j, t] == transformation_factor * efficiency * m.P_EL_E[j, t])
+            if 'P_EL_C_H2' not in m.aliases:
+                m.c1.add(m.P_EL_H2[j, t] == m.P_EL_C_H2[j, t])
+            if 'P_EL_cooling' not in m.aliases:
+                m.c1.add(m.P_EL_cooling[j, t] == m.P_EL_E[j, t] / maximum_power * cooling_power)
             m.c1.add(m.P_EL_E[j, t] <= maximum_power)
 
     return m
@@ -169,8 +280,10 @@ def create_compressor_hydrogen_model(m: ConcreteModel(), h: int, number_resource
     maximum_power = resources['hydrogen_compressor']['max_power']
     for t in range(0, h):
         for j in range(0, number_resources):
-            m.c1.add(m.P_C_H2[j, t] == m.P_EL_C_H2[j, t])
-            m.c1.add(m.P_C_H2_E[j, t] == alpha * m.P_C_H2[j, t])
+            if 'P_C_H2' not in m.aliases:
+                m.c1.add(m.P_C_H2[j, t] == m.P_EL_C_H2[j, t])
+            if 'P_C_H2_E' not in m.aliases:
+                m.c1.add(m.P_C_H2_E[j, t] == alpha * m.P_C_H2[j, t])
             m.c1.add(m.P_C_H2[j, t] <= maximum_power)
 
             if case in [1, 2, 3]:
@@ -188,10 +301,12 @@ def create_storage_hydrogen_model(m: ConcreteModel(), h: int, number_resources:
     max_power_dis = resources['hydrogen_storage']['max_discharging']
     max_power_ch = resources['hydrogen_storage']['max_charging']
     soc_initial = resources['hydrogen_storage']['initial_soc']
+    soc_final = resources['hydrogen_storage'].get('final_soc', soc_initial)
 
     for i in range(0, number_resources):
-        m.c1.add(m.soc_sto_H2[i, 0] == soc_initial)
-        m.c1.add(m.soc_sto_H2[i, h] >= soc_initial)
+        if not resources['hydrogen_storage'].get('linked', False):
+            m.c1.add(m.soc_sto_H2[i, 0] == soc_initial)
+            m.c1.add(m.soc_sto_H2[i, h] >= soc_final)
 
         for t in range(0, h):
             m.c1.add(m.soc_sto_H2[i, t + 1] == m.soc_sto_H2[i, t] +
@@ -199,8 +314,12 @@ def create_storage_hydrogen_model(m: ConcreteModel(), h: int, number_resources:
             m.c1.add(m.soc_sto_H2[i, t] <= max_soc)
             m.c1.add(m.soc_sto_H2[i, t] >= min_soc)
             m.c1.add(m.P_sto_H2_ch[i, t] == m.P_C_H2_sto_H2[i, t])
-            m.c1.add(m.P_sto_H2_ch[i, t] <= m.b_sto_H2_ch[i, t] * max_power_ch)
-            m.c1.add(m.P_sto_H2_dis[i, t] <= (1 - m.b_sto_H2_ch[i, t]) * max_power_dis)
+            if 'hydrogen_storage' in m.relaxed_binaries:
+                m.c1.add(m.P_sto_H2_ch[i, t] <= max_power_ch)
+                m.c1.add(m.P_sto_H2_dis[i, t] <= max_power_dis)
+            else:
+                m.c1.add(m.P_sto_H2_ch[i, t] <= m.b_sto_H2_ch[i, t] * max_power_ch)
+                m.c1.add(m.P_sto_H2_dis[i, t] <= (1 - m.b_sto_H2_ch[i, t]) * max_power_dis)
 
             if case in [1, 2, 3]:
                 m.c1.add(m.P_sto_H2_dis[i, t] == m.P_sto_H2_AP[i, t] + m.P_sto_H2_market[i, t])
@@ -216,8 +335,10 @@ def create_compressor_air_model(m: ConcreteModel(), h: int, number_resources: in
     maximum_power = resources['air_compressor']['max_power']
     for t in range(0, h):
         for j in range(0, number_resources):
-            m.c1.add(m.P_C_air[j, t] == m.P_C_air_AS[j, t])
-            m.c1.add(m.P_C_air_E[j, t] == alpha * m.P_C_air[j, t])
+            if 'P_C_air_AS' not in m.aliases:
+                m.c1.add(m.P_C_air[j, t] == m.P_C_air_AS[j, t])
+            if 'P_C_air_E' not in m.aliases:
+                m.c1.add(m.P_C_air_E[j, t] == alpha * m.P_C_air[j, t])
             m.c1.add(m.P_C_air[j, t] <= maximum_power)
 
     return m
@@ -229,10 +350,14 @@ def create_air_separation_model(m: ConcreteModel(), h: int, number_resources: in
     maximum_energy_N2 = resources['air_separation']['max_energy_N2']
     for t in range(0, h):
         for j in range(0, number_resources):
-            m.c1.add(m.P_AS_N2[j, t] == transformation_factor * m.P_AS_air[j, t])
-            m.c1.add(m.P_AS_E[j, t] == alpha_E * m.P_AS_N2[j, t])
-            m.c1.add(m.P_AS_air[j, t] == m.P_C_air_AS[j, t])
-            m.c1.add(m.P_AS_N2[j, t] == m.P_AS_C_N2[j, t])
+            if 'P_AS_N2' not in m.aliases:
+                m.c1.add(m.P_AS_N2[j, t] == transformation_factor * m.P_AS_air[j, t])
+            if 'P_AS_E' not in m.aliases:
+                m.c1.add(m.P_AS_E[j, t] == alpha_E * m.P_AS_N2[j, t])
+            if 'P_AS_air' not in m.aliases:
+                m.c1.add(m.P_AS_air[j, t] == m.P_C_air_AS[j, t])
+            if 'P_AS_C_N2' not in m.aliases:
+                m.c1.add(m.P_AS_N2[j, t] == m.P_AS_C_N2[j, t])
             m.c1.add(m.P_AS_N2[j, t] <= maximum_energy_N2)
 
     return m
@@ -243,9 +368,11 @@ def create_compressor_nitrogen_model(m: ConcreteModel(), h: int, number_resource
     maximum_power = resources['nitrogen_compressor']['max_power']
     for t in range(0, h):
         for j in range(0, number_resources):
-            m.c1.add(m.P_C_N2[j, t] == m.P_AS_C_N2[j, t])
+            if 'P_C_N2' not in m.aliases:
+                m.c1.add(m.P_C_N2[j, t] == m.P_AS_C_N2[j, t])
             m.c1.add(m.P_C_N2[j, t] == m.P_C_N2_sto_N2[j, t] + m.P_C_N2_AP[j, t])
-            m.c1.add(m.P_C_N2_E[j, t] == alpha * m.P_C_N2[j, t])
+            if 'P_C_N2_E' not in m.aliases:
+                m.c1.add(m.P_C_N2_E[j, t] == alpha * m.P_C_N2[j, t])
             m.c1.add(m.P_C_N2[j, t] <= maximum_power)
 
     return m
@@ -258,10 +385,12 @@ def create_storage_nitrogen_model(m: ConcreteModel(), h: int, number_resources:
     max_power_dis = resources['nitrogen_storage']['max_discharging']
     max_power_ch = resources['nitrogen_storage']['max_charging']
     soc_initial = resources['nitrogen_storage']['initial_soc']
+    soc_final = resources['nitrogen_storage'].get('final_soc', soc_initial)
 
     for i in range(0, number_resources):
-        m.c1.add(m.soc_sto_N2[i, 0] == soc_initial)
-        m.c1.add(m.soc_sto_N2[i, h] >= soc_initial)
+        if not resources['nitrogen_storage'].get('linked', False):
+            m.c1.add(m.soc_sto_N2[i, 0] == soc_initial)
+            m.c1.add(m.soc_sto_N2[i, h] >= soc_final)
 
         for t in range(0, h):
             m.c1.add(m.soc_sto_N2[i, t + 1] == m.soc_sto_N2[i, t] +
@@ -270,8 +399,12 @@ def create_storage_nitrogen_model(m: ConcreteModel(), h: int, number_resources:
             m.c1.add(m.soc_sto_N2[i, t] >= min_soc)
             m.c1.add(m.P_sto_N2_ch[i, t] == m.P_C_N2_sto_N2[i, t])
             m.c1.add(m.P_sto_N2_dis[i, t] == m.P_sto_N2_AP[i, t])
-            m.c1.add(m.P_sto_N2_ch[i, t] <= m.b_sto_N2_ch[i, t] * max_power_ch)
-            m.c1.add(m.P_sto_N2_dis[i, t] <= (1 - m.b_sto_N2_ch[i, t]) * max_power_dis)
+            if 'nitrogen_storage' in m.relaxed_binaries:
+                m.c1.add(m.P_sto_N2_ch[i, t] <= max_power_ch)
+                m.c1.add(m.P_sto_N2_dis[i, t] <= max_power_dis)
+            else:
+                m.c1.add(m.P_sto_N2_ch[i, t] <= m.b_sto_N2_ch[i, t] * max_power_ch)
+                m.c1.add(m.P_sto_N2_dis[i, t] <= (1 - m.b_sto_N2_ch[i, t]) * max_power_dis)
 
     return m
 
@@ -293,7 +426,8 @@ def create_ammonia_plant_model(m: ConcreteModel(), h: int, number_resources: int
         for t in range(0, h):
             m.c1.add(m.P_AP[i, t] == alpha_H2 * m.P_AP_H2[i, t])
             m.c1.add(m.P_AP[i, t] == alpha_N2 * m.P_AP_N2[i, t])
-            m.c1.add(m.P_AP_E[i, t] == alpha_E * m.P_AP[i, t])
+            if 'P_AP_E' not in m.aliases:
+                m.c1.add(m.P_AP_E[i, t] == alpha_E * m.P_AP[i, t])
 
             m.c1.add(m.P_AP_H2[i, t] == eff_H2 * (m.P_C_H2_AP[i, t] + m.P_sto_H2_AP[i, t]))
             m.c1.add(m.P_AP_N2[i, t] == eff_N2 * (m.P_sto_N2_AP[i, t] + m.P_C_N2_AP[i, t]))
@@ -313,22 +447,31 @@ def create_storage_ammonia_model(m: ConcreteModel(), h: int, number_resources: i
     max_power_dis = resources['ammonia_storage']['max_discharging']
     max_power_ch = resources['ammonia_storage']['max_charging']
     soc_initial = resources['ammonia_storage']['initial_soc']
+    soc_final = resources['ammonia_storage'].get('final_soc', soc_initial)
     alpha_E = resources['ammonia_storage']['alpha_E']
 
     for i in range(0, number_resources):
-        m.c1.add(m.soc_sto_NH3[i, 0] == soc_initial)
-        m.c1.add(m.soc_sto_NH3[i, h] >= soc_initial)
+        if not resources['ammonia_storage'].get('linked', False):
+            m.c1.add(m.soc_sto_NH3[i, 0] == soc_initial)
+            m.c1.add(m.soc_sto_NH3[i, h] >= soc_final)
 
         for t in range(0, h):
             m.c1.add(m.soc_sto_NH3[i, t + 1] == m.soc_sto_NH3[i, t] +
                      (m.P_sto_NH3_ch[i, t] * efficiency - m.P_sto_NH3_dis[i, t] / efficiency))
             m.c1.add(m.soc_sto_NH3[i, t] <= max_soc)
             m.c1.add(m.soc_sto_NH3[i, t] >= min_soc)
-            m.c1.add(m.P_sto_NH3_ch[i, t] == m.P_AP_sto_NH3[i, t])
-            m.c1.add(m.P_sto_NH3_dis[i, t] == m.P_sto_NH3_load[i, t])
-            m.c1.add(m.P_sto_NH3_ch[i, t] <= m.b_sto_NH3_ch[i, t] * max_power_ch)
-            m.c1.add(m.P_sto_NH3_dis[i, t] <= (1 - m.b_sto_NH3_ch[i, t]) * max_power_dis)
-            m.c1.add(m.P_sto_NH3_E[i, t] == (m.P_sto_NH3_ch[i, t] + m.P_sto_NH3_dis[i, t]) * alpha_E)
+            if 'P_AP_sto_NH3' not in m.aliases:
+                m.c1.add(m.P_sto_NH3_ch[i, t] == m.P_AP_sto_NH3[i, t])
+            if 'P_sto_NH3_load' not in m.aliases:
+                m.c1.add(m.P_sto_NH3_dis[i, t] == m.P_sto_NH3_load[i, t])
+            if 'ammonia_storage' in m.relaxed_binaries:
+                m.c1.add(m.P_sto_NH3_ch[i, t] <= max_power_ch)
+                m.c1.add(m.P_sto_NH3_dis[i, t] <= max_power_dis)
+            else:
+                m.c1.add(m.P_sto_NH3_ch[i, t] <= m.b_sto_NH3_ch[i, t] * max_power_ch)
+                m.c1.add(m.P_sto_NH3_dis[i, t] <= (1 - m.b_sto_NH3_ch[i, t]) * max_power_dis)
+            if 'P_sto_NH3_E' not in m.aliases:
+                m.c1.add(m.P_sto_NH3_E[i, t] == (m.P_sto_NH3_ch[i, t] + m.P_sto_NH3_dis[i, t]) * alpha_E)
 
     return m
 
@@ -341,3 +484,6 @@ def create_ammonia_load_model(m: ConcreteModel(), h: int, number_resources: int,
     return m
 
 
+if __name__ == '__main__':
+    benchmark_lean_model(1, 24 * 4)
+    benchmark_lean_model(2, 24 * 7 * 4)
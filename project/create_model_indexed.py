@@ -0,0 +1,420 @@
+from numpy import *
+from pyomo.environ import *
+from time import *
+import tracemalloc
+
+from create_model import record_block_size
+from bound_tightening import get_big_M, apply_bounds
+from complementarity import get_redundant_binaries
+
+
+def create_model_indexed(m: ConcreteModel, h: int, number_resources: int, resources: dict, case: int,
+                         relax: bool = True) -> ConcreteModel:
+    ''' Create models of resources with indexed constraint blocks
+
+    Builds the same constraints as create_model, but each block is declared as an
+    indexed Constraint over (resource, t) with a rule instead of being appended one
+    expression at a time to m.c1. With relax, the lossless storages are built without
+    their charging binaries, as in create_model (see complementarity).
+    '''
+    m.relaxed_binaries = get_redundant_binaries(resources) if relax else {}
+    m.block_size = {}
+    m.n_constraints = m.nconstraints()
+
+    m.resources = Set(initialize=range(0, number_resources), ordered=True)
+    m.time = Set(initialize=range(0, h), ordered=True)
+
+    m = create_bidding_block(m, h, number_resources, case)
+    m = record_block_size(m, 'bidding')
+    m = create_PV_block(m, resources)
+    m = record_block_size(m, 'PV')
+
+    m = create_electrolyzer_block(m, resources)
+    m = record_block_size(m, 'electrolyzer')
+    m = create_compressor_hydrogen_block(m, resources, case)
+    m = record_block_size(m, 'hydrogen_compressor')
+    m = create_storage_hydrogen_block(m, h, resources, case)
+    m = record_block_size(m, 'hydrogen_storage')
+
+    m = create_compressor_air_block(m, resources)
+    m = record_block_size(m, 'air_compressor')
+    m = create_air_separation_block(m, resources)
+    m = record_block_size(m, 'air_separation')
+    m = create_compressor_nitrogen_block(m, resources)
+    m = record_block_size(m, 'nitrogen_compressor')
+    m = create_storage_nitrogen_block(m, h, resources)
+    m = record_block_size(m, 'nitrogen_storage')
+
+    m = create_ammonia_plant_block(m, resources)
+    m = record_block_size(m, 'ammonia_plant')
+    m = create_storage_ammonia_block(m, h, resources)
+    m = record_block_size(m, 'ammonia_storage')
+    m = create_ammonia_load_block(m, resources)
+    m = record_block_size(m, 'load_ammonia')
+
+    if case == 3:
+        m = create_storage_electrical_block(m, h, resources)
+        m = record_block_size(m, 'electrical_storage')
+        m = create_market_block(m)
+        m = record_block_size(m, 'market')
+
+    m = apply_bounds(m, h, number_resources, resources, case)
+
+    return m
+
+
+def create_bidding_block(m: ConcreteModel, h: int, number_resources: int, case: int) -> ConcreteModel:
+    ''' Create bidding block '''
+    def resources_power(m, t):
+        power = quicksum(m.P_C_air_E[i, t] + m.P_AS_E[i, t] + m.P_C_N2_E[i, t] +
+                         m.P_EL_E[i, t] + m.P_EL_cooling[i, t] + m.P_C_H2_E[i, t] +
+                         m.P_AP_E[i, t] + m.P_sto_NH3_E[i, t] - m.P_PV[i, t] for i in m.resources)
+        if case == 3:
+            power = power + quicksum(m.P_sto_E_ch[i, t] - m.P_sto_E_dis[i, t] for i in m.resources)
+        return m.P_E[t] == power
+
+    m.bidding_power = Constraint(m.time, rule=resources_power)
+    m.bidding_pos_neg = Constraint(m.time, rule=lambda m, t: m.P_E_pos[t] - m.P_E_neg[t] == m.P_E[t])
+    m.bidding_pos_plus_neg = Constraint(m.time, rule=lambda m, t: m.P_E_pos[t] + m.P_E_neg[t] == m.P_E[t])
+    m.bidding_hydrogen = Constraint(m.time, rule=lambda m, t: m.P_H2[t] == quicksum(
+        m.P_C_H2_market[i, t] + m.P_sto_H2_market[i, t] for i in m.resources))
+
+    return m
+
+
+def create_market_block(m: ConcreteModel) -> ConcreteModel:
+    ''' Create market constraints block '''
+    m.market_ratio = Constraint(m.resources, m.time, rule=lambda m, i, t: m.U_sto_E[i, t] == 2 * m.D_sto_E[i, t])
+
+    return m
+
+
+def create_PV_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create PV block '''
+    max_power = resources['PV']['max_power']
+    PV_profile = resources['PV']['PV_profile']
+
+    m.PV_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_PV[i, t] <= max_power * PV_profile[t])
+
+    return m
+
+
+def create_storage_electrical_block(m: ConcreteModel, h: int, resources: dict) -> ConcreteModel:
+    ''' Create electrical storage block '''
+    rend_sto_E = resources['electrical_storage']['efficiency']
+    soc_sto_E_max = resources['electrical_storage']['max_capacity']
+    soc_sto_E_min = resources['electrical_storage']['min_capacity']
+    P_sto_E_dis_max = resources['electrical_storage']['max_discharging']
+    P_sto_E_ch_max = resources['electrical_storage']['max_charging']
+    big_M = get_big_M(resources)
+    soc_sto_E_init = resources['electrical_storage']['initial_soc']
+    soc_sto_E_final = resources['electrical_storage'].get('final_soc', soc_sto_E_init)
+
+    if not resources['electrical_storage'].get('linked', False):
+        m.sto_E_initial = Constraint(m.resources, rule=lambda m, i: m.soc_sto_E[i, 0] == soc_sto_E_init)
+        m.sto_E_final = Constraint(m.resources, rule=lambda m, i: m.soc_sto_E[i, h] >= soc_sto_E_final)
+
+    m.sto_E_soc = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_E[i, t + 1] == m.soc_sto_E[i, t] +
+                             (m.P_sto_E_ch[i, t] * rend_sto_E - m.P_sto_E_dis[i, t] / rend_sto_E))
+    m.sto_E_soc_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_E[i, t + 1] <= soc_sto_E_max)
+    m.sto_E_soc_min = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_E[i, t + 1] >= soc_sto_E_min)
+
+    m.sto_E_dis_space = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                   m.P_sto_E_dis[i, t] + m.P_sto_E_dis_space[i, t] >=
+                                   (1 - m.b_sto_E[i, t]) * P_sto_E_dis_max)
+    m.sto_E_ch_space = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                  m.P_sto_E_ch[i, t] + m.P_sto_E_ch_space[i, t] >= m.b_sto_E[i, t] * P_sto_E_ch_max)
+
+    m.sto_E_last_U_dis = Constraint(m.resources, rule=lambda m, i: m.U_sto_E_dis[i, h - 1] == 0)
+    m.sto_E_last_U_ch = Constraint(m.resources, rule=lambda m, i: m.U_sto_E_ch[i, h - 1] == 0)
+    m.sto_E_last_D_dis = Constraint(m.resources, rule=lambda m, i: m.D_sto_E_dis[i, h - 1] == 0)
+    m.sto_E_last_D_ch = Constraint(m.resources, rule=lambda m, i: m.D_sto_E_ch[i, h - 1] == 0)
+
+    m.sto_E_U_dis = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                               m.U_sto_E_dis[i, t] <= P_sto_E_dis_max - m.P_sto_E_dis[i, t])
+    m.sto_E_U_ch = Constraint(m.resources, m.time, rule=lambda m, i, t: m.U_sto_E_ch[i, t] <= m.P_sto_E_ch[i, t])
+    m.sto_E_D_ch = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                              m.D_sto_E_ch[i, t] <= P_sto_E_ch_max - m.P_sto_E_ch[i, t])
+    m.sto_E_D_dis = Constraint(m.resources, m.time, rule=lambda m, i, t: m.D_sto_E_dis[i, t] <= m.P_sto_E_dis[i, t])
+
+    m.sto_E_U_energy = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                  m.U_sto_E_dis[i, t] / rend_sto_E + m.U_sto_E_ch[i, t] * rend_sto_E <=
+                                  m.soc_sto_E[i, t + 1] - soc_sto_E_min)
+    m.sto_E_D_energy = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                  m.D_sto_E_dis[i, t] / rend_sto_E + m.D_sto_E_ch[i, t] * rend_sto_E <=
+                                  soc_sto_E_max - m.soc_sto_E[i, t + 1])
+
+    m.sto_E_U = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                           m.U_sto_E[i, t] == m.U_sto_E_ch[i, t] + m.U_sto_E_dis[i, t])
+    m.sto_E_D = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                           m.D_sto_E[i, t] == m.D_sto_E_ch[i, t] + m.D_sto_E_dis[i, t])
+
+    m.sto_E_reserve_space = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                       m.U_sto_E_ch[i, t] + m.U_sto_E_dis[i, t] + m.D_sto_E_ch[i, t] +
+                                       m.D_sto_E_dis[i, t] <=
+                                       m.P_sto_E_ch_space[i, t + 1] + m.P_sto_E_dis_space[i, t + 1])
+    m.sto_E_reserve_big_M = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                       m.U_sto_E_ch[i, t] + m.U_sto_E_dis[i, t] + m.D_sto_E_ch[i, t] +
+                                       m.D_sto_E_dis[i, t] <= m.b_sto_E_space[i, t] * big_M['reserves'])
+    m.sto_E_space_big_M = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                     m.P_sto_E_ch_space[i, t] + m.P_sto_E_dis_space[i, t] <=
+                                     (1 - m.b_sto_E_space[i, t]) * big_M['space'])
+
+    return m
+
+
+def create_electrolyzer_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create electrolyzer block '''
+    efficiency = resources['electrolyzer']['efficiency']
+    maximum_power = resources['electrolyzer']['max_power']
+    transformation_factor = resources['electrolyzer']['transformation_factor']
+    cooling_power = resources['electrolyzer']['cooling_power']
+
+    m.EL_H2 = Constraint(m.resources, m.time, rule=lambda m, j, t:
+                         m.P_EL_H2[j, t] == transformation_factor * efficiency * m.P_EL_E[j, t])
+    m.EL_C_H2 = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_EL_H2[j, t] == m.P_EL_C_H2[j, t])
+    m.EL_cooling = Constraint(m.resources, m.time, rule=lambda m, j, t:
+                              m.P_EL_cooling[j, t] == m.P_EL_E[j, t] / maximum_power * cooling_power)
+    m.EL_max = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_EL_E[j, t] <= maximum_power)
+
+    return m
+
+
+def create_compressor_hydrogen_block(m: ConcreteModel, resources: dict, case: int) -> ConcreteModel:
+    ''' Create hydrogen compressor block '''
+    alpha = resources['hydrogen_compressor']['alpha']
+    maximum_power = resources['hydrogen_compressor']['max_power']
+
+    def balance(m, j, t):
+        if case in [1, 2, 3]:
+            return m.P_C_H2[j, t] == m.P_C_H2_sto_H2[j, t] + m.P_C_H2_AP[j, t] + m.P_C_H2_market[j, t]
+        return m.P_C_H2[j, t] == m.P_C_H2_sto_H2[j, t] + m.P_C_H2_AP[j, t]
+
+    m.C_H2_input = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_H2[j, t] == m.P_EL_C_H2[j, t])
+    m.C_H2_E = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_H2_E[j, t] == alpha * m.P_C_H2[j, t])
+    m.C_H2_max = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_H2[j, t] <= maximum_power)
+    m.C_H2_balance = Constraint(m.resources, m.time, rule=balance)
+
+    return m
+
+
+def create_storage_hydrogen_block(m: ConcreteModel, h: int, resources: dict, case: int) -> ConcreteModel:
+    ''' Create hydrogen storage block '''
+    efficiency = resources['hydrogen_storage']['efficiency']
+    max_soc = resources['hydrogen_storage']['max_capacity']
+    min_soc = resources['hydrogen_storage']['min_capacity']
+    max_power_dis = resources['hydrogen_storage']['max_discharging']
+    max_power_ch = resources['hydrogen_storage']['max_charging']
+    soc_initial = resources['hydrogen_storage']['initial_soc']
+    soc_final = resources['hydrogen_storage'].get('final_soc', soc_initial)
+
+    def discharge(m, i, t):
+        if case in [1, 2, 3]:
+            return m.P_sto_H2_dis[i, t] == m.P_sto_H2_AP[i, t] + m.P_sto_H2_market[i, t]
+        return m.P_sto_H2_dis[i, t] == m.P_sto_H2_AP[i, t]
+
+    if not resources['hydrogen_storage'].get('linked', False):
+        m.sto_H2_initial = Constraint(m.resources, rule=lambda m, i: m.soc_sto_H2[i, 0] == soc_initial)
+        m.sto_H2_final = Constraint(m.resources, rule=lambda m, i: m.soc_sto_H2[i, h] >= soc_final)
+    m.sto_H2_soc = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_H2[i, t + 1] == m.soc_sto_H2[i, t] +
+                              (m.P_sto_H2_ch[i, t] * efficiency - m.P_sto_H2_dis[i, t] / efficiency))
+    m.sto_H2_soc_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_H2[i, t] <= max_soc)
+    m.sto_H2_soc_min = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_H2[i, t] >= min_soc)
+    m.sto_H2_ch = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_H2_ch[i, t] == m.P_C_H2_sto_H2[i, t])
+    if 'hydrogen_storage' in m.relaxed_binaries:
+        m.sto_H2_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_H2_ch[i, t] <= max_power_ch)
+        m.sto_H2_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                      m.P_sto_H2_dis[i, t] <= max_power_dis)
+    else:
+        m.sto_H2_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                     m.P_sto_H2_ch[i, t] <= m.b_sto_H2_ch[i, t] * max_power_ch)
+        m.sto_H2_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                      m.P_sto_H2_dis[i, t] <= (1 - m.b_sto_H2_ch[i, t]) * max_power_dis)
+    m.sto_H2_dis = Constraint(m.resources, m.time, rule=discharge)
+
+    return m
+
+
+def create_compressor_air_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create air compressor block '''
+    alpha = resources['air_compressor']['alpha']
+    maximum_power = resources['air_compressor']['max_power']
+
+    m.C_air_AS = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_air[j, t] == m.P_C_air_AS[j, t])
+    m.C_air_E = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_air_E[j, t] == alpha * m.P_C_air[j, t])
+    m.C_air_max = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_air[j, t] <= maximum_power)
+
+    return m
+
+
+def create_air_separation_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create air separation block '''
+    alpha_E = resources['air_separation']['alpha_E']
+    transformation_factor = resources['air_separation']['transformation_factor']
+    maximum_energy_N2 = resources['air_separation']['max_energy_N2']
+
+    m.AS_N2 = Constraint(m.resources, m.time, rule=lambda m, j, t:
+                         m.P_AS_N2[j, t] == transformation_factor * m.P_AS_air[j, t])
+    m.AS_E = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_AS_E[j, t] == alpha_E * m.P_AS_N2[j, t])
+    m.AS_air = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_AS_air[j, t] == m.P_C_air_AS[j, t])
+    m.AS_C_N2 = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_AS_N2[j, t] == m.P_AS_C_N2[j, t])
+    m.AS_max = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_AS_N2[j, t] <= maximum_energy_N2)
+
+    return m
+
+
+def create_compressor_nitrogen_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create nitrogen compressor block '''
+    alpha = resources['nitrogen_compressor']['alpha']
+    maximum_power = resources['nitrogen_compressor']['max_power']
+
+    m.C_N2_input = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_N2[j, t] == m.P_AS_C_N2[j, t])
+    m.C_N2_balance = Constraint(m.resources, m.time, rule=lambda m, j, t:
+                                m.P_C_N2[j, t] == m.P_C_N2_sto_N2[j, t] + m.P_C_N2_AP[j, t])
+    m.C_N2_E = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_N2_E[j, t] == alpha * m.P_C_N2[j, t])
+    m.C_N2_max = Constraint(m.resources, m.time, rule=lambda m, j, t: m.P_C_N2[j, t] <= maximum_power)
+
+    return m
+
+
+def create_storage_nitrogen_block(m: ConcreteModel, h: int, resources: dict) -> ConcreteModel:
+    ''' Create nitrogen storage block '''
+    efficiency = resources['nitrogen_storage']['efficiency']
+    max_soc = resources['nitrogen_storage']['max_capacity']
+    min_soc = resources['nitrogen_storage']['min_capacity']
+    max_power_dis = resources['nitrogen_storage']['max_discharging']
+    max_power_ch = resources['nitrogen_storage']['max_charging']
+    soc_initial = resources['nitrogen_storage']['initial_soc']
+    soc_final = resources['nitrogen_storage'].get('final_soc', soc_initial)
+
+    if not resources['nitrogen_storage'].get('linked', False):
+        m.sto_N2_initial = Constraint(m.resources, rule=lambda m, i: m.soc_sto_N2[i, 0] == soc_initial)
+        m.sto_N2_final = Constraint(m.resources, rule=lambda m, i: m.soc_sto_N2[i, h] >= soc_final)
+    m.sto_N2_soc = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_N2[i, t + 1] == m.soc_sto_N2[i, t] +
+                              (m.P_sto_N2_ch[i, t] * efficiency - m.P_sto_N2_dis[i, t] / efficiency))
+    m.sto_N2_soc_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_N2[i, t] <= max_soc)
+    m.sto_N2_soc_min = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_N2[i, t] >= min_soc)
+    m.sto_N2_ch = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_N2_ch[i, t] == m.P_C_N2_sto_N2[i, t])
+    m.sto_N2_dis = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_N2_dis[i, t] == m.P_sto_N2_AP[i, t])
+    if 'nitrogen_storage' in m.relaxed_binaries:
+        m.sto_N2_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_N2_ch[i, t] <= max_power_ch)
+        m.sto_N2_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                      m.P_sto_N2_dis[i, t] <= max_power_dis)
+    else:
+        m.sto_N2_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                     m.P_sto_N2_ch[i, t] <= m.b_sto_N2_ch[i, t] * max_power_ch)
+        m.sto_N2_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                      m.P_sto_N2_dis[i, t] <= (1 - m.b_sto_N2_ch[i, t]) * max_power_dis)
+
+    return m
+
+
+def create_ammonia_plant_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create ammonia plant block '''
+    alpha_H2 = resources['ammonia_plant']['alpha_H2']
+    alpha_N2 = resources['ammonia_plant']['alpha_N2']
+    alpha_E = resources['ammonia_plant']['alpha_E']
+    eff_H2 = resources['ammonia_plant']['efficiency_H2']
+    eff_N2 = resources['ammonia_plant']['efficiency_N2']
+    max_power = resources['ammonia_plant']['max_power_NH3']
+    max_power_H2 = resources['ammonia_plant']['max_power_H2']
+    max_power_N2 = resources['ammonia_plant']['max_power_N2']
+
+    m.AP_H2_ratio = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP[i, t] == alpha_H2 * m.P_AP_H2[i, t])
+    m.AP_N2_ratio = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP[i, t] == alpha_N2 * m.P_AP_N2[i, t])
+    m.AP_E = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP_E[i, t] == alpha_E * m.P_AP[i, t])
+    m.AP_H2 = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                         m.P_AP_H2[i, t] == eff_H2 * (m.P_C_H2_AP[i, t] + m.P_sto_H2_AP[i, t]))
+    m.AP_N2 = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                         m.P_AP_N2[i, t] == eff_N2 * (m.P_sto_N2_AP[i, t] + m.P_C_N2_AP[i, t]))
+    m.AP_output = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                             m.P_AP[i, t] == m.P_AP_sto_NH3[i, t] + m.P_AP_load[i, t])
+    m.AP_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP[i, t] <= max_power)
+    m.AP_H2_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP_H2[i, t] <= max_power_H2)
+    m.AP_N2_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_AP_N2[i, t] <= max_power_N2)
+
+    return m
+
+
+def create_storage_ammonia_block(m: ConcreteModel, h: int, resources: dict) -> ConcreteModel:
+    ''' Create ammonia storage block '''
+    efficiency = resources['ammonia_storage']['efficiency']
+    max_soc = resources['ammonia_storage']['max_capacity']
+    min_soc = resources['ammonia_storage']['min_capacity']
+    max_power_dis = resources['ammonia_storage']['max_discharging']
+    max_power_ch = resources['ammonia_storage']['max_charging']
+    soc_initial = resources['ammonia_storage']['initial_soc']
+    soc_final = resources['ammonia_storage'].get('final_soc', soc_initial)
+    alpha_E = resources['ammonia_storage']['alpha_E']
+
+    if not resources['ammonia_storage'].get('linked', False):
+        m.sto_NH3_initial = Constraint(m.resources, rule=lambda m, i: m.soc_sto_NH3[i, 0] == soc_initial)
+        m.sto_NH3_final = Constraint(m.resources, rule=lambda m, i: m.soc_sto_NH3[i, h] >= soc_final)
+    m.sto_NH3_soc = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_NH3[i, t + 1] ==
+                               m.soc_sto_NH3[i, t] +
+                               (m.P_sto_NH3_ch[i, t] * efficiency - m.P_sto_NH3_dis[i, t] / efficiency))
+    m.sto_NH3_soc_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_NH3[i, t] <= max_soc)
+    m.sto_NH3_soc_min = Constraint(m.resources, m.time, rule=lambda m, i, t: m.soc_sto_NH3[i, t] >= min_soc)
+    m.sto_NH3_ch = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_NH3_ch[i, t] == m.P_AP_sto_NH3[i, t])
+    m.sto_NH3_dis = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                               m.P_sto_NH3_dis[i, t] == m.P_sto_NH3_load[i, t])
+    if 'ammonia_storage' in m.relaxed_binaries:
+        m.sto_NH3_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t: m.P_sto_NH3_ch[i, t] <= max_power_ch)
+        m.sto_NH3_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                       m.P_sto_NH3_dis[i, t] <= max_power_dis)
+    else:
+        m.sto_NH3_ch_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                      m.P_sto_NH3_ch[i, t] <= m.b_sto_NH3_ch[i, t] * max_power_ch)
+        m.sto_NH3_dis_max = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                                       m.P_sto_NH3_dis[i, t] <= (1 - m.b_sto_NH3_ch[i, t]) * max_power_dis)
+    m.sto_NH3_E = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                             m.P_sto_NH3_E[i, t] == (m.P_sto_NH3_ch[i, t] + m.P_sto_NH3_dis[i, t]) * alpha_E)
+
+    return m
+
+
+def create_ammonia_load_block(m: ConcreteModel, resources: dict) -> ConcreteModel:
+    ''' Create ammonia load block '''
+    load = resources['load_ammonia'][0]
+
+    m.load_NH3 = Constraint(m.resources, m.time, rule=lambda m, i, t:
+                            load == m.P_sto_NH3_load[i, t] + m.P_AP_load[i, t])
+
+    return m
+
+
+def benchmark_model_build(case: int, horizons: list, number_resources: int = 1) -> list:
+    ''' Measure build time and peak memory of create_model and create_model_indexed
+
+    The PV profile is repeated to cover horizons longer than the input file.
+    '''
+    from get_resources import get_resources
+    from create_variables import create_variables
+    from create_model import create_model
+
+    resources = get_resources(case)
+    profile = resources['PV']['PV_profile']
+
+    results = []
+    for h in horizons:
+        resources['PV']['PV_profile'] = [profile[t % len(profile)] for t in range(0, h + 1)]
+        for name, builder in [('ConstraintList', create_model), ('indexed', create_model_indexed)]:
+            tracemalloc.start()
+            time_start = perf_counter()
+            m = ConcreteModel()
+            m.c1 = ConstraintList()
+            m = create_variables(m, h, number_resources, case, resources)
+            m = builder(m, h, number_resources, resources, case)
+            build_time = perf_counter() - time_start
+            memory = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            results.append({'builder': name, 'h': h, 'constraints': m.nconstraints(),
+                            'time (s)': build_time, 'memory (MB)': memory})
+            print(results[-1])
+            del m
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_model_build(3, [24 * 4, 24 * 7 * 4, 24 * 365])
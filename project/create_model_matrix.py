@@ -0,0 +1,537 @@
+from numpy import *
+from pyomo.environ import *
+from scipy.optimize import milp, Bounds, LinearConstraint
+from scipy.sparse import coo_matrix
+
+from bound_tightening import propagate_bounds, get_big_M
+
+
+def create_matrix_model(h: int, number_resources: int, resources: dict, prices: dict, case: int) -> dict:
+    ''' Assemble the plant MILP directly as sparse matrices
+
+    Builds the same variables, constraints and objective as create_variables,
+    create_model and run_optimization_model, without creating Pyomo expressions.
+    Every subsystem adds its own columns and rows. Single-variable constraints are
+    written as column bounds. This is the full MILP, as create_model with relax=False:
+    the callers read the solution vector directly, so the storages keep their charging
+    binaries instead of having their relaxed solution completed (see complementarity).
+    '''
+    lp = {'columns': {}, 'n_columns': 0, 'lb': {}, 'ub': {}, 'integrality': {},
+          'rows': [], 'cols': [], 'vals': [], 'row_lb': [], 'row_ub': [], 'n_rows': 0,
+          'block_size': {}, 'n_rows_recorded': 0, 'h': h, 'number_resources': number_resources}
+
+    lp = create_PV_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'PV')
+
+    lp = create_electrolyzer_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'electrolyzer')
+    lp = create_compressor_hydrogen_block(lp, h, number_resources, resources, case)
+    lp = record_matrix_block_size(lp, 'hydrogen_compressor')
+    lp = create_storage_hydrogen_block(lp, h, number_resources, resources, case)
+    lp = record_matrix_block_size(lp, 'hydrogen_storage')
+
+    lp = create_compressor_air_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'air_compressor')
+    lp = create_air_separation_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'air_separation')
+    lp = create_compressor_nitrogen_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'nitrogen_compressor')
+    lp = create_storage_nitrogen_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'nitrogen_storage')
+
+    lp = create_ammonia_plant_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'ammonia_plant')
+    lp = create_storage_ammonia_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'ammonia_storage')
+    lp = create_ammonia_load_block(lp, h, number_resources, resources)
+    lp = record_matrix_block_size(lp, 'load_ammonia')
+
+    if case == 3:
+        lp = create_storage_electrical_block(lp, h, number_resources, resources)
+        lp = record_matrix_block_size(lp, 'electrical_storage')
+        lp = create_market_block(lp)
+        lp = record_matrix_block_size(lp, 'market')
+
+    lp = create_bidding_block(lp, h, number_resources, case)
+    lp = record_matrix_block_size(lp, 'bidding')
+    lp = apply_matrix_bounds(lp, propagate_bounds(resources, number_resources, case))
+
+    lp = create_objective(lp, h, number_resources, resources, prices, case)
+
+    return lp
+
+
+def add_variables(lp: dict, name: str, shape: tuple, lb: float = 0, ub: float = inf, binary: bool = False) -> dict:
+    ''' Add a family of columns with the same name and shape as in create_variables '''
+    lp['columns'][name] = (lp['n_columns'], shape)
+    lp['lb'][name] = full(shape, 0 if binary else lb, dtype=float)
+    lp['ub'][name] = full(shape, 1 if binary else ub, dtype=float)
+    lp['integrality'][name] = full(shape, 1 if binary else 0, dtype=int)
+    lp['n_columns'] += int(prod(shape))
+
+    return lp
+
+
+def columns(lp: dict, name: str) -> ndarray:
+    ''' Column indices of a family of variables '''
+    start, shape = lp['columns'][name]
+
+    return start + arange(int(prod(shape))).reshape(shape)
+
+
+def set_bounds(lp: dict, name: str, index, lb=None, ub=None) -> dict:
+    ''' Tighten the bounds of some columns of a family of variables '''
+    if lb is not None:
+        lp['lb'][name][index] = maximum(lp['lb'][name][index], lb)
+    if ub is not None:
+        lp['ub'][name][index] = minimum(lp['ub'][name][index], ub)
+
+    return lp
+
+
+def apply_matrix_bounds(lp: dict, bounds: dict) -> dict:
+    ''' Tighten the upper bounds of the families of variables with the propagated bounds '''
+    for name, bound in bounds.items():
+        if name in lp['columns'] and isfinite(bound):
+            lp = set_bounds(lp, name, ..., ub=bound)
+
+    return lp
+
+
+def add_constraints(lp: dict, terms: list, lower=-inf, upper=inf) -> dict:
+    ''' Add a block of rows lower <= sum(coef * x[cols]) <= upper
+
+    Each term is a pair (coef, cols), where cols is an array of column indices with
+    one entry per row and coef is a scalar or an array with the same shape.
+    '''
+    shape = terms[0][1].shape
+    size = int(prod(shape))
+    rows = lp['n_rows'] + arange(size)
+    for coef, cols in terms:
+        lp['rows'].append(rows)
+        lp['cols'].append(cols.ravel())
+        lp['vals'].append(broadcast_to(asarray(coef, dtype=float), shape).ravel())
+
+    lp['row_lb'].append(broadcast_to(asarray(lower, dtype=float), shape).ravel())
+    lp['row_ub'].append(broadcast_to(asarray(upper, dtype=float), shape).ravel())
+    lp['n_rows'] += size
+
+    return lp
+
+
+def record_matrix_block_size(lp: dict, block: str) -> dict:
+    ''' Store the number of rows added by the last block '''
+    lp['block_size'][block] = lp['n_rows'] - lp['n_rows_recorded']
+    lp['n_rows_recorded'] = lp['n_rows']
+
+    return lp
+
+
+def create_bidding_block(lp: dict, h: int, number_resources: int, case: int) -> dict:
+    ''' Create bidding block '''
+    lp = add_variables(lp, 'P_E', (h,), lb=-inf)
+    lp = add_variables(lp, 'P_E_pos', (h,))
+    lp = add_variables(lp, 'P_E_neg', (h,))
+    lp = add_variables(lp, 'P_H2', (h,))
+
+    consumers = ['P_C_air_E', 'P_AS_E', 'P_C_N2_E', 'P_EL_E', 'P_EL_cooling', 'P_C_H2_E', 'P_AP_E', 'P_sto_NH3_E']
+    producers = ['P_PV']
+    if case == 3:
+        consumers.append('P_sto_E_ch')
+        producers.append('P_sto_E_dis')
+
+    terms = [(1, columns(lp, 'P_E'))]
+    for i in range(0, number_resources):
+        terms += [(-1, columns(lp, name)[i, :h]) for name in consumers]
+        terms += [(1, columns(lp, name)[i, :h]) for name in producers]
+    lp = add_constraints(lp, terms, 0, 0)
+
+    lp = add_constraints(lp, [(1, columns(lp, 'P_E_pos')), (-1, columns(lp, 'P_E_neg')),
+                              (-1, columns(lp, 'P_E'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_E_pos')), (1, columns(lp, 'P_E_neg')),
+                              (-1, columns(lp, 'P_E'))], 0, 0)
+
+    terms = [(1, columns(lp, 'P_H2'))]
+    for i in range(0, number_resources):
+        terms += [(-1, columns(lp, 'P_C_H2_market')[i]), (-1, columns(lp, 'P_sto_H2_market')[i])]
+    lp = add_constraints(lp, terms, 0, 0)
+
+    return lp
+
+
+def create_market_block(lp: dict) -> dict:
+    ''' Create market constraints block '''
+    lp = add_constraints(lp, [(1, columns(lp, 'U_sto_E')), (-2, columns(lp, 'D_sto_E'))], 0, 0)
+
+    return lp
+
+
+def create_PV_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create PV block '''
+    max_power = resources['PV']['max_power']
+    PV_profile = asarray(resources['PV']['PV_profile'][0:h], dtype=float)
+
+    lp = add_variables(lp, 'P_PV', (number_resources, h))
+    lp = set_bounds(lp, 'P_PV', slice(None), ub=max_power * PV_profile)
+
+    return lp
+
+
+def create_storage_electrical_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create electrical storage block '''
+    rend_sto_E = resources['electrical_storage']['efficiency']
+    soc_sto_E_max = resources['electrical_storage']['max_capacity']
+    soc_sto_E_min = resources['electrical_storage']['min_capacity']
+    P_sto_E_dis_max = resources['electrical_storage']['max_discharging']
+    P_sto_E_ch_max = resources['electrical_storage']['max_charging']
+    soc_sto_E_init = resources['electrical_storage']['initial_soc']
+    soc_sto_E_final = resources['electrical_storage'].get('final_soc', soc_sto_E_init)
+
+    R = number_resources
+    for name, length in [('soc_sto_E', h + 1), ('P_sto_E_ch', h), ('P_sto_E_dis', h),
+                         ('P_sto_E_ch_space', h + 1), ('P_sto_E_dis_space', h + 1),
+                         ('U_sto_E', h), ('U_sto_E_ch', h), ('U_sto_E_dis', h),
+                         ('D_sto_E', h), ('D_sto_E_ch', h), ('D_sto_E_dis', h)]:
+        lp = add_variables(lp, name, (R, length))
+    lp = add_variables(lp, 'b_sto_E', (R, h), binary=True)
+    lp = add_variables(lp, 'b_sto_E_space', (R, h), binary=True)
+
+    soc = columns(lp, 'soc_sto_E')
+    ch, dis = columns(lp, 'P_sto_E_ch'), columns(lp, 'P_sto_E_dis')
+    ch_space, dis_space = columns(lp, 'P_sto_E_ch_space'), columns(lp, 'P_sto_E_dis_space')
+    U, U_ch, U_dis = columns(lp, 'U_sto_E'), columns(lp, 'U_sto_E_ch'), columns(lp, 'U_sto_E_dis')
+    D, D_ch, D_dis = columns(lp, 'D_sto_E'), columns(lp, 'D_sto_E_ch'), columns(lp, 'D_sto_E_dis')
+    b, b_space = columns(lp, 'b_sto_E'), columns(lp, 'b_sto_E_space')
+
+    if not resources['electrical_storage'].get('linked', False):
+        lp = set_bounds(lp, 'soc_sto_E', (slice(None), 0), lb=soc_sto_E_init, ub=soc_sto_E_init)
+        lp = set_bounds(lp, 'soc_sto_E', (slice(None), h), lb=soc_sto_E_final)
+    lp = set_bounds(lp, 'soc_sto_E', (slice(None), slice(1, h + 1)), lb=soc_sto_E_min, ub=soc_sto_E_max)
+    for name in ['U_sto_E_dis', 'U_sto_E_ch', 'D_sto_E_dis', 'D_sto_E_ch']:
+        lp = set_bounds(lp, name, (slice(None), h - 1), ub=0)
+
+    lp = add_constraints(lp, [(1, soc[:, 1:]), (-1, soc[:, :h]), (-rend_sto_E, ch), (1 / rend_sto_E, dis)], 0, 0)
+
+    lp = add_constraints(lp, [(1, dis), (1, dis_space[:, :h]), (P_sto_E_dis_max, b)], lower=P_sto_E_dis_max)
+    lp = add_constraints(lp, [(1, ch), (1, ch_space[:, :h]), (-P_sto_E_ch_max, b)], lower=0)
+
+    lp = add_constraints(lp, [(1, U_dis), (1, dis)], upper=P_sto_E_dis_max)
+    lp = add_constraints(lp, [(1, U_ch), (-1, ch)], upper=0)
+    lp = add_constraints(lp, [(1, D_ch), (1, ch)], upper=P_sto_E_ch_max)
+    lp = add_constraints(lp, [(1, D_dis), (-1, dis)], upper=0)
+
+    lp = add_constraints(lp, [(1 / rend_sto_E, U_dis), (rend_sto_E, U_ch), (-1, soc[:, 1:])], upper=-soc_sto_E_min)
+    lp = add_constraints(lp, [(1 / rend_sto_E, D_dis), (rend_sto_E, D_ch), (1, soc[:, 1:])], upper=soc_sto_E_max)
+
+    lp = add_constraints(lp, [(1, U), (-1, U_ch), (-1, U_dis)], 0, 0)
+    lp = add_constraints(lp, [(1, D), (-1, D_ch), (-1, D_dis)], 0, 0)
+
+    reserves = [(1, U_ch), (1, U_dis), (1, D_ch), (1, D_dis)]
+    lp = add_constraints(lp, reserves + [(-1, ch_space[:, 1:]), (-1, dis_space[:, 1:])], upper=0)
+    big_M = get_big_M(resources)
+    lp = add_constraints(lp, reserves + [(-big_M['reserves'], b_space)], upper=0)
+    lp = add_constraints(lp, [(1, ch_space[:, :h]), (1, dis_space[:, :h]), (big_M['space'], b_space)],
+                         upper=big_M['space'])
+
+    return lp
+
+
+def create_electrolyzer_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create electrolyzer block '''
+    efficiency = resources['electrolyzer']['efficiency']
+    maximum_power = resources['electrolyzer']['max_power']
+    transformation_factor = resources['electrolyzer']['transformation_factor']
+    cooling_power = resources['electrolyzer']['cooling_power']
+
+    for name in ['P_EL_E', 'P_EL_H2', 'P_EL_C_H2', 'P_EL_cooling']:
+        lp = add_variables(lp, name, (number_resources, h))
+    lp = set_bounds(lp, 'P_EL_E', slice(None), ub=maximum_power)
+
+    lp = add_constraints(lp, [(1, columns(lp, 'P_EL_H2')),
+                              (-transformation_factor * efficiency, columns(lp, 'P_EL_E'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_EL_H2')), (-1, columns(lp, 'P_EL_C_H2'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_EL_cooling')),
+                              (-cooling_power / maximum_power, columns(lp, 'P_EL_E'))], 0, 0)
+
+    return lp
+
+
+def create_compressor_hydrogen_block(lp: dict, h: int, number_resources: int, resources: dict, case: int) -> dict:
+    ''' Create hydrogen compressor block '''
+    alpha = resources['hydrogen_compressor']['alpha']
+    maximum_power = resources['hydrogen_compressor']['max_power']
+
+    lp = add_variables(lp, 'P_C_H2', (number_resources, h))
+    for name in ['P_C_H2_sto_H2', 'P_C_H2_market', 'P_C_H2_AP', 'P_C_H2_E']:
+        lp = add_variables(lp, name, (number_resources, h))
+    lp = set_bounds(lp, 'P_C_H2', slice(None), ub=maximum_power)
+
+    C_H2 = columns(lp, 'P_C_H2')
+    lp = add_constraints(lp, [(1, C_H2), (-1, columns(lp, 'P_EL_C_H2'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_C_H2_E')), (-alpha, C_H2)], 0, 0)
+
+    terms = [(1, C_H2), (-1, columns(lp, 'P_C_H2_sto_H2')), (-1, columns(lp, 'P_C_H2_AP'))]
+    if case in [1, 2, 3]:
+        terms.append((-1, columns(lp, 'P_C_H2_market')))
+    lp = add_constraints(lp, terms, 0, 0)
+
+    return lp
+
+
+def create_storage_block(lp: dict, h: int, number_resources: int, storage: dict, name: str) -> dict:
+    ''' Create the state-of-charge and charging rows shared by the H2, N2 and NH3 storages '''
+    efficiency = storage['efficiency']
+    max_soc = storage['max_capacity']
+    min_soc = storage['min_capacity']
+    max_power_dis = storage['max_discharging']
+    max_power_ch = storage['max_charging']
+    soc_initial = storage['initial_soc']
+    soc_final = storage.get('final_soc', soc_initial)
+
+    lp = add_variables(lp, f'soc_sto_{name}', (number_resources, h + 1))
+    lp = add_variables(lp, f'P_sto_{name}_ch', (number_resources, h))
+    lp = add_variables(lp, f'P_sto_{name}_dis', (number_resources, h))
+    lp = add_variables(lp, f'b_sto_{name}_ch', (number_resources, h), binary=True)
+
+    soc = columns(lp, f'soc_sto_{name}')
+    ch, dis = columns(lp, f'P_sto_{name}_ch'), columns(lp, f'P_sto_{name}_dis')
+    b = columns(lp, f'b_sto_{name}_ch')
+
+    if not storage.get('linked', False):
+        lp = set_bounds(lp, f'soc_sto_{name}', (slice(None), 0), lb=soc_initial, ub=soc_initial)
+        lp = set_bounds(lp, f'soc_sto_{name}', (slice(None), h), lb=soc_final)
+    lp = set_bounds(lp, f'soc_sto_{name}', (slice(None), slice(0, h)), lb=min_soc, ub=max_soc)
+
+    lp = add_constraints(lp, [(1, soc[:, 1:]), (-1, soc[:, :h]), (-efficiency, ch), (1 / efficiency, dis)], 0, 0)
+    lp = add_constraints(lp, [(1, ch), (-max_power_ch, b)], upper=0)
+    lp = add_constraints(lp, [(1, dis), (max_power_dis, b)], upper=max_power_dis)
+
+    return lp
+
+
+def create_storage_hydrogen_block(lp: dict, h: int, number_resources: int, resources: dict, case: int) -> dict:
+    ''' Create hydrogen storage block '''
+    lp = create_storage_block(lp, h, number_resources, resources['hydrogen_storage'], 'H2')
+    lp = add_variables(lp, 'P_sto_H2_market', (number_resources, h))
+    lp = add_variables(lp, 'P_sto_H2_AP', (number_resources, h))
+
+    lp = add_constraints(lp, [(1, columns(lp, 'P_sto_H2_ch')), (-1, columns(lp, 'P_C_H2_sto_H2'))], 0, 0)
+
+    terms = [(1, columns(lp, 'P_sto_H2_dis')), (-1, columns(lp, 'P_sto_H2_AP'))]
+    if case in [1, 2, 3]:
+        terms.append((-1, columns(lp, 'P_sto_H2_market')))
+    lp = add_constraints(lp, terms, 0, 0)
+
+    return lp
+
+
+def create_compressor_air_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create air compressor block '''
+    alpha = resources['air_compressor']['alpha']
+    maximum_power = resources['air_compressor']['max_power']
+
+    lp = add_variables(lp, 'P_C_air', (number_resources, h))
+    lp = add_variables(lp, 'P_C_air_AS', (number_resources, h))
+    lp = add_variables(lp, 'P_C_air_E', (number_resources, h))
+    lp = set_bounds(lp, 'P_C_air', slice(None), ub=maximum_power)
+
+    C_air = columns(lp, 'P_C_air')
+    lp = add_constraints(lp, [(1, C_air), (-1, columns(lp, 'P_C_air_AS'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_C_air_E')), (-alpha, C_air)], 0, 0)
+
+    return lp
+
+
+def create_air_separation_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create air separation block '''
+    alpha_E = resources['air_separation']['alpha_E']
+    transformation_factor = resources['air_separation']['transformation_factor']
+    maximum_energy_N2 = resources['air_separation']['max_energy_N2']
+
+    lp = add_variables(lp, 'P_AS_N2', (number_resources, h))
+    for name in ['P_AS_air', 'P_AS_E', 'P_AS_C_N2']:
+        lp = add_variables(lp, name, (number_resources, h))
+    lp = set_bounds(lp, 'P_AS_N2', slice(None), ub=maximum_energy_N2)
+
+    AS_N2 = columns(lp, 'P_AS_N2')
+    lp = add_constraints(lp, [(1, AS_N2), (-transformation_factor, columns(lp, 'P_AS_air'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_AS_E')), (-alpha_E, AS_N2)], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_AS_air')), (-1, columns(lp, 'P_C_air_AS'))], 0, 0)
+    lp = add_constraints(lp, [(1, AS_N2), (-1, columns(lp, 'P_AS_C_N2'))], 0, 0)
+
+    return lp
+
+
+def create_compressor_nitrogen_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create nitrogen compressor block '''
+    alpha = resources['nitrogen_compressor']['alpha']
+    maximum_power = resources['nitrogen_compressor']['max_power']
+
+    lp = add_variables(lp, 'P_C_N2', (number_resources, h))
+    for name in ['P_C_N2_AP', 'P_C_N2_sto_N2', 'P_C_N2_E']:
+        lp = add_variables(lp, name, (number_resources, h))
+    lp = set_bounds(lp, 'P_C_N2', slice(None), ub=maximum_power)
+
+    C_N2 = columns(lp, 'P_C_N2')
+    lp = add_constraints(lp, [(1, C_N2), (-1, columns(lp, 'P_AS_C_N2'))], 0, 0)
+    lp = add_constraints(lp, [(1, C_N2), (-1, columns(lp, 'P_C_N2_sto_N2')), (-1, columns(lp, 'P_C_N2_AP'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_C_N2_E')), (-alpha, C_N2)], 0, 0)
+
+    return lp
+
+
+def create_storage_nitrogen_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create nitrogen storage block '''
+    lp = create_storage_block(lp, h, number_resources, resources['nitrogen_storage'], 'N2')
+    lp = add_variables(lp, 'P_sto_N2_AP', (number_resources, h))
+
+    lp = add_constraints(lp, [(1, columns(lp, 'P_sto_N2_ch')), (-1, columns(lp, 'P_C_N2_sto_N2'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_sto_N2_dis')), (-1, columns(lp, 'P_sto_N2_AP'))], 0, 0)
+
+    return lp
+
+
+def create_ammonia_plant_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create ammonia plant block '''
+    alpha_H2 = resources['ammonia_plant']['alpha_H2']
+    alpha_N2 = resources['ammonia_plant']['alpha_N2']
+    alpha_E = resources['ammonia_plant']['alpha_E']
+    eff_H2 = resources['ammonia_plant']['efficiency_H2']
+    eff_N2 = resources['ammonia_plant']['efficiency_N2']
+    max_power = resources['ammonia_plant']['max_power_NH3']
+    max_power_H2 = resources['ammonia_plant']['max_power_H2']
+    max_power_N2 = resources['ammonia_plant']['max_power_N2']
+
+    for name in ['P_AP', 'P_AP_H2', 'P_AP_N2', 'P_AP_E', 'P_AP_sto_NH3', 'P_AP_load']:
+        lp = add_variables(lp, name, (number_resources, h))
+    lp = set_bounds(lp, 'P_AP', slice(None), ub=max_power)
+    lp = set_bounds(lp, 'P_AP_H2', slice(None), ub=max_power_H2)
+    lp = set_bounds(lp, 'P_AP_N2', slice(None), ub=max_power_N2)
+
+    AP = columns(lp, 'P_AP')
+    lp = add_constraints(lp, [(1, AP), (-alpha_H2, columns(lp, 'P_AP_H2'))], 0, 0)
+    lp = add_constraints(lp, [(1, AP), (-alpha_N2, columns(lp, 'P_AP_N2'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_AP_E')), (-alpha_E, AP)], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_AP_H2')), (-eff_H2, columns(lp, 'P_C_H2_AP')),
+                              (-eff_H2, columns(lp, 'P_sto_H2_AP'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_AP_N2')), (-eff_N2, columns(lp, 'P_sto_N2_AP')),
+                              (-eff_N2, columns(lp, 'P_C_N2_AP'))], 0, 0)
+    lp = add_constraints(lp, [(1, AP), (-1, columns(lp, 'P_AP_sto_NH3')), (-1, columns(lp, 'P_AP_load'))], 0, 0)
+
+    return lp
+
+
+def create_storage_ammonia_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create ammonia storage block '''
+    alpha_E = resources['ammonia_storage']['alpha_E']
+
+    lp = create_storage_block(lp, h, number_resources, resources['ammonia_storage'], 'NH3')
+    lp = add_variables(lp, 'P_sto_NH3_load', (number_resources, h))
+    lp = add_variables(lp, 'P_sto_NH3_E', (number_resources, h))
+
+    ch, dis = columns(lp, 'P_sto_NH3_ch'), columns(lp, 'P_sto_NH3_dis')
+    lp = add_constraints(lp, [(1, ch), (-1, columns(lp, 'P_AP_sto_NH3'))], 0, 0)
+    lp = add_constraints(lp, [(1, dis), (-1, columns(lp, 'P_sto_NH3_load'))], 0, 0)
+    lp = add_constraints(lp, [(1, columns(lp, 'P_sto_NH3_E')), (-alpha_E, ch), (-alpha_E, dis)], 0, 0)
+
+    return lp
+
+
+def create_ammonia_load_block(lp: dict, h: int, number_resources: int, resources: dict) -> dict:
+    ''' Create ammonia load block '''
+    load = resources['load_ammonia'][0]
+
+    lp = add_constraints(lp, [(1, columns(lp, 'P_sto_NH3_load')), (1, columns(lp, 'P_AP_load'))], load, load)
+
+    return lp
+
+
+def create_objective(lp: dict, h: int, number_resources: int, resources: dict, prices: dict, case: int) -> dict:
+    ''' Create the objective vector with the same terms as run_optimization_model '''
+    c_H2O = resources['electrolyzer']['c_H2O']
+    c_O2 = resources['electrolyzer']['c_O2']
+
+    price_E = asarray(prices['energy'][0:h], dtype=float)
+    price_E_market = asarray(prices['energy_market'][0:h], dtype=float)
+    price_B = asarray(prices['band'][0:h], dtype=float)
+    price_E_D = asarray(prices['downward'][0:h], dtype=float)
+    price_E_U = asarray(prices['upward'][0:h], dtype=float)
+    ratio_D = asarray(prices['downward'][0:h], dtype=float)
+    ratio_U = asarray(prices['upward'][0:h], dtype=float)
+
+    c = {name: zeros(shape) for name, (start, shape) in lp['columns'].items()}
+    c['P_E_pos'] += price_E
+    c['P_E_neg'] -= price_E_market
+    c['P_H2'] -= prices['hydrogen']
+
+    if case == 3:
+        c['U_sto_E'][0] += - price_B - price_E_U * ratio_U
+        c['D_sto_E'][0] += - price_B + price_E_D * ratio_D
+
+    # run_optimization_model prices water and oxygen on the last timestep only
+    c['P_EL_E'][:, h - 1] += prices['water'] * c_H2O - prices['oxygen'] * c_O2
+
+    lp['c'] = concatenate([c[name].ravel() for name in lp['columns']])
+    lp['c0'] = - prices['ammonia'] * resources['load_ammonia'][0] * h
+
+    return lp
+
+
+def solve_matrix_model(lp: dict, time_limit: float = None, mip_rel_gap: float = None, tee: bool = False) -> dict:
+    ''' Solve the sparse MILP with HiGHS through scipy.optimize.milp '''
+    A = coo_matrix((concatenate(lp['vals']), (concatenate(lp['rows']), concatenate(lp['cols']))),
+                   shape=(lp['n_rows'], lp['n_columns'])).tocsr()
+    lb = concatenate([lp['lb'][name].ravel() for name in lp['columns']])
+    ub = concatenate([lp['ub'][name].ravel() for name in lp['columns']])
+    integrality = concatenate([lp['integrality'][name].ravel() for name in lp['columns']])
+
+    options = {'disp': tee}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    if mip_rel_gap is not None:
+        options['mip_rel_gap'] = mip_rel_gap
+
+    results = milp(lp['c'], integrality=integrality, bounds=Bounds(lb, ub),
+                   constraints=LinearConstraint(A, concatenate(lp['row_lb']), concatenate(lp['row_ub'])),
+                   options=options)
+
+    solution = {'status': results.status, 'message': results.message, 'x': results.x, 'objective': None}
+    if results.x is not None:
+        solution['objective'] = results.fun + lp['c0']
+
+    return solution
+
+
+def get_matrix_solution(lp: dict, x: ndarray) -> dict:
+    ''' Split the solution vector into arrays named after the model variables '''
+    solution = {}
+    for name in lp['columns']:
+        values = x[columns(lp, name)]
+        if lp['integrality'][name].any():
+            values = where(lp['integrality'][name] == 1, values.round(), values)
+        solution[name] = values
+
+    return solution
+
+
+def load_matrix_solution(m: ConcreteModel, lp: dict, x: ndarray) -> ConcreteModel:
+    ''' Load the solution into the variables created by create_variables '''
+    from create_variables import load_variable_values
+
+    return load_variable_values(m, get_matrix_solution(lp, x))
+
+
+def run_matrix_model(h: int, number_resources: int, resources: dict, prices: dict, case: int,
+                     time_limit: float = None, mip_rel_gap: float = None) -> tuple:
+    ''' Build and solve the sparse MILP and return a model that save_results and the figures can read '''
+    from create_variables import create_variables
+
+    lp = create_matrix_model(h, number_resources, resources, prices, case)
+    solution = solve_matrix_model(lp, time_limit, mip_rel_gap)
+
+    m = ConcreteModel()
+    m = create_variables(m, h, number_resources, case, resources)
+    if solution['x'] is not None:
+        m = load_matrix_solution(m, lp, solution['x'])
+
+    return m, solution
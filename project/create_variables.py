@@ -37,8 +37,7 @@ def create_electrolyzer_variables(m: ConcreteModel, h: int, number_resources: in
 
 def create_compressor_H2_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
     ''' Create variables for the hydrogen compressor model '''
-    m.P_C_H2 = Var(arange(number_resources), arange(h + 1), domain=NonNegativeReals)
-    m.P_EL_CH_H2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
+    m.P_C_H2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_H2_sto_H2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_H2_market = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_H2_AP = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
@@ -60,27 +59,15 @@ def create_storage_H2_variables(m: ConcreteModel, h: int, number_resources: int)
 
 def create_compressor_air_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
     ''' Create variables for the air compressor storage (hydrogen) model '''
-    m.P_C_air = Var(arange(number_resources), arange(h + 1), domain=NonNegativeReals)
-    m.P_C_air_sto_air = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
+    m.P_C_air = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_air_AS = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_air_E = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
 
     return m
 
-def create_storage_air_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
-    ''' Create variables for the air storage model '''
-    m.soc_sto_air = Var(arange(number_resources), arange(h + 1), domain=NonNegativeReals)
-    m.P_sto_air_ch = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
-    m.P_sto_air_dis = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
-    m.P_sto_air_AS = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
-    m.b_sto_air_ch = Var(arange(number_resources), arange(h), domain=Binary)
-    #m.b_sto_air_dis = Var(arange(number_resources), arange(h), domain=Binary)
-
-    return m
-
 def create_air_separation_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
     ''' Create variables for the air separation unit model '''
-    m.P_AS_N2 = Var(arange(number_resources), arange(h + 1), domain=NonNegativeReals)
+    m.P_AS_N2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_AS_air = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_AS_E = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_AS_C_N2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
@@ -89,7 +76,7 @@ def create_air_separation_variables(m: ConcreteModel, h: int, number_resources:
 
 def create_compressor_N2_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
     ''' Create variables for the nitrogen compressor model '''
-    m.P_C_N2 = Var(arange(number_resources), arange(h + 1), domain=NonNegativeReals)
+    m.P_C_N2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_N2_AP = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_N2_sto_N2 = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_C_N2_E = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
@@ -126,12 +113,6 @@ def create_storage_NH3_variables(m: ConcreteModel, h: int, number_resources: int
     m.P_sto_NH3_load = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.P_sto_NH3_E = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
     m.b_sto_NH3_ch = Var(arange(number_resources), arange(h), domain=Binary)
-    m.b_sto_NH3_dis = Var(arange(number_resources), arange(h), domain=Binary)
-    return m
-
-def create_load_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
-    ''' Create variables for the ammonia load model '''
-    m.P_load = Var(arange(number_resources), arange(h), domain=NonNegativeReals)
 
     return m
 
@@ -140,31 +121,156 @@ def create_objective_function_variables(m: ConcreteModel, h: int, number_resourc
     m.P_E = Var(arange(h), domain=Reals)
     m.P_E_pos = Var(arange(h), domain=NonNegativeReals)
     m.P_E_neg = Var(arange(h), domain=NonNegativeReals)
-    m.U_E = Var(arange(h), domain=NonNegativeReals)
-    m.D_E = Var(arange(h), domain=NonNegativeReals)
     m.P_H2 = Var(arange(h), domain=NonNegativeReals)
-    m.P_NH3 = Var(arange(h), domain=NonNegativeReals)
 
     return m
 
 
-def create_variables(m: ConcreteModel, h: int, number_resources: int) -> ConcreteModel:
-    ''' Create variables for the optimization model '''
-    m = create_objective_function_variables(m, h, number_resources)
-    m = create_PV_variables(m, h, number_resources)
-    m = create_storage_electrical_variables(m, h, number_resources)
+# Variable blocks of the model: (function, cases whose constraints use the block, resource modelled)
+VARIABLE_BLOCKS = [(create_objective_function_variables, [1, 2, 3], None),
+                   (create_PV_variables, [1, 2, 3], 'PV'),
+                   (create_storage_electrical_variables, [3], 'electrical_storage'),
+
+                   (create_electrolyzer_variables, [1, 2, 3], 'electrolyzer'),
+                   (create_compressor_H2_variables, [1, 2, 3], 'hydrogen_compressor'),
+                   (create_storage_H2_variables, [1, 2, 3], 'hydrogen_storage'),
+
+                   (create_compressor_air_variables, [1, 2, 3], 'air_compressor'),
+                   (create_air_separation_variables, [1, 2, 3], 'air_separation'),
+                   (create_compressor_N2_variables, [1, 2, 3], 'nitrogen_compressor'),
+                   (create_storage_N2_variables, [1, 2, 3], 'nitrogen_storage'),
+
+                   (create_ammonia_plant_variables, [1, 2, 3], 'ammonia_plant'),
+                   (create_storage_NH3_variables, [1, 2, 3], 'ammonia_storage')]
+
+# Flows of the lean formulation that are expressions of other flows instead of variables:
+# name: (resource, definition from the resource parameters). Each flow is defined from
+# variables or from flows defined before it, following the equality of create_model it replaces.
+ALIASES = {'P_EL_H2': ('electrolyzer', lambda m, r, i, t: r['transformation_factor'] * r['efficiency'] * m.P_EL_E[i, t]),
+           'P_EL_C_H2': ('electrolyzer', lambda m, r, i, t: m.P_EL_H2[i, t]),
+           'P_EL_cooling': ('electrolyzer', lambda m, r, i, t: m.P_EL_E[i, t] / r['max_power'] * r['cooling_power']),
+           'P_C_H2': ('hydrogen_compressor', lambda m, r, i, t: m.P_EL_C_H2[i, t]),
+           'P_C_H2_E': ('hydrogen_compressor', lambda m, r, i, t: r['alpha'] * m.P_C_H2[i, t]),
+
+           'P_C_air_AS': ('air_compressor', lambda m, r, i, t: m.P_C_air[i, t]),
+           'P_C_air_E': ('air_compressor', lambda m, r, i, t: r['alpha'] * m.P_C_air[i, t]),
+           'P_AS_air': ('air_separation', lambda m, r, i, t: m.P_C_air_AS[i, t]),
+           'P_AS_N2': ('air_separation', lambda m, r, i, t: r['transformation_factor'] * m.P_AS_air[i, t]),
+           'P_AS_E': ('air_separation', lambda m, r, i, t: r['alpha_E'] * m.P_AS_N2[i, t]),
+           'P_AS_C_N2': ('air_separation', lambda m, r, i, t: m.P_AS_N2[i, t]),
+           'P_C_N2': ('nitrogen_compressor', lambda m, r, i, t: m.P_AS_C_N2[i, t]),
+           'P_C_N2_E': ('nitrogen_compressor', lambda m, r, i, t: r['alpha'] * m.P_C_N2[i, t]),
+
+           'P_AP_E': ('ammonia_plant', lambda m, r, i, t: r['alpha_E'] * m.P_AP[i, t]),
+           'P_AP_sto_NH3': ('ammonia_storage', lambda m, r, i, t: m.P_sto_NH3_ch[i, t]),
+           'P_sto_NH3_load': ('ammonia_storage', lambda m, r, i, t: m.P_sto_NH3_dis[i, t]),
+           'P_sto_NH3_E': ('ammonia_storage',
+                           lambda m, r, i, t: (m.P_sto_NH3_ch[i, t] + m.P_sto_NH3_dis[i, t]) * r['alpha_E'])}
+
+
+def create_variables(m: ConcreteModel, h: int, number_resources: int, case: int = None,
+                     resources: dict = None, lean: bool = False) -> ConcreteModel:
+    ''' Create variables for the optimization model
+
+    With a case, only the blocks whose constraints the case uses are created and, with
+    the resources, only the blocks of the resources in the dict. Without a case every
+    block is created. With lean, the flows in ALIASES are expressions (see create_aliases).
+    '''
+    for create_block_variables, cases, resource in VARIABLE_BLOCKS:
+        if case is not None and case not in cases:
+            continue
+        if resources is not None and resource is not None and resource not in resources:
+            continue
+        m = create_block_variables(m, h, number_resources)
+
+    m.aliases = []
+    if lean:
+        m = create_aliases(m, h, number_resources, resources)
+
+    return m
+
+
+def create_aliases(m: ConcreteModel, h: int, number_resources: int, resources: dict) -> ConcreteModel:
+    ''' Replace the flows in ALIASES by expressions of the flows they are defined from
 
-    m = create_electrolyzer_variables(m, h, number_resources)
-    m = create_compressor_H2_variables(m, h, number_resources)
-    m = create_storage_H2_variables(m, h, number_resources)
+    create_model skips the equalities that define these flows, so the solver receives one
+    variable per chain of pass-through flows. The expressions keep the names of the flows,
+    so the constraints, get_variable_values, save_results and the figures read them as before.
+    '''
+    for name, (resource, definition) in ALIASES.items():
+        if m.component(name) is None or resource not in resources:
+            continue
+        m.del_component(name)
+        m.add_component(name, Expression(arange(number_resources), arange(h),
+                                         rule=lambda m, i, t, r=resources[resource], definition=definition:
+                                         definition(m, r, i, t)))
+        m.aliases.append(name)
 
-    m = create_compressor_air_variables(m, h, number_resources)
-    m = create_air_separation_variables(m, h, number_resources)
-    m = create_compressor_N2_variables(m, h, number_resources)
-    m = create_storage_N2_variables(m, h, number_resources)
+    return m
 
-    m = create_ammonia_plant_variables(m, h, number_resources)
-    m = create_storage_NH3_variables(m, h, number_resources)
-    m = create_load_variables(m, h, number_resources)
+
+def count_variables(m: ConcreteModel) -> dict:
+    ''' Number of variables and binary variables of a model '''
+    variables = list(m.component_data_objects(Var, descend_into=True))
+
+    return {'variables': len(variables), 'binaries': len([var for var in variables if var.is_binary()])}
+
+
+def benchmark_variables(h: int = 24 * 365, number_resources: int = 1) -> list:
+    ''' Compare the variables and memory of the full and the case-aware variable sets '''
+    import tracemalloc
+
+    results = []
+    for case in [1, 2, 3]:
+        for name, case_filter in [('all blocks', None), ('case-aware', case)]:
+            tracemalloc.start()
+            m = ConcreteModel()
+            m = create_variables(m, h, number_resources, case_filter)
+            memory = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            results.append(dict({'case': case, 'variables created': name, 'memory (MB)': memory}, **count_variables(m)))
+            print(results[-1])
+
+    return results
+
+
+def get_variable_values(m: ConcreteModel, names: list = None) -> dict:
+    ''' Get the values of every variable (or of the variables in names) as arrays indexed like the
+    variables (nan if not set), including the flows of the lean formulation '''
+    values = {}
+    for var in m.component_objects([Var, Expression], descend_into=True):
+        if len(var) == 0 or (names is not None and var.local_name not in names):
+            continue
+        if var.ctype is Expression and var.local_name not in ALIASES:
+            continue
+        index = array(list(var.keys()), dtype=int64).reshape(len(var), -1)
+        array_values = full(tuple(index.max(axis=0) + 1), nan)
+        if var.ctype is Var:
+            array_values[tuple(index.T)] = array([data.value for data in var.values()], dtype=float64)
+        else:
+            array_values[tuple(index.T)] = array([value(data, exception=False) for data in var.values()],
+                                                 dtype=float64)
+        values[var.local_name] = array_values
+
+    return values
+
+
+def load_variable_values(m: ConcreteModel, values: dict) -> ConcreteModel:
+    ''' Load arrays of values into the variables with the same names (skipping variables the model does not have) '''
+    for name, array_values in values.items():
+        var = m.component(name)
+        if var is None or var.ctype is not Var:
+            continue
+        if array_values.ndim == 1:
+            var.set_values({t: None if isnan(array_values[t]) else float(array_values[t])
+                            for t in range(0, array_values.shape[0])}, skip_validation=True)
+        else:
+            var.set_values({(i, t): None if isnan(array_values[i, t]) else float(array_values[i, t])
+                            for i in range(0, array_values.shape[0])
+                            for t in range(0, array_values.shape[1])}, skip_validation=True)
 
     return m
+
+
+if __name__ == '__main__':
+    benchmark_variables()
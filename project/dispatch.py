@@ -0,0 +1,267 @@
+from numpy import *
+from pyomo.environ import *
+
+from create_variables import load_variable_values
+
+
+def get_storage_step(storage: dict, soc: float, charge: float, discharge: float) -> float:
+    ''' State-of-charge after charging and discharging a storage for one timestep '''
+    return soc + charge * storage['efficiency'] - discharge / storage['efficiency']
+
+
+def get_storage_limits(storage: dict, soc: float) -> tuple:
+    ''' Largest charging and discharging of a storage in one timestep, keeping its state-of-charge
+    between min_capacity (or final_soc, if higher) and max_capacity '''
+    floor = max(storage['min_capacity'], storage.get('final_soc', storage['initial_soc']))
+    charging = min(storage['max_charging'], (storage['max_capacity'] - soc) / storage['efficiency'])
+    discharging = min(storage['max_discharging'], (soc - floor) * storage['efficiency'])
+
+    return max(charging, 0), max(discharging, 0)
+
+
+def simulate_dispatch(h: int, number_resources: int, resources: dict, prices: dict, case: int) -> dict:
+    ''' Rule-based dispatch of the ammonia chain, as arrays of values of the variables of create_variables
+
+    Every timestep the ammonia plant meets load_ammonia as far as its limits allow and the NH3
+    storage covers the rest. The electrolyzer runs at full power when its hydrogen is worth more
+    than its electricity and compression, and otherwise on the PV surplus and for the hydrogen of
+    the plant. The nitrogen of the plant is made as needed. On PV surplus the H2 storage takes the
+    hydrogen the plant does not use (the rest is sold), the N2 storage charges and, in case 3,
+    the electrical storage charges, without reserves; without surplus they discharge to save
+    electricity. Storages never go below min_capacity or final_soc, so the dispatch is feasible
+    for create_model whenever the plant can meet the load.
+    '''
+    electrolyzer = resources['electrolyzer']
+    hydrogen_compressor = resources['hydrogen_compressor']
+    hydrogen_storage = resources['hydrogen_storage']
+    air_compressor = resources['air_compressor']
+    air_separation = resources['air_separation']
+    nitrogen_compressor = resources['nitrogen_compressor']
+    nitrogen_storage = resources['nitrogen_storage']
+    ammonia_plant = resources['ammonia_plant']
+    ammonia_storage = resources['ammonia_storage']
+    electrical_storage = resources['electrical_storage']
+    load = resources['load_ammonia'][0]
+
+    # Hydrogen per kW and electricity per kW of the electrolyzer, and electricity per kg of nitrogen
+    H2_factor = electrolyzer['transformation_factor'] * electrolyzer['efficiency']
+    EL_factor = 1 + electrolyzer['cooling_power'] / electrolyzer['max_power'] + H2_factor * hydrogen_compressor['alpha']
+    N2_factor = air_compressor['alpha'] / air_separation['transformation_factor'] + air_separation['alpha_E'] + \
+                nitrogen_compressor['alpha']
+    EL_max = min(electrolyzer['max_power'], hydrogen_compressor['max_power'] / H2_factor)
+    N2_max = min(air_separation['max_energy_N2'], nitrogen_compressor['max_power'],
+                 air_compressor['max_power'] * air_separation['transformation_factor'])
+
+    PV_available = resources['PV']['max_power'] * array(resources['PV']['PV_profile'][0:h], dtype=float64)
+    cheap = prices['hydrogen'] * H2_factor > array(prices['energy'], dtype=float64) * EL_factor
+
+    names = ['P_EL_E', 'P_sto_H2_ch', 'P_sto_H2_dis', 'P_C_H2_AP', 'P_C_H2_market',
+             'P_AS_N2', 'P_sto_N2_ch', 'P_sto_N2_dis', 'P_AP', 'P_sto_NH3_ch', 'P_sto_NH3_dis',
+             'P_sto_E_ch', 'P_sto_E_dis']
+    flows = {name: zeros(h) for name in names}
+    flows['P_PV'] = PV_available
+    storages = {'soc_sto_H2': hydrogen_storage, 'soc_sto_N2': nitrogen_storage, 'soc_sto_NH3': ammonia_storage}
+    if case == 3:
+        storages['soc_sto_E'] = electrical_storage
+    soc = {name: full(h + 1, storage['initial_soc'], dtype=float64) for name, storage in storages.items()}
+
+    for t in range(0, h):
+        H2_charging, H2_discharging = get_storage_limits(hydrogen_storage, soc['soc_sto_H2'][t])
+        N2_charging, N2_discharging = get_storage_limits(nitrogen_storage, soc['soc_sto_N2'][t])
+        NH3_discharging = get_storage_limits(ammonia_storage, soc['soc_sto_NH3'][t])[1]
+
+        AP_max = min(ammonia_plant['max_power_NH3'],
+                     ammonia_plant['alpha_H2'] * min(ammonia_plant['max_power_H2'],
+                                                     ammonia_plant['efficiency_H2'] * (H2_factor * EL_max + H2_discharging)),
+                     ammonia_plant['alpha_N2'] * min(ammonia_plant['max_power_N2'],
+                                                     ammonia_plant['efficiency_N2'] * (N2_max + N2_discharging)))
+        P_AP = min(load, AP_max)
+        P_sto_NH3_dis = load - P_AP
+        if P_sto_NH3_dis > NH3_discharging * (1 + 1e-9) + 1e-9:
+            raise ValueError(f"The ammonia plant and storage cannot meet load_ammonia at timestep {t}")
+        H2_need = P_AP / ammonia_plant['alpha_H2'] / ammonia_plant['efficiency_H2']
+        N2_need = P_AP / ammonia_plant['alpha_N2'] / ammonia_plant['efficiency_N2']
+
+        P_EL_E = EL_max if cheap[t] else min(H2_need / H2_factor, EL_max)
+        P_sto_H2_dis = max(H2_need - H2_factor * P_EL_E, 0)
+        P_sto_N2_dis = max(N2_need - N2_max, 0)
+        P_sto_H2_ch = P_sto_N2_ch = P_sto_E_ch = P_sto_E_dis = 0
+        surplus = PV_available[t] - EL_factor * P_EL_E - N2_factor * (N2_need - P_sto_N2_dis) - \
+                  ammonia_plant['alpha_E'] * P_AP - ammonia_storage['alpha_E'] * P_sto_NH3_dis
+
+        if surplus > 0:
+            extra = min(EL_max - P_EL_E, surplus / EL_factor)
+            P_EL_E = P_EL_E + extra
+            surplus = surplus - extra * EL_factor
+            if P_sto_H2_dis == 0:
+                P_sto_H2_ch = min(H2_charging, H2_factor * P_EL_E - H2_need)
+            if P_sto_N2_dis == 0:
+                P_sto_N2_ch = min(N2_charging, N2_max - N2_need, surplus / N2_factor)
+                surplus = surplus - P_sto_N2_ch * N2_factor
+            if case == 3:
+                P_sto_E_ch = min(get_storage_limits(electrical_storage, soc['soc_sto_E'][t])[0], surplus)
+        else:
+            if not cheap[t]:
+                saved = min(H2_discharging, H2_factor * P_EL_E) - P_sto_H2_dis
+                P_sto_H2_dis = P_sto_H2_dis + saved
+                P_EL_E = P_EL_E - saved / H2_factor
+                surplus = surplus + saved / H2_factor * EL_factor
+            saved = min(N2_discharging, N2_need) - P_sto_N2_dis
+            P_sto_N2_dis = P_sto_N2_dis + saved
+            surplus = surplus + saved * N2_factor
+            if case == 3 and surplus < 0:
+                P_sto_E_dis = min(get_storage_limits(electrical_storage, soc['soc_sto_E'][t])[1], - surplus)
+
+        for name, flow_value in [('P_EL_E', P_EL_E), ('P_sto_H2_ch', P_sto_H2_ch), ('P_sto_H2_dis', P_sto_H2_dis),
+                                 ('P_C_H2_AP', H2_need - P_sto_H2_dis),
+                                 ('P_C_H2_market', H2_factor * P_EL_E - H2_need + P_sto_H2_dis - P_sto_H2_ch),
+                                 ('P_AS_N2', N2_need - P_sto_N2_dis + P_sto_N2_ch), ('P_sto_N2_ch', P_sto_N2_ch),
+                                 ('P_sto_N2_dis', P_sto_N2_dis), ('P_AP', P_AP), ('P_sto_NH3_dis', P_sto_NH3_dis),
+                                 ('P_sto_E_ch', P_sto_E_ch), ('P_sto_E_dis', P_sto_E_dis)]:
+            flows[name][t] = max(flow_value, 0)
+        for name, storage in storages.items():
+            soc[name][t + 1] = get_storage_step(storage, soc[name][t], flows[name.replace('soc', 'P') + '_ch'][t],
+                                                flows[name.replace('soc', 'P') + '_dis'][t])
+
+    return get_dispatch_values(flows, soc, number_resources, resources, case)
+
+
+def get_dispatch_values(flows: dict, soc: dict, number_resources: int, resources: dict, case: int) -> dict:
+    ''' Every variable of create_variables from the decisions of the dispatch, as arrays indexed like the variables '''
+    electrolyzer = resources['electrolyzer']
+    air_separation = resources['air_separation']
+    ammonia_plant = resources['ammonia_plant']
+    H2_factor = electrolyzer['transformation_factor'] * electrolyzer['efficiency']
+
+    values = dict(flows, **soc)
+    values['P_EL_H2'] = values['P_EL_C_H2'] = values['P_C_H2'] = H2_factor * flows['P_EL_E']
+    values['P_EL_cooling'] = flows['P_EL_E'] / electrolyzer['max_power'] * electrolyzer['cooling_power']
+    values['P_C_H2_E'] = resources['hydrogen_compressor']['alpha'] * values['P_C_H2']
+    values['P_C_H2_sto_H2'] = flows['P_sto_H2_ch']
+    values['P_sto_H2_AP'] = flows['P_sto_H2_dis']
+    values['P_sto_H2_market'] = zeros(len(flows['P_AP']))
+    values['b_sto_H2_ch'] = (flows['P_sto_H2_ch'] > 0).astype(float64)
+
+    values['P_AS_C_N2'] = values['P_C_N2'] = flows['P_AS_N2']
+    values['P_AS_air'] = values['P_C_air'] = values['P_C_air_AS'] = flows['P_AS_N2'] / air_separation['transformation_factor']
+    values['P_AS_E'] = air_separation['alpha_E'] * flows['P_AS_N2']
+    values['P_C_air_E'] = resources['air_compressor']['alpha'] * values['P_C_air']
+    values['P_C_N2_E'] = resources['nitrogen_compressor']['alpha'] * flows['P_AS_N2']
+    values['P_C_N2_sto_N2'] = flows['P_sto_N2_ch']
+    values['P_C_N2_AP'] = flows['P_AS_N2'] - flows['P_sto_N2_ch']
+    values['P_sto_N2_AP'] = flows['P_sto_N2_dis']
+    values['b_sto_N2_ch'] = (flows['P_sto_N2_ch'] > 0).astype(float64)
+
+    values['P_AP_H2'] = flows['P_AP'] / ammonia_plant['alpha_H2']
+    values['P_AP_N2'] = flows['P_AP'] / ammonia_plant['alpha_N2']
+    values['P_AP_E'] = ammonia_plant['alpha_E'] * flows['P_AP']
+    values['P_AP_sto_NH3'] = flows['P_sto_NH3_ch']
+    values['P_AP_load'] = flows['P_AP'] - flows['P_sto_NH3_ch']
+    values['P_sto_NH3_load'] = flows['P_sto_NH3_dis']
+    values['P_sto_NH3_E'] = resources['ammonia_storage']['alpha_E'] * (flows['P_sto_NH3_ch'] + flows['P_sto_NH3_dis'])
+    values['b_sto_NH3_ch'] = (flows['P_sto_NH3_ch'] > 0).astype(float64)
+
+    consumption = values['P_EL_E'] + values['P_EL_cooling'] + values['P_C_H2_E'] + values['P_C_air_E'] + \
+                  values['P_AS_E'] + values['P_C_N2_E'] + values['P_AP_E'] + values['P_sto_NH3_E']
+    if case == 3:
+        storage = resources['electrical_storage']
+        h = len(flows['P_sto_E_ch'])
+        consumption = consumption + flows['P_sto_E_ch'] - flows['P_sto_E_dis']
+        values['b_sto_E'] = (flows['P_sto_E_ch'] > 0).astype(float64)
+        values['P_sto_E_ch_space'] = append(values['b_sto_E'] * storage['max_charging'] - flows['P_sto_E_ch'], 0)
+        values['P_sto_E_dis_space'] = append((1 - values['b_sto_E']) * storage['max_discharging'] -
+                                             flows['P_sto_E_dis'], 0)
+        values['b_sto_E_space'] = zeros(h)
+        for name in ['U_sto_E', 'U_sto_E_ch', 'U_sto_E_dis', 'D_sto_E', 'D_sto_E_ch', 'D_sto_E_dis']:
+            values[name] = zeros(h)
+    else:
+        for name in ['P_sto_E_ch', 'P_sto_E_dis']:
+            values.pop(name)
+    values['P_PV'] = minimum(flows['P_PV'], consumption.clip(0))
+
+    values = {name: tile(array_values, (number_resources, 1)) for name, array_values in values.items()}
+    values['P_E'] = number_resources * (consumption - values['P_PV'][0]).clip(0)
+    values['P_E_pos'] = values['P_E']
+    values['P_E_neg'] = zeros(len(consumption))
+    values['P_H2'] = number_resources * (values['P_C_H2_market'][0] + values['P_sto_H2_market'][0])
+
+    return values
+
+
+def get_max_violation(m: ConcreteModel) -> float:
+    ''' Largest violation of the active constraints of the model by the current values of the variables '''
+    violation = 0
+    for constraint in m.component_data_objects(Constraint, active=True, descend_into=True):
+        body = value(constraint.body, exception=False)
+        if body is None:
+            return inf
+        if constraint.has_lb():
+            violation = max(violation, value(constraint.lower) - body)
+        if constraint.has_ub():
+            violation = max(violation, body - value(constraint.upper))
+
+    return violation
+
+
+def load_dispatch(m: ConcreteModel, h: int, number_resources: int, resources: dict, prices: dict,
+                  case: int) -> ConcreteModel:
+    ''' Set the rule-based dispatch as the values of the variables of the model, as a start for the solver '''
+    return load_variable_values(m, simulate_dispatch(h, number_resources, resources, prices, case))
+
+
+def benchmark_dispatch(case: int, h: int, solver_options: dict = None) -> list:
+    ''' Compare time to the first incumbent and total solve time of a cold start and a start from the dispatch
+
+    The first incumbent is timed by a HiGHS callback on improving solutions, so it needs the appsi_highs interface.
+    '''
+    import highspy
+    from time import perf_counter
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import create_objective_function, get_solver_options, select_solver, \
+        solve_optimization_model
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = []
+    for warmstart in [False, True]:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources)
+        m = create_model(m, h, 1, resources, case)
+        m = create_objective_function(m, h, 1, resources, prices, case)
+        result = {'case': case, 'h': h, 'warmstart': warmstart}
+        if warmstart:
+            time_start = perf_counter()
+            m = load_dispatch(m, h, 1, resources, prices, case)
+            result.update({'dispatch time (s)': perf_counter() - time_start,
+                           'dispatch objective': value(m.value), 'dispatch violation': get_max_violation(m)})
+
+        solver = select_solver(solver_options)
+        solver.set_instance(m)
+        incumbents = []
+        solver._solver_model.setCallback(lambda callback_type, message, data_out, data_in, user_data:
+                                         incumbents.append((data_out.running_time, data_out.objective_function_value)),
+                                         None)
+        solver._solver_model.startCallback(highspy.cb.HighsCallbackType.kCallbackMipImprovingSolution)
+        solve_status = solve_optimization_model(m, solver_options, solver, warmstart)
+        first_incumbent = [(time, objective) for time, objective in incumbents if isfinite(objective)][0:1]
+        result.update({'first incumbent time (s)': first_incumbent[0][0] if first_incumbent else None,
+                       'first incumbent objective': first_incumbent[0][1] if first_incumbent else None,
+                       'time (s)': solve_status['time'], 'nodes': solve_status['nodes'],
+                       'objective': solve_status['objective']})
+        results.append(result)
+        print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_dispatch(3, 24)
+    benchmark_dispatch(3, 24 * 2)
@@ -1,9 +1,44 @@
 from pathlib import Path
+from numpy import *
 from xlrd import *
 
+from get_resources import CACHE_DIR, get_file_hash
+
 
 INPUT_DIR = Path(__file__).parent.parent / "data_input"
 
+# Columns of the price workbooks, read from the second row on
+PRICE_COLUMNS = {'energy_market': 2,
+                 'band': 3,
+                 'upward': 4,
+                 'downward': 5,
+                 'ratio_U': 6,
+                 'ratio_D': 7}
+
+
+def read_price_workbook(book_networks: Path) -> ndarray:
+    ''' Read the price columns of a workbook in bulk, one row per column of PRICE_COLUMNS '''
+    wb_networks = open_workbook(book_networks, on_demand=True)
+    xl_sheet = wb_networks.sheet_by_index(0)
+
+    price_table = array([xl_sheet.col_values(col, 1) for col in PRICE_COLUMNS.values()], dtype=float64)
+
+    return price_table
+
+
+def get_price_table(book_networks: Path) -> ndarray:
+    ''' Get the price columns of a workbook, memory-mapped from the cache if it was already read
+
+    The cache is a NPY file in data_input/cache keyed by the hash of the workbook, so it is
+    rebuilt when the workbook changes.
+    '''
+    cache_file = CACHE_DIR / f"{book_networks.stem.replace(' ', '')}_{get_file_hash(book_networks)}.npy"
+    if not cache_file.exists():
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        save(cache_file, read_price_workbook(book_networks))
+
+    return load(cache_file, mmap_mode='r')
+
 
 def get_prices(case_nr: int, h: int) -> dict:
     ''' Get prices data '''
@@ -15,16 +50,18 @@ def get_prices(case_nr: int, h: int) -> dict:
     else:
         book_networks = INPUT_DIR / "2022 - Prices_4days.xls"
 
-    wb_networks = open_workbook(book_networks)
-    xl_sheet = wb_networks.sheet_by_index(0)
+    price_table = get_price_table(book_networks)
+    if price_table.shape[1] < h:
+        raise ValueError(f"{book_networks.name} has {price_table.shape[1]} hours of prices, {h} were asked")
+    columns = dict(zip(PRICE_COLUMNS.keys(), price_table[:, 0:h]))
 
-    energy_market = [xl_sheet.cell(1 + t, 2).value/1000 for t in range(0, h)]
-    energy = [50/1000 for t in range(0, h)]
-    band = [xl_sheet.cell(1 + t, 3).value/1000 for t in range(0, h)]
-    upward = [xl_sheet.cell(1 + t, 4).value/1000 for t in range(0, h)]
-    downward = [xl_sheet.cell(1 + t, 5).value/1000 for t in range(0, h)]
-    ratio_U = [xl_sheet.cell(1 + t, 6).value for t in range(0, h)]
-    ratio_D = [xl_sheet.cell(1 + t, 7).value for t in range(0, h)]
+    energy_market = columns['energy_market']/1000
+    energy = full(h, 50/1000)
+    band = columns['band']/1000
+    upward = columns['upward']/1000
+    downward = columns['downward']/1000
+    ratio_U = array(columns['ratio_U'])
+    ratio_D = array(columns['ratio_D'])
 
     prices = {'energy': energy,
               'energy_market': energy_market,
@@ -42,20 +79,4 @@ def get_prices(case_nr: int, h: int) -> dict:
 
 
 if __name__ == '__main__':
-    get_prices(24 * 365)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    get_prices(0, 24 * 365)
@@ -3,8 +3,10 @@ from pyomo.environ import *
 import pandas as pd
 from pathlib import Path
 import json
+import hashlib
 
 INPUT_DIR = Path(__file__).parent.parent / "data_input"
+CACHE_DIR = INPUT_DIR / "cache"
 
 
 def get_resources(case_nr: int) -> dict:
@@ -127,44 +129,67 @@ def get_resources(case_nr: int) -> dict:
 
 
 
-def get_PV_profile(case_nr) -> list:
+def get_file_hash(path: Path) -> str:
+    ''' Hash of the content of a file, used as the key of its cache '''
+    return hashlib.sha1(path.read_bytes()).hexdigest()[0:12]
+
+
+def read_irradiance_json(location: str = 'Montijo', year: int = 2022) -> ndarray:
+    ''' Read the swflx forecasts of a location (Montijo or Lisboa) in one year
+
+    The records are normalised into columns in one pass and filtered by the year of the
+    datetime. The JSON holds overlapping forecasts, most recent datetime first, so a
+    datetime equal to the one kept just before is a repeated forecast and is dropped.
+    '''
+    with open(INPUT_DIR / f"{location}.json", encoding='utf-8') as inputfile:
+        data = pd.json_normalize(json.load(inputfile)['data'])
+
+    datetime = pd.to_datetime(data['datetime'], format='%Y-%m-%dT%H:%M:%S')
+    data = data.assign(datetime=datetime)[datetime.dt.year == year]
+    data = data[data['datetime'] != data['datetime'].shift(fill_value=datetime.iloc[0])]
+
+    irradiance = zeros(len(data), dtype=[('datetime', 'datetime64[s]'), ('swflx', 'float64')])
+    irradiance['datetime'] = data['datetime'].values
+    irradiance['swflx'] = data['variable.swflx'].values
+
+    return irradiance
+
+
+def get_irradiance(location: str = 'Montijo', year: int = 2022) -> ndarray:
+    ''' Get the swflx forecasts of a location, from the cache if the JSON was already read
+
+    The cache is a NPY file in data_input/cache keyed by the hash of the JSON, so it is
+    rebuilt when the JSON changes.
+    '''
+    cache_file = CACHE_DIR / f"{location}_{year}_{get_file_hash(INPUT_DIR / f'{location}.json')}.npy"
+    if cache_file.exists():
+        return load(cache_file)
+
+    irradiance = read_irradiance_json(location, year)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    save(cache_file, irradiance)
+
+    return irradiance
+
+
+def get_PV_profile(case_nr, location: str = 'Montijo') -> list:
     ''' Load PV data from JSON and read the swflx values'''
 
     if case_nr == 1:
-        ''' Gets the data from JSON and transforms it '''
-        with open(INPUT_DIR / "Montijo.json", encoding='utf-8') as inputfile:
-            df = pd.read_json(inputfile)
-
-        PV_profile = []
-        PV_profile_data = []
-        test_date = df['data'][0]['datetime']
-        for i in range(0, len(df)):
-            if 1:
-                if df['data'][i]['datetime']  != test_date and df['data'][i]['datetime'][0:4] == '2022':
-                    test_date = df['data'][i]['datetime']
-                    PV_profile_data.append([df['data'][i]['datetime'][0:10],
-                                            df['data'][i]['datetime'][11:],
-                                            df['data'][i]['variable']['swflx'],
-                                            df['data'][i]['variable']['swflx']/1030]) # 1030 is the maximum swflx, used to
-                                                                                      # put PV in percentage
-                    PV_profile.append(df['data'][i]['variable']['swflx'])
-        PV_profile.append(0)
-        pd.DataFrame(PV_profile_data).to_csv(INPUT_DIR / 'PV_profile_data.csv')
-
-        PV_profile = [i/max(PV_profile) for i in PV_profile]
+        ''' Gets the data from JSON (or its cache) and transforms it '''
+        PV_profile = append(get_irradiance(location, 2022)['swflx'], 0)
+        PV_profile = (PV_profile / PV_profile.max()).tolist()
 
     elif case_nr == 2:
         ''' Loads the data from excel file '''
         df = pd.read_csv(INPUT_DIR / 'PV_profile_data_short.csv')
-        PV_profile = df['2'].values.tolist()
-        PV_profile = [i/max(PV_profile) for i in PV_profile]
-        PV_profile.reverse()
+        PV_profile = df['2'].values[::-1]
+        PV_profile = (PV_profile / PV_profile.max()).tolist()
     else:
         ''' Loads the data from excel file '''
         df = pd.read_csv(INPUT_DIR / 'PV_profile_data_4days.csv')
-        PV_profile = df['2'].values.tolist()
-        PV_profile = [i/max(PV_profile) for i in PV_profile]
-        PV_profile.reverse()
+        PV_profile = df['2'].values[::-1]
+        PV_profile = (PV_profile / PV_profile.max()).tolist()
 
     print(PV_profile)
     print(max(PV_profile))
@@ -5,7 +5,9 @@ from get_prices import *
 from create_variables import *
 from create_model import *
 from run_optimization_model import *
+from rolling_horizon import *
 from save_results import *
+from results import *
 from create_figures import *
 from create_figures_bar import *
 from create_figures_SOC import *
@@ -27,31 +29,47 @@ def main():
         h = 24 * 1 * 4
 
     number_resources = 1
+    # The case 3 MILP does not close its gap with HiGHS in minutes: stop at 1% or after 300 s with the incumbent
+    solver_options = get_solver_options(solver='highs', threads=None, mip_gap=0.01, time_limit=300,
+                                        heuristic=None,  # None or relax_and_fix
+                                        warmstart=False)
 
     print("... Get data ...")
     resources = get_resources(case_nr)
     prices = get_prices(case_nr, h)
 
-    # Create pyomo model
-    print("... Create model  ...")
-    m = ConcreteModel()
-    m.c1 = ConstraintList()
+    rolling_horizon_option = 0
+    if rolling_horizon_option:
+        print("... Run rolling horizon model ...")
+        m, solve_status = run_rolling_horizon(h, number_resources, resources, prices, case_nr,
+                                              window=48, commit=24, solver_options=solver_options)
+    else:
+        # Create pyomo model
+        print("... Create model  ...")
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
 
-    # Run aggregator model
-    m = create_variables(m, h, number_resources)
-    m = create_model(m, h, number_resources, resources, case_nr)
-    print("... Run model ...")
-    run_optimization_model(m, h, number_resources, resources, prices, case_nr)
+        # Run aggregator model (the lean formulation merges the pass-through flows of the plant)
+        lean_option = 1
+        m = create_variables(m, h, number_resources, case_nr, resources, lean_option)
+        m = create_model(m, h, number_resources, resources, case_nr)
+        print("... Run model ...")
+        solve_status = run_optimization_model(m, h, number_resources, resources, prices, case_nr, solver_options)
+    print(solve_status)
 
     print("... Save results ...")
-    save_results(m, h, case_nr, prices, resources, number_resources)
+    results = get_results(m, h, case_nr, prices, resources, number_resources)
+    results_path = save_results_file(results)     # figures can be created again from load_results
+    results_formats = ['xls']      # 'xls', 'csv', 'parquet', 'feather', 'xlsx' (use csv/parquet for 8760 h)
+    save_results(results, results_formats)
 
     print("")
     show_figure_option = 1
     save_figure_option = 1
-    #create_figures(m, h, case_nr, save_figure_option, show_figure_option)
-    #create_figures_bar(m, h, case_nr)
-    #create_figures_SOC(m, h, resources, case_nr)
+    #create_figures(results, h, case_nr, save_figure_option, show_figure_option)
+    #create_figures_bar(results, h, case_nr)
+    #create_figures_SOC(results, h, resources, case_nr)
+    #render_reports([results_path])   # all the charts, headless, into data/reports (see render_figures)
 
     return 0
 
@@ -0,0 +1,113 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from create_variables import create_variables
+from create_model import create_model
+from run_optimization_model import create_objective_function, select_solver, solve_optimization_model, \
+    get_solver_options
+
+
+# Time-varying series of get_prices that are stored in mutable parameters (not ratio_U and ratio_D, which the
+# model does not use: create_objective_function weights the reserve energy by the upward and downward prices)
+PRICE_SERIES = ['energy', 'energy_market', 'band', 'upward', 'downward']
+
+
+def create_parameters(m: ConcreteModel, h: int, resources: dict, prices: dict) -> ConcreteModel:
+    ''' Create mutable parameters for the prices and the PV profile '''
+    for key in PRICE_SERIES:
+        m.add_component(f'price_{key}', Param(arange(h), mutable=True, within=Reals,
+                                              initialize={t: float(prices[key][t]) for t in range(0, h)}))
+    m.PV_profile = Param(arange(h), mutable=True, within=Reals,
+                         initialize={t: float(resources['PV']['PV_profile'][t]) for t in range(0, h)})
+
+    return m
+
+
+def update_parameters(m: ConcreteModel, h: int, resources: dict = None, prices: dict = None) -> ConcreteModel:
+    ''' Swap the values of the prices and/or the PV profile in place '''
+    if prices is not None:
+        for key in PRICE_SERIES:
+            getattr(m, f'price_{key}').store_values({t: float(prices[key][t]) for t in range(0, h)})
+    if resources is not None:
+        m.PV_profile.store_values({t: float(resources['PV']['PV_profile'][t]) for t in range(0, h)})
+
+    return m
+
+
+def create_persistent_model(h: int, number_resources: int, resources: dict, prices: dict, case: int) -> ConcreteModel:
+    ''' Create the optimization model with the time-varying data in mutable parameters
+
+    The model is built with create_model and create_objective_function, which receive the
+    parameters in place of the lists, so the constraints and the objective refer to them.
+    '''
+    m = ConcreteModel()
+    m.c1 = ConstraintList()
+    m = create_variables(m, h, number_resources, case, resources)
+    m = create_parameters(m, h, resources, prices)
+
+    model_resources = dict(resources)
+    model_resources['PV'] = dict(resources['PV'], PV_profile=m.PV_profile)
+    model_prices = dict(prices)
+    for key in PRICE_SERIES:
+        model_prices[key] = getattr(m, f'price_{key}')
+
+    m = create_model(m, h, number_resources, model_resources, case)
+    m = create_objective_function(m, h, number_resources, model_resources, model_prices, case)
+
+    return m
+
+
+def resolve_persistent_model(m: ConcreteModel, h: int, solver, resources: dict = None, prices: dict = None,
+                             solver_options: dict = None) -> dict:
+    ''' Update the prices and/or PV profile and solve again, warm started from the last solution '''
+    m = update_parameters(m, h, resources, prices)
+
+    return solve_optimization_model(m, solver_options, solver, warmstart=True)
+
+
+def benchmark_persistent_model(case: int, h: int, updates: int = 5, solver_options: dict = None) -> list:
+    ''' Compare re-solving the persistent model with rebuilding the model for new prices '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from run_optimization_model import run_optimization_model
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    time_start = perf_counter()
+    m = create_persistent_model(h, 1, resources, prices, case)
+    solver = select_solver(solver_options)
+    solve_optimization_model(m, solver_options, solver)
+    print({'first solve (s)': perf_counter() - time_start})
+
+    results = []
+    for update in range(1, updates + 1):
+        new_prices = dict(prices)
+        new_prices['energy'] = [price * (1 + 0.05 * update) for price in prices['energy']]
+
+        time_start = perf_counter()
+        solve_status = resolve_persistent_model(m, h, solver, prices=new_prices, solver_options=solver_options)
+        persistent_time = perf_counter() - time_start
+
+        time_start = perf_counter()
+        m_rebuilt = ConcreteModel()
+        m_rebuilt.c1 = ConstraintList()
+        m_rebuilt = create_variables(m_rebuilt, h, 1, case, resources)
+        m_rebuilt = create_model(m_rebuilt, h, 1, resources, case)
+        rebuilt_status = run_optimization_model(m_rebuilt, h, 1, resources, new_prices, case, solver_options)
+        rebuilt_time = perf_counter() - time_start
+
+        results.append({'update': update,
+                        'persistent time (s)': persistent_time, 'persistent objective': solve_status['objective'],
+                        'rebuilt time (s)': rebuilt_time, 'rebuilt objective': rebuilt_status['objective']})
+        print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_persistent_model(2, 24 * 7 * 4)
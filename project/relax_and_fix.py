@@ -0,0 +1,139 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from run_optimization_model import select_solver, solve_optimization_model, get_solver_options
+
+
+def get_binaries(m: ConcreteModel) -> dict:
+    ''' Binary variables of the model grouped by the timestep they belong to '''
+    binaries = {}
+    for data in m.component_data_objects(Var, descend_into=True):
+        if data.is_binary():
+            binaries.setdefault(data.index()[-1], []).append(data)
+
+    return binaries
+
+
+def set_binaries(binaries: dict, timesteps, state: str) -> None:
+    ''' Make the binaries of the timesteps 'relaxed' (to [0, 1]), 'binary' or 'fixed' (to their rounded value) '''
+    for t in timesteps:
+        for data in binaries.get(t, []):
+            if state == 'relaxed':
+                data.unfix()
+                data.domain = UnitInterval
+            elif state == 'binary':
+                data.unfix()
+                data.domain = Binary
+            else:
+                data.domain = Binary
+                data.fix(round(data.value) if data.value is not None else 0)
+
+
+def run_relax_and_fix(m: ConcreteModel, h: int, solver_options: dict = None, window: int = 24, commit: int = 12,
+                      block: int = 48, overlap: int = 24, passes: int = 1) -> dict:
+    ''' Find a feasible schedule of a long-horizon MILP with relax-and-fix and improve it with fix-and-optimize
+
+    Relax-and-fix solves the model with the binaries of a window of `window` hours, the
+    binaries before it fixed and the binaries after it relaxed, and fixes the first `commit`
+    hours of the window before moving on. Fix-and-optimize then frees the binaries of one block
+    of `block` hours at a time, `overlap` hours over the last one, keeping the rest fixed and
+    starting from the incumbent. The first relax-and-fix solve is a relaxation of the model, so
+    its bound gives the gap of the incumbent. The model must have its objective.
+    '''
+    if commit > window or overlap >= block:
+        raise ValueError("The committed hours must fit in the window and the overlap in the block")
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    time_start = perf_counter()
+    solver = select_solver(solver_options)
+    binaries = get_binaries(m)
+    timesteps = sorted(binaries)
+    set_binaries(binaries, timesteps, 'relaxed')
+
+    lower_bound = None
+    iterations = 0
+    for start in range(0, h, commit):
+        set_binaries(binaries, [t for t in timesteps if start <= t < start + window], 'binary')
+        solve_status = solve_optimization_model(m, solver_options, solver)
+        iterations = iterations + 1
+        if not solve_status['feasible']:
+            raise RuntimeError(f"Relax-and-fix window at hour {start} could not be solved: "
+                               f"{solve_status['termination_condition']}")
+        if lower_bound is None:
+            lower_bound = solve_status['lower_bound']
+        set_binaries(binaries, [t for t in timesteps if start <= t < start + commit], 'fixed')
+
+    incumbent = value(m.value)
+    relax_and_fix_objective = incumbent
+    for fix_and_optimize_pass in range(0, passes):
+        for start in range(0, h, block - overlap):
+            values = [(data, data.value) for data in m.component_data_objects(Var, descend_into=True)]
+            set_binaries(binaries, [t for t in timesteps if start <= t < start + block], 'binary')
+            solve_status = solve_optimization_model(m, solver_options, solver, warmstart=True)
+            iterations = iterations + 1
+            if solve_status['feasible'] and value(m.value) <= incumbent + 1e-9 * abs(incumbent):
+                incumbent = value(m.value)
+            else:
+                for data, data_value in values:
+                    data.set_value(data_value, skip_validation=True)
+            set_binaries(binaries, [t for t in timesteps if start <= t < start + block], 'fixed')
+            if start + block >= h:
+                break
+
+    gap = None
+    if lower_bound is not None and isfinite(lower_bound):
+        gap = abs(incumbent - lower_bound) / maximum(abs(incumbent), 1e-10)
+    mip_gap = solver_options.get('mip_gap') or 1e-4
+
+    set_binaries(binaries, timesteps, 'binary')
+
+    return {'solver': solver_options['solver'],
+            'heuristic': 'relax_and_fix',
+            'termination_condition': 'heuristic',
+            'optimal': gap is not None and gap <= mip_gap,
+            'feasible': True,
+            'time': perf_counter() - time_start,
+            'objective': incumbent,
+            'relax-and-fix objective': relax_and_fix_objective,
+            'lower_bound': lower_bound,
+            'gap': gap,
+            'iterations': iterations}
+
+
+def benchmark_relax_and_fix(case: int, h: int, time_limit: float = 600, window: int = 24, commit: int = 12,
+                            block: int = 48, overlap: int = 24) -> dict:
+    ''' Compare relax-and-fix with the monolithic MILP, each subproblem limited to a tenth of its time '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model, create_objective_function
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = {'case': case, 'h': h}
+    for heuristic in [None, 'relax_and_fix']:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources)
+        m = create_model(m, h, 1, resources, case)
+        if heuristic is None:
+            solve_status = run_optimization_model(m, h, 1, resources, prices, case,
+                                                  get_solver_options(time_limit=time_limit))
+        else:
+            m = create_objective_function(m, h, 1, resources, prices, case)
+            solve_status = run_relax_and_fix(m, h, get_solver_options(time_limit=time_limit / 10),
+                                             window, commit, block, overlap)
+        label = heuristic or 'monolithic'
+        results.update({f'{label} time (s)': solve_status['time'], f'{label} objective': solve_status['objective'],
+                        f'{label} gap': solve_status['gap']})
+    print(results)
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_relax_and_fix(3, 24 * 1 * 4)
@@ -0,0 +1,215 @@
+import matplotlib
+matplotlib.use('Agg')   # headless: no window and no plt.show() blocking the batch
+import matplotlib.pyplot as plt
+from numpy import *
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from time import perf_counter
+import hashlib
+import io
+import json
+import os
+import shutil
+
+from results import load_results
+from create_figures import crete_figures_total_electricity, crete_figures_electricity_use, \
+    create_figures_hydrogen_use, create_figures_nitrogen_use, create_figures_ammonia_use, draw_pie_chart
+from create_figures_SOC import create_figures_electricity_soc, create_figures_ammonia_soc, \
+    create_figures_nitrogen_soc, create_figures_hydrogen_soc, create_figures_pv, draw_soc_chart, draw_pv_chart, \
+    MAX_POINTS
+from create_figures_bar import get_bar_data, draw_bar_chart
+
+
+OUTPUT_DIR = Path(__file__).parent.parent / "data" / "reports"
+
+# Size of the figure each kind of chart is drawn into, one figure per kind reused for every chart of a process
+TEMPLATES = {'pie': (7, 5), 'soc': (15, 5), 'pv': (15, 5), 'bar': (6.4, 4.8)}
+
+# Name of the file of the hashes of the charts already rendered in a report
+MANIFEST = "figures.json"
+
+
+def get_pie_data(figure):
+    return lambda results: figure(results, results['h'], results['case'], 1, 0)
+
+
+def get_soc_data(figure):
+    def get_data(results):
+        input_data, color_list, labels = figure(results, results['h'], results['resources'], results['case'], 1, 0)
+        return input_data, list(range(0, results['h'])), color_list, labels, 100
+    return get_data
+
+
+def get_pv_data(results):
+    input_data, color_list, labels = create_figures_pv(results, results['h'], results['resources'], results['case'],
+                                                       1, 0)
+    return input_data, list(range(0, results['h'])), color_list, labels, results['resources']['PV']['max_power'] / 1000
+
+
+# Charts of a report: file name, cases that have it, template, arguments of the draw function and draw function
+CHARTS = [("Electricity consumption.png", [1, 2, 3], 'pie', get_pie_data(crete_figures_total_electricity),
+           draw_pie_chart),
+          ("Electricity_use.png", [1, 2, 3], 'pie', get_pie_data(crete_figures_electricity_use), draw_pie_chart),
+          ("Hydrogen_use.png", [1, 2, 3], 'pie', get_pie_data(create_figures_hydrogen_use), draw_pie_chart),
+          ("Nitrogen_use.png", [1, 2, 3], 'pie', get_pie_data(create_figures_nitrogen_use), draw_pie_chart),
+          ("Ammonia_use.png", [1, 2, 3], 'pie', get_pie_data(create_figures_ammonia_use), draw_pie_chart),
+          ("Electricity_soc.png", [3], 'soc', get_soc_data(create_figures_electricity_soc), draw_soc_chart),
+          ("Ammonia_soc.png", [1, 2, 3], 'soc', get_soc_data(create_figures_ammonia_soc), draw_soc_chart),
+          ("Nitrogen_soc.png", [1, 2, 3], 'soc', get_soc_data(create_figures_nitrogen_soc), draw_soc_chart),
+          ("Hydrogen_soc.png", [1, 2, 3], 'soc', get_soc_data(create_figures_hydrogen_soc), draw_soc_chart),
+          ("PV_generation.png", [1, 2, 3], 'pv', get_pv_data, draw_pv_chart),
+          ("products.png", [1, 2, 3], 'bar', lambda results: get_bar_data(results, results['h'], results['case']),
+           draw_bar_chart)]
+
+# Figures of the templates of this process
+FIGURES = {}
+
+
+def get_figure(template: str) -> plt.Figure:
+    ''' Empty figure of a template, created once per process and cleared for every chart '''
+    if template not in FIGURES:
+        FIGURES[template] = plt.figure(figsize=TEMPLATES[template])
+    fig = FIGURES[template]
+    fig.clf()
+
+    return fig
+
+
+def get_data_hash(name: str, template: str, dpi: int, data: tuple) -> str:
+    ''' Hash of the input data of a chart, with its file name, template, resolution and point budget '''
+    data = json.dumps([name, TEMPLATES[template], dpi, MAX_POINTS, data], default=lambda x: asarray(x).tolist())
+
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def render_report(task: tuple) -> dict:
+    ''' Render the charts of one results file (see save_results_file) into its report directory
+
+    task is (results path, report directory, dpi, force). Charts whose input data has the hash
+    recorded in the manifest of the report, and whose file exists, are skipped unless forced.
+    '''
+    path, report_dir, dpi, force = task
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = report_dir / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    results = load_results(path)
+    summary = {'report': str(report_dir), 'rendered': 0, 'skipped': 0}
+    for name, cases, template, get_data, draw in CHARTS:
+        if results['case'] not in cases:
+            continue
+        with redirect_stdout(io.StringIO()):   # the figure functions print their values
+            data = get_data(results)
+        data_hash = get_data_hash(name, template, dpi, data)
+        if not force and manifest.get(name) == data_hash and (report_dir / name).exists():
+            summary['skipped'] += 1
+            continue
+
+        fig = get_figure(template)
+        draw(fig, *data)
+        fig.savefig(report_dir / name, dpi=dpi)
+        manifest[name] = data_hash
+        summary['rendered'] += 1
+
+    manifest_path.with_suffix('.tmp').write_text(json.dumps(manifest, indent=1))
+    manifest_path.with_suffix('.tmp').replace(manifest_path)
+
+    return summary
+
+
+def render_reports(paths: list, workers: int = None, output_dir: Path = OUTPUT_DIR, dpi: int = 300,
+                   force: bool = False) -> list:
+    ''' Render the charts of many results files in a process pool, each into output_dir/<file name>
+
+    Only the charts whose input data changed since the last run are drawn again. Returns one
+    summary per path, in the order of paths; a report that failed has its error in 'error' and
+    does not stop the others, with or without the pool.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = [(Path(path), Path(output_dir) / Path(path).stem, dpi, force) for path in paths]
+    summaries = [None] * len(tasks)
+
+    def set_summary(i, get_summary):
+        try:
+            summaries[i] = dict(get_summary(), error=None)
+        except Exception as error:
+            print(f"Report {tasks[i][0]} failed: {error}")
+            summaries[i] = {'report': str(tasks[i][1]), 'rendered': 0, 'skipped': 0, 'error': repr(error)}
+
+    if workers == 1:
+        for i, task in enumerate(tasks):
+            set_summary(i, lambda: render_report(task))
+        return summaries
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_report, task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            set_summary(futures[future], future.result)
+
+    return summaries
+
+
+def benchmark_render(case: int = 1, h: int = 24, number_reports: int = 5, workers: list = [1, 2],
+                     solver_options: dict = None) -> list:
+    ''' Time the rendering of many reports with a fresh figure per chart, with the templates in a
+    process pool, and again when no input data changed '''
+    from tempfile import TemporaryDirectory
+    from pyomo.environ import ConcreteModel, ConstraintList
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model
+    from results import get_results, save_results_file
+
+    with redirect_stdout(io.StringIO()):
+        resources = get_resources(case)
+        prices = get_prices(case, h)
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case, resources)
+        m = create_model(m, h, 1, resources, case)
+        run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+        results = get_results(m, h, case, prices, resources, 1)
+
+    benchmarks = []
+    with TemporaryDirectory() as directory:
+        paths = []
+        for n in range(0, number_reports):
+            path = save_results_file(results, f"results_case{case}_render{n}")
+            paths.append(Path(shutil.move(path, Path(directory) / path.name)))
+
+        time_start = perf_counter()
+        for path in paths:
+            report = load_results(path)
+            for name, cases, template, get_data, draw in CHARTS:
+                if case in cases:
+                    with redirect_stdout(io.StringIO()):
+                        data = get_data(report)
+                    fig = plt.figure(figsize=TEMPLATES[template])
+                    draw(fig, *data)
+                    fig.savefig(Path(directory) / name, dpi=300)
+                    plt.close(fig)
+        benchmarks.append({'reports': number_reports, 'mode': 'fresh figures',
+                           'time (s)': perf_counter() - time_start})
+
+        for number_workers in workers:
+            output_dir = Path(directory) / f"workers{number_workers}"
+            for mode in ['templates', 'unchanged']:
+                time_start = perf_counter()
+                summaries = render_reports(paths, number_workers, output_dir)
+                benchmarks.append({'reports': number_reports, 'mode': mode, 'workers': number_workers,
+                                   'time (s)': perf_counter() - time_start,
+                                   'rendered': sum([summary['rendered'] for summary in summaries]),
+                                   'skipped': sum([summary['skipped'] for summary in summaries])})
+    for benchmark in benchmarks:
+        print(benchmark)
+
+    return benchmarks
+
+
+if __name__ == '__main__':
+    benchmark_render()
@@ -0,0 +1,152 @@
+from numpy import *
+from pyomo.environ import *
+from pathlib import Path
+from time import perf_counter
+import json
+
+from create_variables import get_variable_values
+
+OUTPUT_DIR = Path(__file__).parent.parent / "data"
+
+
+def get_results(m: ConcreteModel, h: int, case_nr: int, prices: dict, resources: dict,
+                number_resources: int) -> dict:
+    ''' Extract the results of a solved model once, as arrays that save_results and the figures read
+    without the model
+
+    values holds every variable as get_variable_values returns it and totals their sums over
+    the horizon (per resource for the variables indexed by resource).
+    '''
+    values = get_variable_values(m)
+    results = {'h': h, 'case': case_nr, 'number_resources': number_resources, 'values': values,
+               'prices': {name: asarray(price, dtype=float64)[0:h] if ndim(price) > 0 else float(price)
+                          for name, price in prices.items()},
+               'resources': resources,
+               'totals': get_totals(values, h)}
+
+    return results
+
+
+def get_totals(values: dict, h: int) -> dict:
+    ''' Sums over the first h timesteps of every variable (nan counted as zero) '''
+    return {name: nansum(array_values[..., 0:h], axis=-1) for name, array_values in values.items()}
+
+
+def get_series(results: dict, name: str, resource: int = 0) -> ndarray:
+    ''' Values of a variable over the horizon (of the resource for the variables indexed by resource),
+    zero if the model does not have it '''
+    h = results['h']
+    if name not in results['values']:
+        return zeros(h)
+    array_values = results['values'][name]
+    if array_values.ndim > 1:
+        array_values = array_values[resource]
+
+    return nan_to_num(array_values[0:h])
+
+
+def get_total(results: dict, name: str, resource: int = 0) -> float:
+    ''' Sum of a variable over the horizon (of the resource for the variables indexed by resource),
+    zero if the model does not have it '''
+    if name not in results['totals']:
+        return 0.0
+    total = results['totals'][name]
+
+    return float(total[resource] if ndim(total) > 0 else total)
+
+
+def save_results_file(results: dict, name: str = None) -> Path:
+    ''' Save the results into a compressed NPZ file: the arrays of the values, totals and prices, and the
+    horizon, case and resources as JSON '''
+    if name is None:
+        name = f"results_case{results['case']}"
+    path = OUTPUT_DIR / f"{name}.npz"
+
+    arrays = {}
+    for group in ['values', 'totals', 'prices']:
+        for key, array_values in results[group].items():
+            arrays[f"{group}/{key}"] = asarray(array_values)
+    metadata = {key: results[key] for key in ['h', 'case', 'number_resources', 'resources']}
+    arrays['metadata'] = array(json.dumps(metadata, default=lambda x: asarray(x).tolist()))
+    savez_compressed(path, **arrays)
+
+    return path
+
+
+def load_results(path: Path) -> dict:
+    ''' Load results saved by save_results_file '''
+    with load(path) as data:
+        results = json.loads(str(data['metadata']))
+        for group in ['values', 'totals', 'prices']:
+            results[group] = {}
+        for key in data.files:
+            if key == 'metadata':
+                continue
+            group, name = key.split('/', 1)
+            array_values = data[key]
+            results[group][name] = float(array_values) if group == 'prices' and array_values.ndim == 0 \
+                else array_values
+
+    return results
+
+
+def benchmark_results(case: int, h: int, solver_options: dict = None) -> dict:
+    ''' Time the extraction of the results of a solved case, their file and the figures rendered from it '''
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import run_optimization_model
+    from save_results import get_cost_results
+    from create_figures import crete_figures_total_electricity, crete_figures_electricity_use, \
+        create_figures_hydrogen_use, create_figures_nitrogen_use, create_figures_ammonia_use, \
+        create_pie_chart_all_figures
+    from io import BytesIO
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+    m = ConcreteModel()
+    m.c1 = ConstraintList()
+    m = create_variables(m, h, 1, case, resources)
+    m = create_model(m, h, 1, resources, case)
+    solve_status = run_optimization_model(m, h, 1, resources, prices, case, solver_options)
+
+    time_start = perf_counter()
+    results = get_results(m, h, case, prices, resources, 1)
+    extraction_time = perf_counter() - time_start
+    path = save_results_file(results, f"results_case{case}_benchmark")
+
+    time_start = perf_counter()
+    model_totals = [sum([m.P_C_air_E[0, t]() for t in range(0, h)]) for n in range(0, 5)]
+    model_time = perf_counter() - time_start
+
+    time_start = perf_counter()
+    results = load_results(path)
+    totals = [get_total(results, 'P_C_air_E') for n in range(0, 5)]
+    costs = get_cost_results(results)
+    fig, axs = plt.subplots(3, 2, figsize=(20, 8))
+    for (i, j), figure in zip([(0, 0), (0, 1), (1, 0), (1, 1), (2, 0)],
+                              [crete_figures_total_electricity, crete_figures_electricity_use,
+                               create_figures_hydrogen_use, create_figures_nitrogen_use, create_figures_ammonia_use]):
+        input_data, color_list, labels, title = figure(results, h, case, 1, 0)
+        create_pie_chart_all_figures(input_data, color_list, labels, title, axs, i, j)
+    fig.savefig(BytesIO(), dpi=100)
+    file_time = perf_counter() - time_start
+    path.unlink()
+    plt.close(fig)
+
+    benchmark = {'case': case, 'h': h, 'solve time (s)': solve_status['time'],
+                 'extraction time (s)': extraction_time, 'model totals time (s)': model_time,
+                 'load, totals, costs and figures time (s)': file_time,
+                 'same totals': bool(isclose(model_totals[0], totals[0])),
+                 'total costs (k€)': costs['Total costs (k€)']}
+    print(benchmark)
+
+    return benchmark
+
+
+if __name__ == '__main__':
+    benchmark_results(2, 24 * 7 * 4)
@@ -0,0 +1,153 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from create_variables import create_variables, get_variable_values, load_variable_values
+from create_model import create_model
+from create_model_matrix import create_matrix_model, solve_matrix_model, get_matrix_solution
+from run_optimization_model import run_optimization_model, create_objective_function, get_solver_options
+
+
+# State-of-charge variable of each storage carried from one window to the next
+STORAGES = {'hydrogen_storage': 'soc_sto_H2',
+            'nitrogen_storage': 'soc_sto_N2',
+            'ammonia_storage': 'soc_sto_NH3',
+            'electrical_storage': 'soc_sto_E'}
+
+
+def get_window_data(resources: dict, prices: dict, start: int, length: int, initial_soc: dict) -> tuple:
+    ''' Slice the time-varying data of a window and set the state-of-charge it starts from
+
+    Every window must end at least at the final state-of-charge of the whole horizon.
+    '''
+    window_resources = dict(resources)
+    window_resources['PV'] = dict(resources['PV'])
+    window_resources['PV']['PV_profile'] = resources['PV']['PV_profile'][start:start + length + 1]
+
+    for storage in STORAGES:
+        window_resources[storage] = dict(resources[storage])
+        window_resources[storage]['final_soc'] = resources[storage].get('final_soc',
+                                                                         resources[storage]['initial_soc'])
+        if storage in initial_soc:
+            window_resources[storage]['initial_soc'] = initial_soc[storage]
+
+    window_prices = {}
+    for key, value in prices.items():
+        if isinstance(value, (list, ndarray)):
+            window_prices[key] = value[start:start + length]
+        else:
+            window_prices[key] = value
+
+    return window_resources, window_prices
+
+
+def solve_window(length: int, number_resources: int, resources: dict, prices: dict, case: int,
+                 solver_options: dict, engine: str) -> tuple:
+    ''' Build and solve one window and return the values of its variables '''
+    if engine == 'matrix':
+        lp = create_matrix_model(length, number_resources, resources, prices, case)
+        solution = solve_matrix_model(lp, solver_options.get('time_limit'), solver_options.get('mip_gap'))
+        if solution['x'] is None:
+            raise RuntimeError(f"Window could not be solved: {solution['message']}")
+        solve_status = {'optimal': solution['status'] == 0, 'objective': solution['objective'], 'gap': None}
+
+        return get_matrix_solution(lp, solution['x']), solve_status
+
+    m = ConcreteModel()
+    m.c1 = ConstraintList()
+    m = create_variables(m, length, number_resources, case, resources)
+    m = create_model(m, length, number_resources, resources, case)
+    solve_status = run_optimization_model(m, length, number_resources, resources, prices, case, solver_options)
+    if not solve_status['feasible']:
+        raise RuntimeError(f"Window could not be solved: {solve_status['termination_condition']}")
+
+    return get_variable_values(m), solve_status
+
+
+def run_rolling_horizon(h: int, number_resources: int, resources: dict, prices: dict, case: int,
+                        window: int = 48, commit: int = 24, solver_options: dict = None,
+                        engine: str = 'pyomo') -> tuple:
+    ''' Solve the horizon in overlapping windows and stitch the committed hours together
+
+    Each window of `window` hours is solved, its first `commit` hours are kept, and the
+    state-of-charge of every storage at the end of the committed hours becomes the initial
+    state-of-charge of the next window. Returns a model with the variables of the whole
+    horizon, which save_results and the figures can read, and the solve status.
+    '''
+    if number_resources != 1:
+        raise ValueError("The rolling horizon carries one state-of-charge per storage, use number_resources = 1")
+    if commit > window:
+        raise ValueError("The committed hours must fit in the window")
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    time_start = perf_counter()
+    values = {}
+    initial_soc = {}
+    windows_status = []
+    for start in range(0, h, commit):
+        length = min(window, h - start)
+        n_commit = min(commit, h - start)
+
+        window_resources, window_prices = get_window_data(resources, prices, start, length, initial_soc)
+        window_values, window_status = solve_window(length, number_resources, window_resources, window_prices,
+                                                    case, solver_options, engine)
+        windows_status.append(window_status)
+
+        for name, window_array in window_values.items():
+            extra = window_array.shape[-1] - length
+            if name not in values:
+                values[name] = full(window_array.shape[:-1] + (h + extra,), nan)
+            values[name][..., start:start + n_commit + extra] = window_array[..., 0:n_commit + extra]
+
+        for storage, soc in STORAGES.items():
+            if soc in window_values and not isnan(window_values[soc][0, n_commit]):
+                initial_soc[storage] = window_values[soc][0, n_commit]
+
+    m = ConcreteModel()
+    m = create_variables(m, h, number_resources, case, resources)
+    m = load_variable_values(m, values)
+    m = create_objective_function(m, h, number_resources, resources, prices, case)
+
+    solve_status = {'engine': engine,
+                    'windows': len(windows_status),
+                    'optimal': all([status['optimal'] for status in windows_status]),
+                    'time': perf_counter() - time_start,
+                    'objective': value(m.value)}
+
+    return m, solve_status
+
+
+def benchmark_rolling_horizon(case: int, h: int, window: int = 48, commit: int = 24,
+                              solver_options: dict = None, engine: str = 'pyomo') -> dict:
+    ''' Compare the rolling horizon with the monolithic solve of the same horizon '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    time_start = perf_counter()
+    monolithic_values, monolithic_status = solve_window(h, 1, resources, prices, case, solver_options, engine)
+    monolithic_time = perf_counter() - time_start
+
+    m, rolling_status = run_rolling_horizon(h, 1, resources, prices, case, window, commit, solver_options, engine)
+
+    benchmark = {'case': case, 'h': h, 'window': window, 'commit': commit,
+                 'monolithic time (s)': monolithic_time,
+                 'monolithic objective': monolithic_status['objective'],
+                 'rolling time (s)': rolling_status['time'],
+                 'rolling objective': rolling_status['objective'],
+                 'gap': (rolling_status['objective'] - monolithic_status['objective']) /
+                        abs(monolithic_status['objective'])}
+    print(benchmark)
+
+    return benchmark
+
+
+if __name__ == '__main__':
+    benchmark_rolling_horizon(1, 24 * 4)
+    benchmark_rolling_horizon(2, 24 * 7 * 4)
@@ -1,8 +1,147 @@
 from numpy import *
 from pyomo.environ import *
+from time import perf_counter
 
-def run_optimization_model(m: ConcreteModel, h: int, number_resources: int, resources: dict, prices: dict, case: int) -> None:
-    ''' Run optimization model as per the objective function '''
+from complementarity import has_relaxed_binaries, complete_relaxed_solution, restore_binaries
+from dispatch import load_dispatch
+
+
+# Pyomo interface of each solver, in-memory interfaces first, and the names of the
+# threads, relative MIP gap and time limit options of each solver
+SOLVERS = {'highs': {'interfaces': ['appsi_highs', 'highs'],
+                     'threads': 'threads', 'mip_gap': 'mip_rel_gap', 'time_limit': 'time_limit'},
+           'cplex': {'interfaces': ['cplex_direct', 'cplex'],
+                     'threads': 'threads', 'mip_gap': 'mip_tolerances_mipgap', 'time_limit': 'timelimit'},
+           'cbc': {'interfaces': ['cbc'],
+                   'threads': 'threads', 'mip_gap': 'ratioGap', 'time_limit': 'sec'},
+           'glpk': {'interfaces': ['glpk'],
+                    'threads': None, 'mip_gap': 'mipgap', 'time_limit': 'tmlim'},
+           }
+
+
+def get_solver_options(solver: str = 'highs', threads: int = None, mip_gap: float = None,
+                       time_limit: float = None, tee: bool = False, heuristic: str = None,
+                       warmstart: bool = False) -> dict:
+    ''' Get solver configuration '''
+    solver_options = {'solver': solver,          # highs, cplex, cbc or glpk
+                      'threads': threads,
+                      'mip_gap': mip_gap,        # relative gap
+                      'time_limit': time_limit,  # s
+                      'tee': tee,
+                      'heuristic': heuristic,    # None (monolithic) or relax_and_fix
+                      'warmstart': warmstart}    # start from the rule-based dispatch
+
+    return solver_options
+
+
+def select_solver(solver_options: dict):
+    ''' Create the solver, using the first available interface of the selected solver '''
+    solver_name = solver_options['solver']
+    if solver_name not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver_name}, choose one of {list(SOLVERS)}")
+
+    for interface in SOLVERS[solver_name]['interfaces']:
+        solver = SolverFactory(interface)
+        if solver.available(exception_flag=False):
+            break
+    else:
+        raise RuntimeError(f"Solver {solver_name} is not available")
+
+    for option in ['threads', 'mip_gap', 'time_limit']:
+        if solver_options.get(option) is not None and SOLVERS[solver_name][option] is not None:
+            solver.options[SOLVERS[solver_name][option]] = solver_options[option]
+
+    return solver
+
+
+def solve_optimization_model(m: ConcreteModel, solver_options: dict = None, solver=None,
+                             warmstart: bool = False) -> dict:
+    ''' Solve the model and return the solve status, wall time and gap
+
+    A solver created by select_solver can be passed to solve the same model again. The
+    appsi interfaces keep the model loaded and only update what changed since the last solve.
+    With warmstart, the current values of the variables are given to the solver as a start.
+    If the model has relaxed storage binaries, the solution is completed and, if a storage
+    charges and discharges at once, its binaries are restored and the model solved again.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+    if solver is None:
+        solver = select_solver(solver_options)
+
+    solve_kwargs = {'tee': solver_options.get('tee', False), 'load_solutions': False}
+    if warmstart:
+        solve_kwargs['warmstart'] = True
+
+    time_start = perf_counter()
+    results = solver.solve(m, **solve_kwargs)
+    solve_time = perf_counter() - time_start
+
+    if len(results.solution) > 0:
+        m.solutions.load_from(results)
+        if has_relaxed_binaries(m):
+            simultaneous = complete_relaxed_solution(m)
+            if len(simultaneous) > 0:
+                for block, storage in simultaneous:
+                    restore_binaries(block, [storage])
+                solve_status = solve_optimization_model(m, solver_options, solver, warmstart)
+                solve_status['time'] += solve_time
+
+                return solve_status
+
+    lower_bound = results.problem.lower_bound
+    upper_bound = results.problem.upper_bound
+    gap = None
+    if lower_bound is not None and upper_bound is not None and \
+            isfinite(lower_bound) and isfinite(upper_bound):
+        gap = abs(upper_bound - lower_bound) / maximum(abs(upper_bound), 1e-10)
+
+    solve_status = {'solver': solver_options['solver'],
+                    'status': str(results.solver.status),
+                    'termination_condition': str(results.solver.termination_condition),
+                    'optimal': (results.solver.status == SolverStatus.ok) and
+                               (results.solver.termination_condition == TerminationCondition.optimal),
+                    'feasible': len(results.solution) > 0,
+                    'time': solve_time,
+                    'objective': upper_bound,
+                    'lower_bound': lower_bound,
+                    'gap': gap,
+                    'nodes': get_node_count(solver)}
+
+    return solve_status
+
+
+def get_node_count(solver) -> int:
+    ''' Branch-and-bound nodes of the last solve (None if the solver interface does not report them) '''
+    solver_model = getattr(solver, '_solver_model', None)
+    if solver_model is None or not hasattr(solver_model, 'getInfo'):
+        return None
+
+    return max(int(solver_model.getInfo().mip_node_count), 0)
+
+
+def run_optimization_model(m: ConcreteModel, h: int, number_resources: int, resources: dict, prices: dict, case: int,
+                           solver_options: dict = None) -> dict:
+    ''' Run optimization model as per the objective function, with the heuristic of the solver options if any
+
+    With the warmstart option, the solver starts from the rule-based dispatch (see dispatch).
+    '''
+    m = create_objective_function(m, h, number_resources, resources, prices, case)
+
+    warmstart = solver_options is not None and solver_options.get('warmstart', False)
+    if warmstart:
+        m = load_dispatch(m, h, number_resources, resources, prices, case)
+
+    if solver_options is not None and solver_options.get('heuristic') == 'relax_and_fix':
+        from relax_and_fix import run_relax_and_fix
+        return run_relax_and_fix(m, h, solver_options)
+
+    return solve_optimization_model(m, solver_options, warmstart=warmstart)
+
+
+def create_objective_function(m: ConcreteModel, h: int, number_resources: int, resources: dict, prices: dict,
+                              case: int) -> ConcreteModel:
+    ''' Create the objective function '''
     c_H2O = resources['electrolyzer']['c_H2O']
     c_O2 = resources['electrolyzer']['c_O2']
 
@@ -36,6 +175,7 @@ def run_optimization_model(m: ConcreteModel, h: int, number_resources: int, reso
     elif case == 2:
         f_E = sum(price_E[t] * m.P_E_pos[t] - price_E_market[t] * m.P_E_neg[t] for t in range(0, h))
         f_hy = price_hy * sum(m.P_H2[t] for t in range(0, h))
+        f_E_reservas = 0
     else:
         f_E = sum(price_E[t] * m.P_E_pos[t] - price_E_market[t] * m.P_E_neg[t] for t in range(0, h))
         f_hy = price_hy * sum(m.P_H2[t] for t in range(0, h))
@@ -53,13 +193,4 @@ def run_optimization_model(m: ConcreteModel, h: int, number_resources: int, reso
     m.value = Objective(expr= f_E + f_E_reservas + f_water - f_hy  - f_oxyg - f_ammonia
                         , sense=minimize)
 
-    solver = SolverFactory("cplex")
-    results = solver.solve(m, tee=False)
-
-    if (results.solver.status == SolverStatus.ok) and \
-            (results.solver.termination_condition == TerminationCondition.optimal):
-        print("Flow optimized")
-    else:
-        print("Did no converge")
-
-    return 0
\ No newline at end of file
+    return m
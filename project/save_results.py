@@ -3,16 +3,87 @@ from numpy import *
 from pyomo.environ import *
 from pathlib import Path
 from time import *
+import pandas as pd
 
 OUTPUT_DIR = Path(__file__).parent.parent / "data"
 
-def save_results(m: ConcreteModel(), h: int, case_nr: int, prices: dict, resources: dict, number_resources: int) -> None:
-    ''' Save results into excel file'''
-    book = xlwt.Workbook()
-
-    book = save_energy(m, h, case_nr, book)
-    book = save_costs(m, h, case_nr, prices, resources, number_resources, book)
-    save_excel(book, case_nr)
+# Columns of the energy results: blocks of (header, label, variable), with the cases that have them.
+# The xls sheet leaves an empty column between blocks.
+ENERGY_SCHEMA = [
+    ([1, 2, 3], [("Net-load", "Total", "P_E"),
+                 ("Net-load", "Electricity consumption (kW)", "P_E_pos"),
+                 ("Net-load", "Electricity injection (kW)", "P_E_neg")]),
+    ([1, 2, 3], [("PV", "PV generation (kW)", "P_PV")]),
+    ([1, 2, 3], [("Electrolyzer", "Electricity consumption (kW)", "P_EL_E"),
+                 ("Electrolyzer", "Electricity consumption for cooling (kW)", "P_EL_cooling"),
+                 ("Electrolyzer", "EL -> C_H2 (kg)", "P_EL_C_H2")]),
+    ([1, 2, 3], [("Hydrogen compressor", "Electricity consumption (kW)", "P_C_H2_E"),
+                 ("Hydrogen compressor", "C_H2 -> Sto H2 (kg)", "P_C_H2_sto_H2"),
+                 ("Hydrogen compressor", "C_H2 -> AP (kg)", "P_C_H2_AP")]),
+    ([1, 2, 3], [("Hydrogen storage", "soc (kg)", "soc_sto_H2"),
+                 ("Hydrogen storage", "charging (kg)", "P_sto_H2_ch"),
+                 ("Hydrogen storage", "discharging (kg)", "P_sto_H2_dis"),
+                 ("Hydrogen storage", "sto_H2 -> AP (kg)", "P_sto_H2_AP"),
+                 ("Hydrogen storage", "b_ch", "b_sto_H2_ch")]),
+    ([1, 2, 3], [("Air compressor", "Air input (kg)", "P_C_air"),
+                 ("Air compressor", "Electricity consumption (kW)", "P_C_air_E"),
+                 ("Air compressor", "C_air -> AS (kg)", "P_C_air_AS")]),
+    ([1, 2, 3], [("Air separation", "Nitrogen generation (kg)", "P_AS_N2"),
+                 ("Air separation", "Electricity consumption (kW)", "P_AS_E"),
+                 ("Air separation", "AS -> C_N2 (kg)", "P_AS_C_N2")]),
+    ([1, 2, 3], [("Nitrogen compressor", "Nitrogen output (kg)", "P_C_N2"),
+                 ("Nitrogen compressor", "C_N2 -> Sto_N2 (kg)", "P_C_N2_sto_N2"),
+                 ("Nitrogen compressor", "C_N2 -> AP (kg)", "P_C_N2_AP"),
+                 ("Nitrogen compressor", "Electricity consumption (kW)", "P_C_N2_E")]),
+    ([1, 2, 3], [("Nitrogen storage", "soc (kg)", "soc_sto_N2"),
+                 ("Nitrogen storage", "charging (kg)", "P_sto_N2_ch"),
+                 ("Nitrogen storage", "discharging (kg)", "P_sto_N2_dis"),
+                 ("Nitrogen storage", "sto_N2 -> AP (kg)", "P_sto_N2_AP"),
+                 ("Nitrogen storage", "b_ch", "b_sto_N2_ch")]),
+    ([1, 2, 3], [("Ammonia plant", "NH3 production (kg)", "P_AP"),
+                 ("Ammonia plant", "H2 consumption (kg)", "P_AP_H2"),
+                 ("Ammonia plant", "N2 consumption (kg)", "P_AP_N2"),
+                 ("Ammonia plant", "AP -> sto_NH3 (kg)", "P_AP_sto_NH3"),
+                 ("Ammonia plant", "AP -> load (kg)", "P_AP_load"),
+                 ("Ammonia plant", "Electricity consumption (kW)", "P_AP_E")]),
+    ([1, 2, 3], [("Ammonia storage", "soc (kg)", "soc_sto_NH3"),
+                 ("Ammonia storage", "charging (kg)", "P_sto_NH3_ch"),
+                 ("Ammonia storage", "discharging (kg)", "P_sto_NH3_dis"),
+                 ("Ammonia storage", "sto_NH3 -> load (kg)", "P_sto_NH3_load"),
+                 ("Ammonia storage", "b_ch", "b_sto_NH3_ch")]),
+    ([1, 2, 3], [("Ammonia load", "sto_NH3 -> load (kg)", "P_sto_NH3_load"),
+                 ("Ammonia load", "AP -> load (kg)", "P_AP_load"),
+                 ("Ammonia storage", "sto_NH3 electricity consumption (kW)", "P_sto_NH3_E")]),
+    ([2, 3], [("Hydrogen compressor", "C_H2 -> market (kg)", "P_C_H2_market"),
+              ("Hydrogen storage", "sto_H2 -> market (kg)", "P_sto_H2_market")]),
+    ([3], [("Electrical storage system", "soc (kWh)", "soc_sto_E"),
+           ("Electrical storage system", "charging (kW)", "P_sto_E_ch"),
+           ("Electrical storage system", "discharging (kW)", "P_sto_E_dis"),
+           ("Electrical storage system", "Upward", "U_sto_E"),
+           ("Electrical storage system", "Upward ch", "U_sto_E_ch"),
+           ("Electrical storage system", "Upward dis", "U_sto_E_dis"),
+           ("Electrical storage system", "Downward", "D_sto_E"),
+           ("Electrical storage system", "Downward ch", "D_sto_E_ch"),
+           ("Electrical storage system", "Downward dis", "D_sto_E_dis")]),
+]
+
+# Limits of the xls format
+XLS_MAX_ROWS = 65536
+XLS_MAX_COLUMNS = 256
+
+
+def save_results(results: dict, formats: tuple = ('xls',)) -> None:
+    ''' Save results (see results.get_results) into excel file, and/or into the columnar formats of export_results'''
+    if 'xls' in formats:
+        book = xlwt.Workbook()
+
+        book = save_energy(results, book)
+        book = save_costs(results, book)
+        save_excel(book, results['case'])
+
+    columnar_formats = [results_format for results_format in formats if results_format != 'xls']
+    if len(columnar_formats) > 0:
+        export_results(results, columnar_formats)
 
 
 def save_excel(book, case_nr: int) -> None:
@@ -35,646 +106,186 @@ def save_excel(book, case_nr: int) -> None:
                 print("CLOSE EXCEL!")
 
 
+def get_energy_schema(case: int) -> list:
+    ''' Blocks of (header, label, variable) of the energy results of a case '''
+    return [block for cases, block in ENERGY_SCHEMA if case in cases]
 
 
-def save_energy(m: ConcreteModel(), h: int, case: int, book: xlwt.Workbook) -> xlwt.Workbook:
-    ''' Save energy results'''
-    sh1 = book.add_sheet("CHP net")
+def get_energy_variables(case: int) -> list:
+    ''' Names of the variables in the energy results of a case '''
+    return [name for block in get_energy_schema(case) for header, label, name in block]
 
-    n = 0
-    n += 1
-    sh1.write(0, n + 1, "Net-load")
-    n += 1
-    sh1.write(0, n + 1, "Net-load")
-    n += 1
-    sh1.write(0, n + 1, "Net-load")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "PV")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Electrolyzer")
-    n += 1
-    sh1.write(0, n + 1, "Electrolyzer")
-    n += 1
-    sh1.write(0, n + 1, "Electrolyzer")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen compressor")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen compressor")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen compressor")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen storage")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Air compressor")
-    n += 1
-    sh1.write(0, n + 1, "Air compressor")
-    n += 1
-    sh1.write(0, n + 1, "Air compressor")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Air separation")
-    n += 1
-    sh1.write(0, n + 1, "Air separation")
-    n += 1
-    sh1.write(0, n + 1, "Air separation")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen compressor")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen compressor")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen compressor")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen compressor")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen storage")
-    n += 1
-    sh1.write(0, n + 1, "Nitrogen storage")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia plant")
-
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    n += 1
-    sh1.write(0, n + 1, "Ammonia load")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia load")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia storage")
-    n += 1
-    n += 1
-
-    if case in [2, 3]:
-        sh1.write(0, n + 1, "Hydrogen compressor")
-        n += 1
-        sh1.write(0, n + 1, "Hydrogen storage")
-        n += 1
-        n += 1
-    if case == 3:
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-        n += 1
-        sh1.write(0, n + 1, "Electrical storage system")
-
-
-
-    n = 0
-    n += 1
-    sh1.write(1, n + 1, "Total")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity injection (kW)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "PV generation (kW)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption for cooling (kW)")
-    n += 1
-    sh1.write(1, n + 1, "EL -> C_H2 (kg)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-    n += 1
-    sh1.write(1, n + 1, "C_H2 -> Sto H2 (kg)")
-    n += 1
-    sh1.write(1, n + 1, "C_H2 -> AP (kg)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "soc (kg)")
-    n += 1
-    sh1.write(1, n + 1, "charging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "discharging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "sto_H2 -> AP (kg)")
-    n += 1
-    sh1.write(1, n + 1, "b_ch")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "Air input (kg)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-    n += 1
-    sh1.write(1, n + 1, "C_air -> AS (kg)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "Nitrogen generation (kg)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-    n += 1
-    sh1.write(1, n + 1, "AS -> C_N2 (kg)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "Nitrogen output (kg)")
-    n += 1
-    sh1.write(1, n + 1, "C_N2 -> Sto_N2 (kg)")
-    n += 1
-    sh1.write(1, n + 1, "C_N2 -> AP (kg)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "soc (kg)")
-    n += 1
-    sh1.write(1, n + 1, "charging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "discharging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "sto_N2 -> AP (kg)")
-    n += 1
-    sh1.write(1, n + 1, "b_ch")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "NH3 production (kg)")
-    n += 1
-    sh1.write(1, n + 1, "H2 consumption (kg)")
-    n += 1
-    sh1.write(1, n + 1, "N2 consumption (kg)")
-    n += 1
-    sh1.write(1, n + 1, "AP -> sto_NH3 (kg)")
-    n += 1
-    sh1.write(1, n + 1, "AP -> load (kg)")
-    n += 1
-    sh1.write(1, n + 1, "Electricity consumption (kW)")
-
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "soc (kg)")
-    n += 1
-    sh1.write(1, n + 1, "charging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "discharging (kg)")
-    n += 1
-    sh1.write(1, n + 1, "sto_NH3 -> load (kg)")
-    n += 1
-    sh1.write(1, n + 1, "b_ch")
-    n += 1
-    n += 1
-    sh1.write(1, n + 1, "sto_NH3 -> load (kg)")
-    n += 1
-    sh1.write(1, n + 1, "AP -> load (kg)")
-    n += 1
-    sh1.write(1, n + 1, "sto_NH3 electricity consumption (kW)")
-    n += 1
-    n += 1
-
-    if case in [2, 3]:
-        sh1.write(1, n + 1, "C_H2 -> market (kg)")
-        n += 1
-        sh1.write(1, n + 1, "sto_H2 -> market (kg)")
-        n += 1
-        n += 1
-    if case == 3:
-        sh1.write(1, n + 1, "soc (kWh)")
-        n += 1
-        sh1.write(1, n + 1, "charging (kW)")
-        n += 1
-        sh1.write(1, n + 1, "discharging (kW)")
-        n += 1
-        sh1.write(1, n + 1, "Upward")
-        n += 1
-        sh1.write(1, n + 1, "Upward ch")
-        n += 1
-        sh1.write(1, n + 1, "Upward dis")
-        n += 1
-        sh1.write(1, n + 1, "Downward")
-        n += 1
-        sh1.write(1, n + 1, "Downward ch")
-        n += 1
-        sh1.write(1, n + 1, "Downward dis")
 
-    for t in range(0, h):
-        n = 0
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_E[t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_E_pos[t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_E_neg[t].value)
-        n += 1
-        n += 1
+def get_energy_results(results: dict) -> list:
+    ''' Get the energy results as blocks of (header, label, array) columns
 
-        sh1.write(t + 2, n + 1, m.P_PV[0, t].value)
-        n += 1
-        n += 1
+    Variables indexed by resource give one column per resource.
+    '''
+    h = results['h']
+    values = results['values']
 
-        sh1.write(t + 2, n + 1, m.P_EL_E[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_EL_cooling[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_EL_C_H2[0, t].value)
+    blocks = []
+    for block in get_energy_schema(results['case']):
+        columns = []
+        for header, label, name in block:
+            array_values = values[name] if name in values else full(h, nan)
+            if array_values.ndim == 1:
+                columns.append((header, label, array_values[0:h]))
+            else:
+                for i in range(0, array_values.shape[0]):
+                    resource_label = label if array_values.shape[0] == 1 else f"{label} [{i}]"
+                    columns.append((header, resource_label, array_values[i, 0:h]))
+        blocks.append(columns)
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_H2_E[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_H2_sto_H2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_H2_AP[0, t].value)
+    return blocks
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.soc_sto_H2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_H2_ch[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_H2_dis[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_H2_AP[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.b_sto_H2_ch[0, t].value)
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_air[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_air_E[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_air_AS[0, t].value)
+def get_cost_results(results: dict, n_case: float = None) -> dict:
+    ''' Get the costs (k€), scaled from the horizon to one year by n_case (by default the number of
+    4-day or 4-week horizons in a year) '''
+    h = results['h']
+    case_nr = results['case']
+    prices = results['prices']
+    resources = results['resources']
+    number_resources = results['number_resources']
+    values = results['values']
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AS_N2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AS_E[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AS_C_N2[0, t].value)
+    c_H2O = resources['electrolyzer']['c_H2O']
+    c_O2 = resources['electrolyzer']['c_O2']
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_N2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_N2_sto_N2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_N2_AP[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_C_N2_E[0, t].value)
+    price_E = asarray(prices['energy'][0:h], dtype=float)
+    price_E_market = asarray(prices['energy_market'][0:h], dtype=float)
+    price_B = asarray(prices['band'][0:h], dtype=float)
+    price_E_D = asarray(prices['downward'][0:h], dtype=float)
+    price_E_U = asarray(prices['upward'][0:h], dtype=float)
+    ratio_D = asarray(prices['downward'][0:h], dtype=float)
+    ratio_U = asarray(prices['upward'][0:h], dtype=float)
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.soc_sto_N2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_N2_ch[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_N2_dis[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_N2_AP[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.b_sto_N2_ch[0, t].value)
+    P_E_pos = values['P_E_pos'][0:h]
+    P_E_neg = values['P_E_neg'][0:h]
+    P_H2 = values['P_H2'][0:h]
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_H2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_N2[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_sto_NH3[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_load[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_E[0, t].value)
+    if case_nr in [2, 3]:
+        f_E = (price_E * P_E_pos - price_E_market * P_E_neg).sum() / 1000
+    else:
+        f_E = (price_E * P_E_pos).sum() / 1000
+    if case_nr == 3:
+        U_sto_E = values['U_sto_E'][0, 0:h]
+        D_sto_E = values['D_sto_E'][0, 0:h]
+        f_E_reservas = (- price_B * (U_sto_E + D_sto_E) +
+                        (price_E_D * ratio_D * D_sto_E - price_E_U * ratio_U * U_sto_E)).sum() / 1000
+    else:
+        f_E_reservas = 0
+    f_hy = prices['hydrogen'] * P_H2.sum() / 1000
 
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.soc_sto_NH3[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_NH3_ch[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_NH3_dis[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_NH3_load[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.b_sto_NH3_ch[0, t].value)
-        n += 1
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_NH3_load[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_AP_load[0, t].value)
-        n += 1
-        sh1.write(t + 2, n + 1, m.P_sto_NH3_E[0, t].value)
-        n += 1
-        n += 1
-        if case in [2, 3]:
-            sh1.write(t + 2, n + 1, m.P_C_H2_market[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.P_sto_H2_market[0, t].value)
-            n += 1
-            n += 1
-        if case == 3:
-            sh1.write(t + 2, n + 1, m.soc_sto_E[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.P_sto_E_ch[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.P_sto_E_dis[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.U_sto_E[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.U_sto_E_ch[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.U_sto_E_dis[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.D_sto_E[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.D_sto_E_ch[0, t].value)
-            n += 1
-            sh1.write(t + 2, n + 1, m.D_sto_E_dis[0, t].value)
+    # Water and oxygen use the last hour only, as in the objective function
+    P_EL_E = values['P_EL_E'][0:number_resources, h - 1].sum()
+    f_water = prices['water'] * P_EL_E * c_H2O / 1000
+    f_oxyg = prices['oxygen'] * P_EL_E * c_O2 / 1000
+    f_ammonia = prices['ammonia'] * resources['load_ammonia'][0] * h / 1000
 
+    if n_case is None:
+        n_case = 13 if case_nr == 2 else 7 * 13
 
+    costs = {"Total costs (k€)": (f_E + f_E_reservas - f_hy + f_water - f_oxyg - f_ammonia) * n_case,
+             "Electricity energy (k€)": f_E * n_case,
+             "Electricity reserves (k€)": f_E_reservas * n_case,
+             "Hydrogen (k€)": f_hy * n_case,
+             "Water (k€)": f_water * n_case,
+             "Oxygen (k€)": f_oxyg * n_case,
+             "Ammonia (k€)": f_ammonia * n_case}
 
+    return {key: float(value) for key, value in costs.items()}
 
-    if 0:
-        """
-        n = 0
-        n += 1
-        sh1.write(0, n + 1, "P_PV")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "P_EL_E")
-        n += 1
-        sh1.write(0, n + 1, "P_EL_CAES_H2")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "soc_CAES_H2")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_H2_ch")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_H2_dis")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_H2_sto_H2")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_H2_AP")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_H2_E")
-        n += 1
-        sh1.write(0, n + 1, "b_CAES_H2_ch")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "soc_sto_H2")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_H2_ch")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_H2_dis")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_H2_AP")
-        n += 1
-        sh1.write(0, n + 1, "b_sto_H2_ch")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "soc_CAES_air")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_air_ch")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_air_dis")
-        n += 1
-        sh1.write(0, n + 1, "P_air")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_air_sto_air")
-        n += 1
-        sh1.write(0, n + 1, "P_CAES_air_E")
-        n += 1
-        sh1.write(0, n + 1, "b_CAES_air_ch")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "soc_sto_air")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_air_ch")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_air_dis")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_air_AP")
-        n += 1
-        sh1.write(0, n + 1, "b_sto_air_ch")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "P_AP")
-        n += 1
-        sh1.write(0, n + 1, "P_AP_H2")
-        n += 1
-        sh1.write(0, n + 1, "P_AP_air")
-        n += 1
-        sh1.write(0, n + 1, "P_AP_E")
-        n += 1
-        sh1.write(0, n + 1, "P_AP_sto_NH3")
-        n += 1
-        sh1.write(0, n + 1, "P_AP_load")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "soc_sto_NH3")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_NH3_ch")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_NH3_dis")
-        n += 1
-        sh1.write(0, n + 1, "P_sto_NH3_load")
-        n += 1
-        sh1.write(0, n + 1, "b_sto_NH3_ch")
-        n += 1
-        n += 1
-        sh1.write(0, n + 1, "P_sto_NH3_load")
+
+def save_energy(results: dict, book: xlwt.Workbook) -> xlwt.Workbook:
+    ''' Save energy results'''
+    sh1 = book.add_sheet("CHP net")
+
+    h = results['h']
+    blocks = get_energy_results(results)
+    n_columns = 2 + sum([len(columns) + 1 for columns in blocks])
+    if h + 2 > XLS_MAX_ROWS or n_columns > XLS_MAX_COLUMNS:
+        raise ValueError(f"{h} hours and {n_columns} columns do not fit in a xls sheet, use export_results")
+
+    n = 1
+    for columns in blocks:
+        for header, label, array_values in columns:
+            sh1.write(0, n + 1, header)
+            sh1.write(1, n + 1, label)
+            for t, value in enumerate(where(isnan(array_values), None, array_values).tolist()):
+                sh1.write(t + 2, n + 1, value)
+            n += 1
         n += 1
-        sh1.write(0, n + 1, "P_AP_load")
-        """
 
     return book
 
 
-def save_costs(m: ConcreteModel(), h: int, case_nr: int, prices: dict, resources: dict,
-               number_resources: int, book: xlwt.Workbook) -> xlwt.Workbook:
+def save_costs(results: dict, book: xlwt.Workbook) -> xlwt.Workbook:
     ''' Save costs results'''
     sh1 = book.add_sheet("Costs")
 
-    c_H2O = resources['electrolyzer']['c_H2O']
-    c_O2 = resources['electrolyzer']['c_O2']
-
-    price_E = prices['energy']
-    price_E_market = prices['energy_market']
-    price_B = prices['band']
-    price_E_D = prices['downward']
-    price_E_U = prices['upward']
-    ratio_D = prices['downward']
-    ratio_U = prices['upward']
-    price_hy = prices['hydrogen']
-    price_water = prices['water']
-    price_oxyg = prices['oxygen']
-    price_ammonia = prices['ammonia']
-
-    P_H2O = []
-    P_O2 = []
-    for t in range(0, h):
-        P_H2O.append(sum(m.P_EL_E[i, t]()/1000 for i in range(0, number_resources)) * c_H2O)
-        P_O2.append(sum(m.P_EL_E[i, t]()/1000 for i in range(0, number_resources)) * c_O2)
-
-    if case_nr == 3:
-        f_E = sum(price_E[t] * m.P_E_pos[t]() - price_E_market[t] * m.P_E_neg[t]() for t in range(0, h))/1000
-        f_E_reservas = sum(
-                  - price_B[t] * (m.U_sto_E[0, t]() + m.D_sto_E[0, t]()) +
-                  (price_E_D[t] * ratio_D[t] * m.D_sto_E[0, t]() -
-                   price_E_U[t] * ratio_U[t] * m.U_sto_E[0, t]()) for t in range(0, h)) / 1000
-        f_hy = price_hy * sum(m.P_H2[t]() for t in range(0, h))/1000
-    elif case_nr == 2:
-        f_E = sum(price_E[t] * m.P_E_pos[t]() - price_E_market[t] * m.P_E_neg[t]() for t in range(0, h))/1000
-        f_hy = price_hy * sum(m.P_H2[t]() for t in range(0, h))/1000
-    else:
-        f_E = sum(price_E[t] * m.P_E_pos[t]() for t in range(0, h))/1000
-        f_hy = price_hy * sum(m.P_H2[t]() for t in range(0, h))/1000
-        f_E_reservas= 0
-
-    f_water = price_water * sum(m.P_EL_E[i, t]() for i in range(0, number_resources)) * c_H2O/1000
-    f_oxyg = price_oxyg * sum(m.P_EL_E[i, t]() for i in range(0, number_resources)) * c_O2/1000
-    f_ammonia = price_ammonia * sum(resources['load_ammonia'][0] for t in range(0, h))/1000
-
-    n = 0
-    n += 1
-    sh1.write(0, n + 1, "Total costs (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Electricity energy (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Electricity reserves (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Hydrogen (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Water (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Oxygen (k€)")
-    n += 1
-    sh1.write(0, n + 1, "Ammonia (k€)")
-    n += 1
-
-    if case_nr == 1:
-        n = 0
-        n += 1
-        n_case = 7 * 13
-        sh1.write(1, n + 1, (f_E - f_hy + f_water - f_oxyg - f_ammonia) * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_E * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_E_reservas * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_hy * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_water * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_oxyg * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_ammonia * n_case)
-        n += 1
-    elif case_nr == 2:
-        n_case = 13
-        n = 0
-        n += 1
-        sh1.write(1, n + 1, (f_E - f_hy + f_water - f_oxyg - f_ammonia) * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_E * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_E_reservas * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_hy * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_water * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_oxyg * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_ammonia * n_case)
-        n += 1
-
-    else:
-        n_case = 7 * 13
-        n = 0
-        n += 1
-        sh1.write(1, n + 1, (f_E + f_E_reservas - f_hy + f_water - f_oxyg - f_ammonia) * n_case )
-        n += 1
-        sh1.write(1, n + 1, f_E * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_E_reservas * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_hy * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_water * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_oxyg * n_case)
-        n += 1
-        sh1.write(1, n + 1, f_ammonia * n_case)
-        n += 1
+    costs = get_cost_results(results)
+    for n, (label, cost) in enumerate(costs.items()):
+        sh1.write(0, n + 2, label)
+        sh1.write(1, n + 2, cost)
 
     return book
 
 
-
+def get_results_tables(results: dict) -> tuple:
+    ''' Get the energy results (one column per "header - label") and the costs as tables '''
+    energy = {}
+    for columns in get_energy_results(results):
+        for header, label, array_values in columns:
+            energy[f"{header} - {label}"] = array_values
+    energy = pd.DataFrame(energy, index=pd.RangeIndex(results['h'], name='t'))
+    costs = pd.DataFrame([get_cost_results(results)])
+
+    return energy, costs
+
+
+def export_results(results: dict, formats: list = ('csv',), name: str = None) -> list:
+    ''' Export the energy results and the costs in columnar formats: csv, parquet, feather or xlsx
+
+    Parquet and feather need pyarrow and xlsx needs xlsxwriter, which are optional.
+    Returns the paths of the files written.
+    '''
+    if name is None:
+        name = f"outputs_case{results['case']}"
+    energy, costs = get_results_tables(results)
+
+    paths = []
+    for results_format in formats:
+        if results_format == 'csv':
+            energy.to_csv(OUTPUT_DIR / f"{name}_energy.csv")
+            costs.to_csv(OUTPUT_DIR / f"{name}_costs.csv", index=False)
+            paths += [OUTPUT_DIR / f"{name}_energy.csv", OUTPUT_DIR / f"{name}_costs.csv"]
+        elif results_format == 'parquet':
+            energy.to_parquet(OUTPUT_DIR / f"{name}_energy.parquet")
+            costs.to_parquet(OUTPUT_DIR / f"{name}_costs.parquet")
+            paths += [OUTPUT_DIR / f"{name}_energy.parquet", OUTPUT_DIR / f"{name}_costs.parquet"]
+        elif results_format == 'feather':
+            energy.reset_index().to_feather(OUTPUT_DIR / f"{name}_energy.feather")
+            costs.to_feather(OUTPUT_DIR / f"{name}_costs.feather")
+            paths += [OUTPUT_DIR / f"{name}_energy.feather", OUTPUT_DIR / f"{name}_costs.feather"]
+        elif results_format == 'xlsx':
+            save_xlsx(OUTPUT_DIR / f"{name}.xlsx", {"Energy": energy.reset_index(), "Costs": costs})
+            paths.append(OUTPUT_DIR / f"{name}.xlsx")
+        else:
+            raise ValueError(f"Unknown results format {results_format}, use csv, parquet, feather or xlsx")
+
+    return paths
+
+
+def save_xlsx(path: Path, tables: dict) -> None:
+    ''' Save tables into a xlsx file, streaming the rows so the whole sheet is never kept in memory '''
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    for sheet_name, table in tables.items():
+        sheet = workbook.add_worksheet(sheet_name)
+        sheet.write_row(0, 0, list(table.columns))
+        for row, row_values in enumerate(table.itertuples(index=False, name=None)):
+            sheet.write_row(row + 1, 0, [None if value != value else value for value in row_values])
+    workbook.close()
@@ -0,0 +1,159 @@
+from numpy import *
+from pyomo.environ import *
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from time import perf_counter
+import hashlib
+import json
+import os
+import pandas as pd
+
+from get_resources import get_resources
+from get_prices import get_prices
+from create_variables import create_variables, get_variable_values
+from create_model import create_model
+from create_model_matrix import create_matrix_model, solve_matrix_model, get_matrix_solution
+from run_optimization_model import run_optimization_model, get_solver_options
+
+
+OUTPUT_DIR = Path(__file__).parent.parent / "data" / "sweeps"
+
+# Horizon of each case, as in main()
+HORIZON = {1: 24 * 1 * 4, 2: 24 * 7 * 4, 3: 24 * 1 * 4}
+
+
+def create_scenarios(grid: dict) -> list:
+    ''' Create one scenario per combination of the values in the grid
+
+    The keys of the grid are 'case_nr', 'h', or paths into the resources and prices
+    dicts, for example 'resources.electrolyzer.max_power' or 'prices.hydrogen'.
+    '''
+    keys = list(grid.keys())
+    scenarios = [dict(zip(keys, values)) for values in product(*[grid[key] for key in keys])]
+
+    return scenarios
+
+
+def get_scenario_id(scenario: dict) -> str:
+    ''' Identifier of a scenario, used as the name of its checkpoint '''
+    return hashlib.sha1(json.dumps(scenario, sort_keys=True).encode()).hexdigest()[0:12]
+
+
+def set_scenario_value(data: dict, path: list, value) -> None:
+    ''' Set a value in the nested resources or prices dicts '''
+    for key in path[:-1]:
+        data = data[key]
+    data[path[-1]] = value
+
+
+def get_scenario_data(scenario: dict) -> tuple:
+    ''' Get the resources and prices of a scenario '''
+    case_nr = scenario.get('case_nr', 3)
+    h = scenario.get('h', HORIZON[case_nr])
+
+    resources = get_resources(case_nr)
+    prices = get_prices(case_nr, h)
+    for key, value in scenario.items():
+        path = key.split('.')
+        if path[0] == 'resources':
+            set_scenario_value(resources, path[1:], value)
+        elif path[0] == 'prices':
+            set_scenario_value(prices, path[1:], value)
+
+    return case_nr, h, resources, prices
+
+
+def run_scenario(scenario: dict, solver_options: dict, engine: str = 'pyomo') -> dict:
+    ''' Build and solve one scenario and return one row of results '''
+    if solver_options.get('threads') is not None:
+        os.environ['OMP_NUM_THREADS'] = str(solver_options['threads'])
+
+    case_nr, h, resources, prices = get_scenario_data(scenario)
+
+    if engine == 'matrix':
+        time_start = perf_counter()
+        lp = create_matrix_model(h, 1, resources, prices, case_nr)
+        solution = solve_matrix_model(lp, solver_options.get('time_limit'), solver_options.get('mip_gap'))
+        values = get_matrix_solution(lp, solution['x']) if solution['x'] is not None else {}
+        solve_status = {'termination_condition': solution['message'], 'optimal': solution['status'] == 0,
+                        'objective': solution['objective'], 'gap': None, 'time': perf_counter() - time_start}
+    else:
+        m = ConcreteModel()
+        m.c1 = ConstraintList()
+        m = create_variables(m, h, 1, case_nr, resources)
+        m = create_model(m, h, 1, resources, case_nr)
+        solve_status = run_optimization_model(m, h, 1, resources, prices, case_nr, solver_options)
+        values = get_variable_values(m) if solve_status['feasible'] else {}
+
+    row = dict(scenario)
+    row.update({'scenario_id': get_scenario_id(scenario),
+                'termination_condition': solve_status['termination_condition'],
+                'optimal': solve_status['optimal'],
+                'objective': solve_status['objective'],
+                'gap': solve_status['gap'],
+                'solve time (s)': solve_status['time']})
+    for name, label in [('P_E_pos', 'electricity bought (kWh)'), ('P_E_neg', 'electricity sold (kWh)'),
+                        ('P_PV', 'PV generation (kWh)'), ('P_EL_E', 'electrolyzer consumption (kWh)'),
+                        ('P_H2', 'hydrogen sold (kg)'), ('U_sto_E', 'upward reserve (kWh)'),
+                        ('D_sto_E', 'downward reserve (kWh)')]:
+        row[label] = float(nansum(values[name][..., 0:h])) if name in values else None
+
+    return row
+
+
+def run_scenario_sweep(grid: dict, sweep_name: str, workers: int = None, threads_per_worker: int = 1,
+                       solver_options: dict = None, engine: str = 'pyomo') -> pd.DataFrame:
+    ''' Solve every scenario of the grid in a process pool
+
+    Each completed scenario is saved to data/sweeps/<sweep_name>/<scenario_id>.json, so an
+    interrupted sweep resumes with the scenarios that are missing. Returns one table with a
+    row per scenario, which is also saved as results.csv.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+    solver_options = dict(solver_options, threads=threads_per_worker)
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    sweep_dir = OUTPUT_DIR / sweep_name
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+
+    scenarios = create_scenarios(grid)
+    pending = [scenario for scenario in scenarios
+               if not (sweep_dir / f"{get_scenario_id(scenario)}.json").exists()]
+    print(f"... {len(scenarios) - len(pending)} of {len(scenarios)} scenarios already solved ...")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_scenario, scenario, solver_options, engine): scenario
+                   for scenario in pending}
+        for future in as_completed(futures):
+            scenario = futures[future]
+            try:
+                row = future.result()
+            except Exception as error:
+                print(f"Scenario {scenario} failed: {error}")
+                continue
+            checkpoint = sweep_dir / f"{row['scenario_id']}.json"
+            checkpoint.with_suffix('.tmp').write_text(json.dumps(row))
+            checkpoint.with_suffix('.tmp').replace(checkpoint)
+
+    return collect_scenario_sweep(sweep_name)
+
+
+def collect_scenario_sweep(sweep_name: str) -> pd.DataFrame:
+    ''' Collect the checkpoints of a sweep in one table '''
+    sweep_dir = OUTPUT_DIR / sweep_name
+    rows = [json.loads(checkpoint.read_text()) for checkpoint in sorted(sweep_dir.glob("*.json"))]
+    results = pd.DataFrame(rows)
+    results.to_csv(sweep_dir / "results.csv", index=False)
+
+    return results
+
+
+if __name__ == '__main__':
+    grid = {'case_nr': [2, 3],
+            'resources.electrolyzer.max_power': [50000, 75000],
+            'resources.PV.max_power': [25000, 50000],
+            'prices.hydrogen': [6, 8]}
+    print(run_scenario_sweep(grid, 'example', threads_per_worker=1, solver_options=get_solver_options(time_limit=60)))
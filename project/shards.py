@@ -0,0 +1,39 @@
+from concurrent.futures import ProcessPoolExecutor
+
+
+def create_shard_executors(workers: int) -> list:
+    ''' One single-process executor per worker, so each worker always receives the same tasks (none for one worker) '''
+    if workers <= 1:
+        return []
+
+    return [ProcessPoolExecutor(max_workers=1) for worker in range(0, workers)]
+
+
+def solve_shard(function, tasks: list) -> list:
+    ''' Solve the tasks of one shard one after the other in its process '''
+    return [function(task) for task in tasks]
+
+
+def solve_sharded(function, tasks: list, executors: list) -> list:
+    ''' Solve the tasks in the shard executors, or one after the other without them
+
+    Task i always goes to the process of executor i % len(executors), so a model that
+    function keeps in its process between calls is built once, in one process, and
+    warm-starts from its own last solution. The results are in the order of the tasks.
+    '''
+    if len(executors) == 0:
+        return solve_shard(function, tasks)
+
+    futures = [executor.submit(solve_shard, function, tasks[worker::len(executors)])
+               for worker, executor in enumerate(executors)]
+    results = [None] * len(tasks)
+    for worker, future in enumerate(futures):
+        results[worker::len(executors)] = future.result()
+
+    return results
+
+
+def shutdown_shard_executors(executors: list) -> None:
+    ''' Stop the processes of the shard executors '''
+    for executor in executors:
+        executor.shutdown()
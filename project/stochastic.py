@@ -0,0 +1,268 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+from get_resources import get_resources
+from get_prices import get_prices
+from create_variables import create_variables
+from create_model import create_model
+from run_optimization_model import create_objective_function, select_solver, solve_optimization_model, \
+    get_solver_options
+from backtest import sample_scenarios
+from shards import create_shard_executors, solve_sharded, shutdown_shard_executors
+
+
+# First-stage decisions (the day-ahead bids) and the cases that have them
+FIRST_STAGE = {'P_E': [1, 2, 3], 'U_sto_E': [3], 'D_sto_E': [3]}
+
+# Price that weights the proximal term of each first-stage decision in progressive hedging
+FIRST_STAGE_PRICES = {'P_E': 'energy', 'U_sto_E': 'band', 'D_sto_E': 'band'}
+
+# Deviations, relative to the scale of each first-stage decision, where the proximal term is linearised
+PROXIMAL_BREAKPOINTS = [-4, -2, -1, -0.5, -0.25, 0.25, 0.5, 1, 2, 4]
+
+# Scenario subproblems kept by each process between progressive hedging iterations (see shards)
+SUBPROBLEMS = {}
+
+
+def create_stochastic_scenarios(case: int, h: int, number_scenarios: int, price_sigma: float = 0.2,
+                                PV_sigma: float = 0.2, seed: int = 0) -> list:
+    ''' Equiprobable scenarios of the PV profile and prices of a case, sampled around its forecast and prices '''
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+    price_scenarios, PV_profile_scenarios = sample_scenarios(prices, resources['PV']['PV_profile'], h,
+                                                             number_scenarios, price_sigma, PV_sigma, seed)
+
+    scenarios = []
+    for n in range(0, number_scenarios):
+        scenario_resources = dict(resources, PV=dict(resources['PV'], PV_profile=append(PV_profile_scenarios[n], 0)))
+        scenario_prices = dict(prices, **{name: price_scenarios[name][n] for name in price_scenarios})
+        scenarios.append({'probability': 1 / number_scenarios, 'resources': scenario_resources,
+                          'prices': scenario_prices})
+
+    return scenarios
+
+
+def get_first_stage(m: Block, h: int, case: int) -> list:
+    ''' First-stage variables of a scenario model, in the order of FIRST_STAGE and of the timesteps '''
+    first_stage = []
+    for name, cases in FIRST_STAGE.items():
+        if case in cases:
+            var = m.component(name)
+            first_stage += [var[t] if var.dim() == 1 else var[0, t] for t in range(0, h)]
+
+    return first_stage
+
+
+def get_first_stage_weights(scenarios: list, h: int, case: int) -> ndarray:
+    ''' Expected price of each first-stage variable, the scale of its proximal term '''
+    weights = []
+    for name, cases in FIRST_STAGE.items():
+        if case in cases:
+            weights.append(sum([scenario['probability'] * abs(asarray(scenario['prices'][FIRST_STAGE_PRICES[name]]))
+                                for scenario in scenarios], axis=0))
+
+    return concatenate(weights)
+
+
+def create_scenario_model(m: Block, h: int, case: int, scenario: dict) -> Block:
+    ''' Model of one scenario, with its objective deactivated '''
+    m.c1 = ConstraintList()
+    m = create_variables(m, h, 1, case, scenario['resources'])
+    m = create_model(m, h, 1, scenario['resources'], case)
+    m = create_objective_function(m, h, 1, scenario['resources'], scenario['prices'], case)
+    m.value.deactivate()
+
+    return m
+
+
+def create_extensive_form(scenarios: list, h: int, case: int) -> ConcreteModel:
+    ''' Create one block per scenario with common first-stage decisions and the expected objective '''
+    m = ConcreteModel()
+    m.scenarios = Block(range(0, len(scenarios)))
+    for n, scenario in enumerate(scenarios):
+        create_scenario_model(m.scenarios[n], h, case, scenario)
+
+    first_stage = [get_first_stage(m.scenarios[n], h, case) for n in range(0, len(scenarios))]
+    m.first_stage = Var(range(0, len(first_stage[0])), domain=Reals)
+    m.nonanticipativity = ConstraintList()
+    for n in range(0, len(scenarios)):
+        for j, data in enumerate(first_stage[n]):
+            m.nonanticipativity.add(data == m.first_stage[j])
+
+    m.value = Objective(expr=quicksum(scenario['probability'] * m.scenarios[n].value.expr
+                                      for n, scenario in enumerate(scenarios)), sense=minimize)
+
+    return m
+
+
+def run_extensive_form(scenarios: list, h: int, case: int, solver_options: dict = None) -> tuple:
+    ''' Solve all scenarios in one model, the reference for small instances '''
+    time_start = perf_counter()
+    m = create_extensive_form(scenarios, h, case)
+    solve_status = solve_optimization_model(m, solver_options)
+    solve_status.update({'time': perf_counter() - time_start, 'expected objective': solve_status['objective'],
+                         'first stage': array([m.first_stage[j].value for j in m.first_stage], dtype=float64)})
+
+    return m, solve_status
+
+
+def create_subproblem(h: int, case: int, scenario: dict) -> ConcreteModel:
+    ''' Scenario model with the multipliers and the proximal term of progressive hedging
+
+    The quadratic proximal term is approximated from below by its tangents at
+    PROXIMAL_BREAKPOINTS times the scale of each deviation, so the scenario
+    subproblems stay linear (mixed-integer) programs.
+    '''
+    m = create_scenario_model(ConcreteModel(), h, case, scenario)
+    m.ph_x = get_first_stage(m, h, case)
+    first_stage = range(0, len(m.ph_x))
+    m.ph_w = Param(first_stage, mutable=True, initialize=0)
+    m.ph_xbar = Param(first_stage, mutable=True, initialize=0)
+    m.ph_rho = Param(first_stage, mutable=True, initialize=0)
+    m.ph_scale = Param(first_stage, mutable=True, initialize=1)
+    m.ph_deviation = Var(first_stage, domain=Reals)
+    m.ph_proximal = Var(first_stage, domain=NonNegativeReals)
+    m.ph_c1 = ConstraintList()
+    for j in first_stage:
+        m.ph_c1.add(m.ph_deviation[j] == m.ph_x[j] - m.ph_xbar[j])
+        for breakpoint in PROXIMAL_BREAKPOINTS:
+            m.ph_c1.add(m.ph_proximal[j] >= m.ph_rho[j] / 2 * (2 * breakpoint * m.ph_scale[j] * m.ph_deviation[j] -
+                                                                (breakpoint * m.ph_scale[j]) ** 2))
+    m.ph_value = Objective(expr=m.value.expr + quicksum(m.ph_w[j] * m.ph_x[j] + m.ph_proximal[j] for j in first_stage),
+                           sense=minimize)
+    m.ph_solver = None
+
+    return m
+
+
+def solve_subproblem(task: dict) -> dict:
+    ''' Solve the progressive hedging subproblem of one scenario, or its recourse with the first stage fixed
+
+    The subproblem is built on the first call and kept in SUBPROBLEMS, so the next
+    iterations only update the multipliers and the consensus of the solver and start
+    from the last solution.
+    '''
+    key = (task['key'], task['n'])
+    if key not in SUBPROBLEMS:
+        SUBPROBLEMS[key] = create_subproblem(task['h'], task['case'], task['scenario'])
+    m = SUBPROBLEMS[key]
+
+    for j, data in enumerate(m.ph_x):
+        m.ph_w[j] = task['w'][j]
+        m.ph_xbar[j] = task['xbar'][j]
+        m.ph_rho[j] = task['rho'][j]
+        m.ph_scale[j] = task['scale'][j]
+        if task['fixed']:
+            data.fix(task['xbar'][j])
+        else:
+            data.unfix()
+
+    warmstart = m.ph_solver is not None
+    if m.ph_solver is None:
+        m.ph_solver = select_solver(task['solver_options'])
+    solve_status = solve_optimization_model(m, task['solver_options'], m.ph_solver, warmstart)
+    if not solve_status['feasible']:
+        return {'n': task['n'], 'feasible': False, 'time': solve_status['time']}
+
+    return {'n': task['n'], 'feasible': True, 'time': solve_status['time'], 'objective': value(m.value.expr),
+            'x': array([data.value for data in m.ph_x], dtype=float64)}
+
+
+def solve_subproblems(tasks: list, executors: list) -> list:
+    ''' Solve the subproblems in the shard executors, each scenario always in the same process '''
+    return solve_sharded(solve_subproblem, tasks, executors)
+
+
+def run_progressive_hedging(scenarios: list, h: int, case: int, solver_options: dict = None, workers: int = 1,
+                            rho_factor: float = 1.0, max_iterations: int = 50, tolerance: float = 1e-3) -> dict:
+    ''' Solve the two-stage problem by progressive hedging over the scenarios
+
+    The first iteration solves each scenario alone; its expected objective is a lower bound
+    (perfect information). The penalty of each first-stage decision is rho_factor times its
+    expected price over its expected deviation in the first iteration. Each iteration then
+    solves every scenario with its multipliers and proximal term, each scenario in the same
+    worker process at every iteration (see shards), until the mean absolute deviation from the
+    consensus is within tolerance of the mean absolute consensus. The recourse of every
+    scenario is finally solved with the first stage fixed to the consensus, which gives the
+    expected objective of the bids.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    time_start = perf_counter()
+    probability = array([scenario['probability'] for scenario in scenarios])
+    prices = get_first_stage_weights(scenarios, h, case)
+    key = f"{id(scenarios)}-{perf_counter()}"
+    executors = create_shard_executors(workers)
+
+    def get_tasks(w, xbar, rho, scale, fixed):
+        return [{'key': key, 'n': n, 'h': h, 'case': case, 'scenario': scenario, 'solver_options': solver_options,
+                 'w': w[n], 'xbar': xbar, 'rho': rho, 'scale': scale, 'fixed': fixed}
+                for n, scenario in enumerate(scenarios)]
+
+    try:
+        w = zeros((len(scenarios), len(prices)))
+        results = solve_subproblems(get_tasks(w, zeros(len(prices)), zeros(len(prices)), ones(len(prices)), False),
+                                    executors)
+        if not all([result['feasible'] for result in results]):
+            raise RuntimeError("A scenario of the two-stage problem is infeasible")
+        lower_bound = float(probability @ array([result['objective'] for result in results]))
+        x = array([result['x'] for result in results])
+        xbar = probability @ x
+        scale = maximum(probability @ abs(x - xbar), 1)
+        rho = rho_factor * prices / scale
+
+        for iteration in range(1, max_iterations + 1):
+            deviation = float(probability @ abs(x - xbar).mean(axis=1))
+            if deviation <= tolerance * maximum(abs(xbar).mean(), 1e-10):
+                break
+            w = w + rho * (x - xbar)
+            results = solve_subproblems(get_tasks(w, xbar, rho, scale, False), executors)
+            if not all([result['feasible'] for result in results]):
+                raise RuntimeError("A progressive hedging subproblem is infeasible")
+            x = array([result['x'] for result in results])
+            xbar = probability @ x
+
+        recourse = solve_subproblems(get_tasks(zeros(w.shape), xbar, zeros(len(prices)), scale, True), executors)
+    finally:
+        shutdown_shard_executors(executors)
+        for n in range(0, len(scenarios)):
+            SUBPROBLEMS.pop((key, n), None)
+
+    feasible = all([result['feasible'] for result in recourse])
+    expected_objective = float(probability @ array([result['objective'] for result in recourse])) if feasible else None
+    gap = None
+    if feasible:
+        gap = abs(expected_objective - lower_bound) / maximum(abs(expected_objective), 1e-10)
+
+    return {'feasible': feasible, 'iterations': iteration, 'deviation': deviation,
+            'expected objective': expected_objective, 'lower_bound': lower_bound, 'gap': gap,
+            'first stage': xbar, 'time': perf_counter() - time_start}
+
+
+def benchmark_stochastic(case: int, h: int, scenario_numbers: list = (2, 4, 8), workers: list = (1, 2, 4),
+                         solver_options: dict = None) -> list:
+    ''' Wall time of the extensive form and of progressive hedging as the scenarios and processes grow '''
+    if solver_options is None:
+        solver_options = get_solver_options(threads=1)
+
+    results = []
+    for number_scenarios in scenario_numbers:
+        scenarios = create_stochastic_scenarios(case, h, number_scenarios)
+        m, extensive = run_extensive_form(scenarios, h, case, solver_options)
+        for number_workers in workers:
+            hedging = run_progressive_hedging(scenarios, h, case, solver_options, number_workers)
+            results.append({'case': case, 'h': h, 'scenarios': number_scenarios, 'workers': number_workers,
+                            'extensive form time (s)': extensive['time'],
+                            'extensive form objective': extensive['expected objective'],
+                            'progressive hedging time (s)': hedging['time'],
+                            'progressive hedging objective': hedging['expected objective'],
+                            'progressive hedging gap': hedging['gap'], 'iterations': hedging['iterations']})
+            print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_stochastic(1, 24)
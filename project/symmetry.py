@@ -0,0 +1,90 @@
+from numpy import *
+from pyomo.environ import *
+from time import perf_counter
+
+
+# Variables summed over the horizon into the ordering key of a unit, each normalised by the limit of its resource
+ORDERING_KEY = {'P_EL_E': ('electrolyzer', 'max_power'),
+                'soc_sto_E': ('electrical_storage', 'max_capacity')}
+
+# Storages whose state-of-charge can be set per unit from outside the model when linked
+STORAGES = ['electrical_storage', 'hydrogen_storage', 'nitrogen_storage', 'ammonia_storage']
+
+
+def get_identical_units(number_resources: int, resources: dict, case: int) -> list:
+    ''' Groups of units that can be swapped in any solution without changing the objective
+
+    Every unit is built from the same resources, so the units only differ where the model
+    treats them apart: in case 3 only the reserves of unit 0 are paid, and the state-of-charge
+    of a linked storage is set by constraints outside the model, so no units are swapped then.
+    '''
+    if any([resources.get(storage, {}).get('linked', False) for storage in STORAGES]):
+        return []
+
+    units = list(range(0, number_resources))
+    groups = [units[1:]] if case == 3 else [units]
+
+    return [group for group in groups if len(group) > 1]
+
+
+def get_ordering_key(m: ConcreteModel, h: int, i: int, resources: dict):
+    ''' Electrolyzer energy and electrical storage state-of-charge of unit i over the horizon, relative to their limits '''
+    key = 0
+    for name, (resource, limit) in ORDERING_KEY.items():
+        var = m.component(name)
+        if var is None or resource not in resources:
+            continue
+        offset = 1 if name.startswith('soc') else 0
+        key = key + quicksum(var[i, t + offset] for t in range(0, h)) / resources[resource][limit]
+
+    return key
+
+
+def create_symmetry_breaking_model(m: ConcreteModel, h: int, number_resources: int, resources: dict,
+                                   case: int) -> ConcreteModel:
+    ''' Order the identical units by their key, so branch-and-bound does not explore their permutations
+
+    Any solution can be permuted into one where the keys of the units of a group decrease, so
+    ordering a single key keeps the optimal objective.
+    '''
+    for group in get_identical_units(number_resources, resources, case):
+        for i, j in zip(group[:-1], group[1:]):
+            m.c1.add(get_ordering_key(m, h, i, resources) >= get_ordering_key(m, h, j, resources))
+
+    return m
+
+
+def benchmark_symmetry(case: int, h: int, unit_numbers: list = (2, 4, 8), time_limit: float = 600,
+                       solver_options: dict = None) -> list:
+    ''' Solve time of identical parallel units with and without the ordering constraints '''
+    from get_resources import get_resources
+    from get_prices import get_prices
+    from create_variables import create_variables
+    from create_model import create_model
+    from run_optimization_model import get_solver_options, run_optimization_model
+
+    if solver_options is None:
+        solver_options = get_solver_options(time_limit=time_limit)
+    resources = get_resources(case)
+    prices = get_prices(case, h)
+
+    results = []
+    for number_resources in unit_numbers:
+        for symmetry in [False, True]:
+            m = ConcreteModel()
+            m.c1 = ConstraintList()
+            m = create_variables(m, h, number_resources, case, resources)
+            m = create_model(m, h, number_resources, resources, case, symmetry=symmetry)
+            time_start = perf_counter()
+            solve_status = run_optimization_model(m, h, number_resources, resources, prices, case, solver_options)
+            results.append({'case': case, 'h': h, 'units': number_resources, 'symmetry breaking': symmetry,
+                            'time (s)': perf_counter() - time_start, 'objective': solve_status['objective'],
+                            'gap': solve_status['gap'], 'nodes': solve_status['nodes'],
+                            'optimal': solve_status['optimal']})
+            print(results[-1])
+
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_symmetry(3, 24)
@@ -0,0 +1,302 @@
+from numpy import *
+from pyomo.environ import *
+from scipy.cluster.vq import kmeans2
+from time import perf_counter
+import pandas as pd
+
+from get_resources import get_resources, get_irradiance
+from get_prices import get_prices
+from create_variables import create_variables
+from create_model import create_model
+from run_optimization_model import create_objective_function, solve_optimization_model, get_solver_options
+from save_results import get_cost_results
+from results import get_results
+from rolling_horizon import STORAGES
+
+
+HOURS_PER_DAY = 24
+DAYS_PER_YEAR = 365
+
+# Series clustered jointly into representative days
+TYPICAL_DAY_SERIES = ['PV', 'energy_market', 'band', 'upward', 'downward']
+
+# Storages whose inventory cycles over more than one day
+SEASONAL_STORAGES = ['hydrogen_storage', 'nitrogen_storage', 'ammonia_storage']
+
+# Annual quantities reported for each solve: (variable, label)
+TYPICAL_DAY_KPIS = [('P_E_pos', 'electricity bought (kWh)'),
+                    ('P_PV', 'PV generation (kWh)'),
+                    ('P_EL_E', 'electrolyzer consumption (kWh)'),
+                    ('P_H2', 'hydrogen sold (kg)'),
+                    ('P_AP', 'ammonia production (kg)')]
+
+
+def get_annual_series(location: str = 'Montijo') -> tuple:
+    ''' Get the hourly PV profile and prices of 2022 in chronological order
+
+    The forecasts are sorted by datetime and the missing hours are interpolated.
+    '''
+    irradiance = get_irradiance(location, 2022)
+    swflx = pd.Series(irradiance['swflx'], index=irradiance['datetime']).sort_index()
+    swflx = swflx[~swflx.index.duplicated()]
+    swflx = swflx.reindex(pd.date_range('2022-01-01', periods=DAYS_PER_YEAR * HOURS_PER_DAY, freq='h'))
+    swflx = swflx.interpolate().fillna(0).values
+
+    PV_profile = swflx / swflx.max()
+    prices = get_prices(0, DAYS_PER_YEAR * HOURS_PER_DAY)
+
+    return PV_profile, prices
+
+
+def get_daily_profiles(PV_profile: ndarray, prices: dict) -> ndarray:
+    ''' One row per day with the standardised hourly values of every series in TYPICAL_DAY_SERIES '''
+    profiles = []
+    for key in TYPICAL_DAY_SERIES:
+        series = PV_profile if key == 'PV' else asarray(prices[key], dtype=float)
+        series = (series - series.mean()) / maximum(series.std(), 1e-10)
+        profiles.append(series.reshape(DAYS_PER_YEAR, HOURS_PER_DAY))
+
+    return concatenate(profiles, axis=1)
+
+
+def cluster_days(profiles: ndarray, k: int, method: str = 'kmeans', seed: int = 0) -> dict:
+    ''' Group the days in k clusters and pick one real day of each cluster
+
+    With 'kmeans' the representative day is the day closest to the centroid, with
+    'kmedoids' the medoids are improved until no day changes of cluster. The weight
+    of a representative day is the number of days of its cluster.
+    '''
+    centroids, assignment = kmeans2(profiles, k, minit='++', seed=seed)
+    distances = ((profiles[:, newaxis, :] - centroids[newaxis, :, :]) ** 2).sum(axis=2)
+    clusters = unique(assignment)
+    days = array([flatnonzero(assignment == cluster)[argmin(distances[assignment == cluster, cluster])]
+                  for cluster in clusters])
+
+    if method == 'kmedoids':
+        day_distances = ((profiles[:, newaxis, :] - profiles[newaxis, :, :]) ** 2).sum(axis=2) ** 0.5
+        for iteration in range(0, 100):
+            assignment = argmin(day_distances[:, days], axis=1)
+            new_days = array([flatnonzero(assignment == n)[argmin(day_distances[ix_(assignment == n,
+                                                                                     assignment == n)].sum(axis=1))]
+                              for n in range(0, len(days))])
+            if array_equal(new_days, days):
+                break
+            days = new_days
+    elif method != 'kmeans':
+        raise ValueError(f"Unknown clustering method {method}, use kmeans or kmedoids")
+
+    assignment = argmin(((profiles[:, newaxis, :] - profiles[newaxis, days, :]) ** 2).sum(axis=2), axis=1)
+    weights = bincount(assignment, minlength=len(days)).astype(float)
+
+    return {'days': days, 'weights': weights, 'assignment': assignment}
+
+
+def get_day_data(resources: dict, prices: dict, day: int) -> tuple:
+    ''' Slice the PV profile and prices of one day of the year '''
+    start = day * HOURS_PER_DAY
+
+    day_resources = dict(resources)
+    day_resources['PV'] = dict(resources['PV'])
+    day_resources['PV']['PV_profile'] = append(resources['PV']['PV_profile'], 0)[start:start + HOURS_PER_DAY + 1]
+
+    day_prices = {}
+    for key, value in prices.items():
+        if isinstance(value, (list, ndarray)):
+            day_prices[key] = value[start:start + HOURS_PER_DAY]
+        else:
+            day_prices[key] = value
+
+    return day_resources, day_prices
+
+
+def create_typical_days_model(clusters: dict, resources: dict, prices: dict, case: int,
+                              linked_storages: list = ()) -> ConcreteModel:
+    ''' Create one block per representative day and weight the objective of each day
+
+    Each block is the model of one day built with create_model, so the storages
+    start and end each day at their initial state-of-charge, except the linked
+    storages, whose inventory is carried over the days of the year by
+    create_storage_linking.
+    '''
+    m = ConcreteModel()
+    m.days = Block(range(0, len(clusters['days'])))
+    for n, day in enumerate(clusters['days']):
+        day_resources, day_prices = get_day_data(resources, prices, day)
+        for storage in linked_storages:
+            day_resources[storage] = dict(resources[storage], linked=True)
+        block = m.days[n]
+        block.c1 = ConstraintList()
+        block = create_variables(block, HOURS_PER_DAY, 1, case, resources)
+        block = create_model(block, HOURS_PER_DAY, 1, day_resources, case)
+        block = create_objective_function(block, HOURS_PER_DAY, 1, day_resources, day_prices, case)
+        block.value.deactivate()
+
+    for storage in linked_storages:
+        m = create_storage_linking(m, clusters, resources, storage)
+
+    m.value = Objective(expr=quicksum(clusters['weights'][n] * m.days[n].value.expr
+                                      for n in range(0, len(clusters['days']))), sense=minimize)
+
+    return m
+
+
+def create_storage_linking(m: ConcreteModel, clusters: dict, resources: dict, storage: str) -> ConcreteModel:
+    ''' Carry the inventory of a storage over the sequence of days of the year
+
+    In each representative day the state-of-charge starts free and only its change
+    over the day (intra-day delta) matters. The inventory at the start of every day
+    of the year is the inventory of the previous day plus the delta of the
+    representative day of the previous day. The extreme deltas of each
+    representative day keep the inventory within the capacity of the storage at
+    every hour.
+    '''
+    soc = STORAGES[storage]
+    max_soc = resources[storage]['max_capacity']
+    min_soc = resources[storage]['min_capacity']
+    soc_initial = resources[storage]['initial_soc']
+    soc_final = resources[storage].get('final_soc', soc_initial)
+    representative_days = range(0, len(clusters['days']))
+    n_days = len(clusters['assignment'])
+
+    linking = Block()
+    m.add_component(f'{storage}_linking', linking)
+    linking.soc = Var(arange(n_days + 1), bounds=(min_soc, max_soc))
+    linking.delta_max = Var(representative_days)
+    linking.delta_min = Var(representative_days)
+    linking.c1 = ConstraintList()
+
+    linking.c1.add(linking.soc[0] == soc_initial)
+    linking.c1.add(linking.soc[n_days] >= soc_final)
+    for n in representative_days:
+        soc_day = getattr(m.days[n], soc)
+        for t in range(0, HOURS_PER_DAY + 1):
+            linking.c1.add(linking.delta_max[n] >= soc_day[0, t] - soc_day[0, 0])
+            linking.c1.add(linking.delta_min[n] <= soc_day[0, t] - soc_day[0, 0])
+
+    for day, n in enumerate(clusters['assignment']):
+        soc_day = getattr(m.days[n], soc)
+        linking.c1.add(linking.soc[day + 1] == linking.soc[day] + soc_day[0, HOURS_PER_DAY] - soc_day[0, 0])
+        linking.c1.add(linking.soc[day] + linking.delta_max[n] <= max_soc)
+        linking.c1.add(linking.soc[day] + linking.delta_min[n] >= min_soc)
+
+    return m
+
+
+def get_storage_inventory(m: ConcreteModel, storage: str) -> ndarray:
+    ''' Inventory of a linked storage at the start of every day of the year '''
+    linking = getattr(m, f'{storage}_linking')
+    return array([linking.soc[day].value for day in linking.soc], dtype=float64)
+
+
+def get_typical_days_kpis(m: ConcreteModel, clusters: dict, resources: dict, prices: dict, case: int) -> dict:
+    ''' Annual objective, costs and quantities, weighting each representative day '''
+    kpis = {'objective': value(m.value)}
+    for n, day in enumerate(clusters['days']):
+        day_resources, day_prices = get_day_data(resources, prices, day)
+        results = get_results(m.days[n], HOURS_PER_DAY, case, day_prices, day_resources, 1)
+        costs = get_cost_results(results, n_case=clusters['weights'][n])
+        quantities = {label: clusters['weights'][n] * nansum(results['totals'][name])
+                      for name, label in TYPICAL_DAY_KPIS}
+        for key, kpi in list(costs.items()) + list(quantities.items()):
+            kpis[key] = kpis.get(key, 0) + float(kpi)
+
+    return kpis
+
+
+def run_typical_days(k: int, case: int, method: str = 'kmeans', solver_options: dict = None,
+                     location: str = 'Montijo', seed: int = 0, linked_storages: list = ()) -> tuple:
+    ''' Cluster the year in k representative days, solve the weighted model and return its annual KPIs '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+
+    resources = get_resources(case)
+    PV_profile, prices = get_annual_series(location)
+    resources['PV'] = dict(resources['PV'], PV_profile=PV_profile)
+
+    time_start = perf_counter()
+    profiles = get_daily_profiles(PV_profile, prices)
+    clusters = cluster_days(profiles, k, method, seed)
+    m = create_typical_days_model(clusters, resources, prices, case, linked_storages)
+    solve_status = solve_optimization_model(m, solver_options)
+
+    kpis = get_typical_days_kpis(m, clusters, resources, prices, case)
+    kpis.update({'k': len(clusters['days']), 'time (s)': perf_counter() - time_start,
+                 'optimal': solve_status['optimal'],
+                 'profile error': float(((profiles - profiles[clusters['days'][clusters['assignment']]]) ** 2)
+                                        .mean() ** 0.5)})
+
+    return m, kpis
+
+
+def get_case_storages(case: int) -> list:
+    ''' Storages that the model of a case has '''
+    return SEASONAL_STORAGES + (['electrical_storage'] if case == 3 else [])
+
+
+def run_reference_year(case: int, solver_options: dict = None, location: str = 'Montijo',
+                       linked_storages: list = None) -> dict:
+    ''' Solve every day of the year as the reference of the clustered models
+
+    By default every storage of the case is linked and the 365 days are solved together in
+    one model, so the storages are carried over the days as in an 8760 h schedule. With
+    linked_storages=() the days are independent, each starting and ending at the initial
+    state-of-charge, and are solved one after the other: the error against this reference
+    is the clustering error only, without the error of the daily cycle of the storages.
+    '''
+    if solver_options is None:
+        solver_options = get_solver_options()
+    if linked_storages is None:
+        linked_storages = get_case_storages(case)
+
+    resources = get_resources(case)
+    PV_profile, prices = get_annual_series(location)
+    resources['PV'] = dict(resources['PV'], PV_profile=PV_profile)
+
+    time_start = perf_counter()
+    if len(linked_storages) > 0:
+        year = [{'days': arange(DAYS_PER_YEAR), 'weights': ones(DAYS_PER_YEAR), 'assignment': arange(DAYS_PER_YEAR)}]
+    else:
+        year = [{'days': array([day]), 'weights': array([1.0]), 'assignment': array([0])}
+                for day in range(0, DAYS_PER_YEAR)]
+
+    kpis = {}
+    for clusters in year:
+        m = create_typical_days_model(clusters, resources, prices, case, linked_storages)
+        solve_optimization_model(m, solver_options)
+        for key, kpi in get_typical_days_kpis(m, clusters, resources, prices, case).items():
+            kpis[key] = kpis.get(key, 0) + kpi
+    kpis.update({'k': DAYS_PER_YEAR, 'time (s)': perf_counter() - time_start,
+                 'reference': 'linked year' if len(linked_storages) > 0 else 'daily cycles'})
+
+    return kpis
+
+
+def benchmark_typical_days(case: int, ks: list = (4, 8, 16, 32), method: str = 'kmeans',
+                           solver_options: dict = None, linked_storages: list = (),
+                           reference_storages: list = None) -> pd.DataFrame:
+    ''' Compare the annual KPIs and the time of the clustered models with the reference year
+
+    The reference links reference_storages over the year (by default every storage of the
+    case, see run_reference_year), so the errors include the daily cycle that the clustered
+    model assumes for the storages outside linked_storages.
+    '''
+    reference = run_reference_year(case, solver_options, linked_storages=reference_storages)
+    print({key: reference[key] for key in ['reference', 'time (s)', 'objective']})
+
+    results = [reference]
+    for k in ks:
+        m, kpis = run_typical_days(k, case, method, solver_options, linked_storages=linked_storages)
+        kpis['speed-up'] = reference['time (s)'] / kpis['time (s)']
+        for key in ['objective', 'Total costs (k€)'] + [label for name, label in TYPICAL_DAY_KPIS]:
+            kpis[f'{key} error'] = (kpis[key] - reference[key]) / maximum(abs(reference[key]), 1e-10)
+        results.append(kpis)
+        kpis['reference'] = reference['reference']
+        print({key: kpis[key] for key in ['reference', 'k', 'time (s)', 'speed-up', 'objective error',
+                                          'profile error']})
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    print(benchmark_typical_days(1))
+    print(benchmark_typical_days(1, linked_storages=SEASONAL_STORAGES))